@@ -27,17 +27,34 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import hashlib
+import hmac
 import logging
+import time
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 import httplib2
+import simplejson as json
 
 import typepad
 from typepadapp.models import User
 
 
 TYPEPAD_SESSION_KEY = '_auth_typepad_user_id'
+TYPEPAD_SNAPSHOT_KEY = '_auth_typepad_user_snapshot'
+
+SNAPSHOT_FIELDS = ('id', 'url_id', 'preferred_username', 'display_name',
+    'avatar_link', 'profile_page_url', 'object_type', 'object_types')
+"""The `User` fields stored in a session's user snapshot."""
+
+SNAPSHOT_ATTRIBUTES = frozenset(SNAPSHOT_FIELDS + ('xid', 'username',
+    'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser',
+    'is_featured_member', 'can_post', 'is_anonymous', 'is_authenticated',
+    'get_absolute_url', 'userpic', 'feed_url', 'edit_url', 'cache_key',
+    'cache_namespace', 'get_and_delete_messages', 'get_profile'))
+"""The `User` attributes a `SnapshotUser` can provide without loading the
+full `User` from TypePad. These need only the fields in `SNAPSHOT_FIELDS`."""
 
 log = logging.getLogger(__name__)
 
@@ -92,12 +109,123 @@ def authenticate(**credentials):
     return
 
 
+class SnapshotUser(object):
+
+    """A signed-in TypePad user, resolved from the snapshot of their display
+    fields kept in their session.
+
+    Attributes in `SNAPSHOT_ATTRIBUTES` are answered from the snapshot. Any
+    other attribute loads the full `User` from TypePad (or the cache) and
+    delegates to it, refreshing the snapshot as it does.
+
+    """
+
+    def __init__(self, request, user_id, snapshot=None, user=None):
+        self.__dict__.update({
+            '_request': request,
+            '_user_id': user_id,
+            '_snapshot': snapshot,
+            '_user': user,
+        })
+
+    def _full_user(self):
+        user = self._user
+        if user is None:
+            log.debug('Loading full user %s for attribute not in snapshot', self._user_id)
+            user = User.get_by_id(self._user_id, batch=False)
+            self.__dict__['_user'] = user
+        if self._snapshot is None and user._delivered:
+            self.__dict__['_snapshot'] = user
+            save_user_snapshot(self._request, user)
+        return user
+
+    def __getattr__(self, name):
+        if self._snapshot is not None and name in SNAPSHOT_ATTRIBUTES:
+            return getattr(self._snapshot, name)
+        return getattr(self._full_user(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._full_user(), name, value)
+
+    def __unicode__(self):
+        return unicode(self._snapshot or self._full_user())
+
+    def __repr__(self):
+        return '<SnapshotUser %s>' % self._user_id
+
+
+def _snapshot_signature(user_id, data, stamp):
+    message = json.dumps([user_id, data, stamp], sort_keys=True)
+    return hmac.new(settings.SECRET_KEY, message, hashlib.sha1).hexdigest()
+
+
+def _constant_time_equals(a, b):
+    """Compares two strings in time that depends only on their length, so
+    a signature can't be guessed a character at a time by timing."""
+    if not isinstance(a, basestring) or not isinstance(b, basestring):
+        return False
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+
+def save_user_snapshot(request, user):
+    """Stores a signed snapshot of the given user's display fields in the
+    request's session."""
+    data = user.to_dict()
+    api_names = [User.fields[name].api_name for name in SNAPSHOT_FIELDS]
+    data = dict([(k, v) for k, v in data.iteritems() if k in api_names])
+    stamp = int(time.time())
+    request.session[TYPEPAD_SNAPSHOT_KEY] = {
+        'data': data,
+        'time': stamp,
+        'signature': _snapshot_signature(user.id, data, stamp),
+    }
+
+
+def load_user_snapshot(request, user_id):
+    """Returns a `User` built from the request session's snapshot of the
+    given user, or ``None`` if there is no valid, fresh snapshot."""
+    snapshot = request.session.get(TYPEPAD_SNAPSHOT_KEY)
+    if not snapshot:
+        return None
+
+    try:
+        data, stamp = snapshot['data'], snapshot['time']
+        signature = snapshot['signature']
+    except (KeyError, TypeError):
+        return None
+    expected = _snapshot_signature(user_id, data, stamp)
+    if not _constant_time_equals(signature, expected):
+        log.warning('Ignoring session user snapshot with a bad signature')
+        return None
+
+    refresh = getattr(settings, 'TYPEPAD_USER_SNAPSHOT_REFRESH', 300)
+    if stamp + refresh < time.time():
+        return None
+
+    return User.from_dict(data)
+
+
 def get_user(request):
     try:
         user_id = request.session[TYPEPAD_SESSION_KEY]
     except KeyError:
         pass
     else:
+        if getattr(settings, 'TYPEPAD_USER_SNAPSHOT', False):
+            snapshot = load_user_snapshot(request, user_id)
+            if snapshot is not None:
+                return SnapshotUser(request, user_id, snapshot)
+            # no usable snapshot, so fetch the user along with the rest
+            # of the batch; the snapshot is refreshed once it's delivered
+            user = TypePadBackend().get_user(user_id)
+            if user is None:
+                return AnonymousUser()
+            return SnapshotUser(request, user_id, user=user)
         return TypePadBackend().get_user(user_id) or AnonymousUser()
 
     return AnonymousUser()
@@ -112,6 +240,8 @@ def login(request, user):
         request.session.cycle_key()
 
     request.session[TYPEPAD_SESSION_KEY] = user.id
+    if getattr(settings, 'TYPEPAD_USER_SNAPSHOT', False):
+        save_user_snapshot(request, user)
     if hasattr(request, 'typepad_user'):
         request.typepad_user = user
 
@@ -39,19 +39,147 @@ and extends loader tags.
 To enable cached templates, import this module and call setup() when your Django
 app starts up. A good place to do this setup is in your project's settings.py.
 
+Call setup(preload=True) to compile every template in your template directories
+when the app starts (in the master process, if your server preloads your project
+before forking), instead of as each worker first uses them. Call
+setup(reload=True) during development to recompile templates whose files have
+changed. Call setup(compile=True) to also compile templates to Python functions
+with typepadapp.utils.compiler. The time spent compiling each template is
+available from compile_report().
+
 """
 
+from collections import deque
+import logging
 import os
+import threading
+import time
+
+from django.conf import settings
 from django.template import loader, loader_tags, NodeList, Template, TemplateDoesNotExist, TemplateSyntaxError
-from django.template.context import Context
+from django.template.context import Context, ContextPopException
 from django.utils.safestring import mark_safe
 
 
+log = logging.getLogger(__name__)
+
+
+class TemplateCache(object):
+    """A thread-safe cache of compiled templates, keyed by template name."""
+
+    def __init__(self, reload=False, compile=False):
+        self.reload = reload
+        self.compile_templates = compile
+        self.templates = {}
+        self.paths = {}
+        self.mtimes = {}
+        self.compile_times = {}
+        # templates can load other templates while compiling, so use an RLock
+        self.lock = threading.RLock()
+
+    def get(self, template_name):
+        template = self.templates.get(template_name)
+        if template is not None and not (self.reload and self.changed(template_name)):
+            return template
+
+        self.lock.acquire()
+        try:
+            # another thread may have compiled it while we waited
+            template = self.templates.get(template_name)
+            if template is None or self.reload and self.changed(template_name):
+                template = self.compile(template_name)
+            return template
+        finally:
+            self.lock.release()
+
+    def find_template_source(self, template_name):
+        """Returns the source of the named template, its origin, and the path
+        of the file it was loaded from (or None)."""
+        if loader.template_source_loaders is None:
+            # let Django set up the loaders
+            loader.find_template_source(template_name)
+        for template_loader in loader.template_source_loaders:
+            try:
+                source, display_name = template_loader(template_name, None)
+            except TemplateDoesNotExist:
+                continue
+            origin = loader.make_origin(display_name, template_loader, template_name, None)
+            return source, origin, display_name
+        raise TemplateDoesNotExist, template_name
+
+    def mtime(self, path):
+        try:
+            return os.stat(path).st_mtime
+        except (OSError, TypeError):
+            return None
+
+    def changed(self, template_name):
+        path = self.paths.get(template_name)
+        return path is not None and self.mtime(path) != self.mtimes.get(template_name)
+
+    def compile(self, template_name):
+        start = time.time()
+        source, origin, path = self.find_template_source(template_name)
+        template = loader.get_template_from_string(source, origin, template_name)
+        if self.compile_templates:
+            from typepadapp.utils.compiler import compile_template
+            compile_template(template)
+        self.compile_times[template_name] = time.time() - start
+
+        self.paths[template_name] = path
+        self.mtimes[template_name] = self.mtime(path)
+        self.templates[template_name] = template
+        return template
+
+    def template_names(self):
+        """Returns the names of all the templates in the TEMPLATE_DIRS and
+        installed apps' template directories."""
+        from django.template.loaders.app_directories import app_template_dirs
+
+        names = set()
+        for template_dir in tuple(settings.TEMPLATE_DIRS) + tuple(app_template_dirs):
+            for dirpath, dirnames, filenames in os.walk(template_dir):
+                dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+                for filename in filenames:
+                    if filename.startswith('.') or filename.endswith(('~', '.pyc', '.swp')):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    names.add(os.path.relpath(path, template_dir).replace(os.sep, '/'))
+        return sorted(names)
+
+    def preload(self, template_names=None):
+        """Compiles the named templates, or all the templates found by
+        template_names(). Templates that fail to compile are logged and
+        skipped."""
+        if template_names is None:
+            template_names = self.template_names()
+
+        start = time.time()
+        for template_name in template_names:
+            try:
+                self.get(template_name)
+            except Exception, exc:
+                log.warning('Could not preload template %r: %s', template_name, exc)
+        log.info('Preloaded %d templates in %.3f seconds', len(self.templates),
+            time.time() - start)
+
+    def report(self):
+        """Returns a list of (template name, seconds) pairs for the templates
+        compiled so far, slowest first."""
+        return sorted(self.compile_times.items(), key=lambda item: item[1], reverse=True)
+
+
+_template_cache = TemplateCache()
+
+
 def get_template(template_name):
-    if template_name not in _template_cache:
-        source, origin = find_template_source(template_name)
-        _template_cache[template_name] = get_template_from_string(source, origin, template_name)
-    return _template_cache[template_name]
+    return _template_cache.get(template_name)
+
+
+def compile_report():
+    """Returns how long each cached template took to compile, as a list of
+    (template name, seconds) pairs, slowest first."""
+    return _template_cache.report()
 
 
 def Template__render(self, context):
@@ -66,44 +194,45 @@ class ParserContext(object):
     """A stack container to store Template state."""
     def __init__(self, dict_=None):
         dict_ = dict_ or {}
+        # the top of the stack is the end of the list
         self.dicts = [dict_]
 
     def __repr__(self):
-        return repr(self.dicts)
+        return repr(self.dicts[::-1])
     
     def __iter__(self):
-        for d in self.dicts:
+        for d in reversed(self.dicts):
             yield d
 
     def push(self):
         d = {}
-        self.dicts = [d] + self.dicts
+        self.dicts.append(d)
         return d
 
     def pop(self):
         if len(self.dicts) == 1:
             raise ContextPopException
-        return self.dicts.pop(0)
+        return self.dicts.pop()
 
     def __setitem__(self, key, value):
         "Set a variable in the current context"
-        self.dicts[0][key] = value
+        self.dicts[-1][key] = value
 
     def __getitem__(self, key):
         "Get a variable's value from the current context"
-        return self.dicts[0][key]
+        return self.dicts[-1][key]
 
     def __delitem__(self, key):
         "Deletes a variable from the current context"
-        del self.dicts[0][key]
+        del self.dicts[-1][key]
 
     def has_key(self, key):
-        return key in self.dicts[0]
+        return key in self.dicts[-1]
 
     __contains__ = has_key
 
     def get(self, key, otherwise=None):
-        d = self.dicts[0]
+        d = self.dicts[-1]
         if key in d:
             return d[key]
         return otherwise
@@ -125,9 +254,9 @@ class BlockContext(object):
     def add_blocks(self, blocks):
         for name, block in blocks.iteritems():
             if name in self.blocks:
-                self.blocks[name].insert(0, block)
+                self.blocks[name].appendleft(block)
             else:
-                self.blocks[name] = [block]
+                self.blocks[name] = deque((block,))
 
     def pop(self, name):
         try:
@@ -177,7 +306,7 @@ def BlockNode__super(self):
 
 class CompiledParent(object):
     def __get__(self, obj, cls):
-        if obj.parent_name_expr:
+        if obj.parent_name_expr or _template_cache.reload:
             def compiled_parent(context):
                 return obj.get_parent(context)
         else:
@@ -209,6 +338,28 @@ def ExtendsNode__get_parent(self, context):
     except TemplateDoesNotExist:
         raise TemplateSyntaxError, "Template %r cannot be extended, because it doesn't exist" % parent
 
+def root_blocks(nodelist):
+    """Returns the block nodes of a template's nodelist by name if the template
+    is the root of an inheritance chain, or None if it extends another.
+
+    The result is computed once per compiled nodelist."""
+    try:
+        return nodelist.__dict__['_root_blocks']
+    except KeyError:
+        pass
+
+    blocks = None
+    for node in nodelist:
+        # The ExtendsNode has to be the first non-text node.
+        if not isinstance(node, loader_tags.TextNode):
+            if not isinstance(node, loader_tags.ExtendsNode):
+                blocks = dict([(n.name, n) for n in
+                               nodelist.get_nodes_by_type(loader_tags.BlockNode)])
+            break
+    nodelist.__dict__['_root_blocks'] = blocks
+    return blocks
+
+
 def ExtendsNode__render(self, context):
     compiled_parent = self.compiled_parent(context)
 
@@ -222,22 +373,25 @@ def ExtendsNode__render(self, context):
 
     # If this block's parent doesn't have an extends node it is the root,
     # and its block nodes also need to be added to the block context.
-    for node in compiled_parent.nodelist:
-        # The ExtendsNode has to be the first non-text node.
-        if not isinstance(node, loader_tags.TextNode):
-            if not isinstance(node, loader_tags.ExtendsNode):
-                blocks = dict([(n.name, n) for n in 
-                               compiled_parent.nodelist.get_nodes_by_type(loader_tags.BlockNode)])
-                block_context.add_blocks(blocks)
-            break
+    blocks = root_blocks(compiled_parent.nodelist)
+    if blocks is not None:
+        block_context.add_blocks(blocks)
 
     # Call render on nodelist explicitly so the block context stays
     # the same.
     return compiled_parent.nodelist.render(context)
 
 
-def setup():
-    "Monkeypunch!"
+def setup(preload=False, reload=False, compile=False):
+    """Monkeypunch!
+
+    With preload, compiles all the templates up front: immediately if Django
+    is configured, or otherwise (as when called from settings.py) when the
+    post_start signal fires. With reload, templates are recompiled when their
+    files change. With compile, templates are compiled to Python functions.
+
+    """
+    global _template_cache
 
     try:
         # If we're attempting to import with a Django
@@ -248,8 +402,9 @@ def setup():
         # lets do it the old-fashioned way
         pass
 
+    _template_cache = TemplateCache(reload=reload, compile=compile)
     loader.get_template.func_code = get_template.func_code
-    loader.get_template.func_globals['_template_cache'] = {}
+    loader.get_template.func_globals['_template_cache'] = _template_cache
     Context.__init__ = Context__init
     Template.render = Template__render
     loader_tags.BlockNode.render = BlockNode__render
@@ -258,3 +413,14 @@ def setup():
     loader_tags.ExtendsNode.get_parent = ExtendsNode__get_parent
     loader_tags.ExtendsNode.render = ExtendsNode__render
     loader_tags.ExtendsNode.compiled_parent = CompiledParent()
+
+    if preload:
+        if settings.configured:
+            _template_cache.preload()
+        else:
+            from typepadapp.signals import post_start
+            post_start.connect(preload_on_start)
+
+
+def preload_on_start(**kwargs):
+    _template_cache.preload()
@@ -27,15 +27,102 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+from collections import deque
+import hashlib
 import logging
+import random
+import re
+import struct
+import threading
+import time
+
+from django.conf import settings
 from django.core.cache import cache
+from django.core.signals import request_finished
 
 import typepad
-from typepadapp.middleware.debug import RequestStatTracker
 
 log = logging.getLogger('typepadapp.cache')
 
 
+class CacheReadRecorder(threading.local):
+
+    """Records which cached objects and lists are read in this thread.
+
+    Between `start()` and `stop()`, the caching layer notes the cache key of
+    each object and list it reads (or fetches to populate the cache), and
+    whether any data was fetched from TypePad without going through the
+    cache at all. Views use this to derive HTTP validators from the versions
+    of what they read (see `key_versions()`).
+
+    """
+
+    keys = None
+    uncached = False
+
+    def start(self):
+        self.keys = set()
+        self.uncached = False
+
+    def stop(self):
+        """Stops recording, returning the set of keys read and whether any
+        uncached data was read."""
+        keys, uncached = self.keys, self.uncached
+        self.keys = None
+        self.uncached = False
+        return keys, uncached
+
+    def read(self, *keys):
+        if self.keys is not None:
+            self.keys.update(keys)
+
+    def uncached_read(self):
+        if self.keys is not None:
+            self.uncached = True
+
+
+cache_reads = CacheReadRecorder()
+
+
+def _key_version_key(key):
+    return 'keyversion:%s' % key
+
+
+def _key_version_timeout():
+    return getattr(settings, 'LONG_TERM_CACHE_PERIOD', 60 * 60 * 24)
+
+
+def touch_key_version(key):
+    """Records that the cached value for the given key changed.
+
+    The version is the time of the change, so the most recent version of
+    several keys can serve as their last-modified time.
+
+    """
+    cache.set(_key_version_key(key), time.time(), _key_version_timeout())
+
+
+def key_versions(keys, create=False):
+    """Returns the versions of the given cache keys, as a dictionary keyed on
+    cache key.
+
+    Keys with no recorded version are omitted, unless `create` is true, in
+    which case they're given a new version.
+
+    """
+    keys = list(keys)
+    versions = {}
+    found = cache.get_many([_key_version_key(key) for key in keys])
+    for key in keys:
+        version = found.get(_key_version_key(key))
+        if version is None and create:
+            version = time.time()
+            cache.add(_key_version_key(key), version, _key_version_timeout())
+        if version is not None:
+            versions[key] = version
+    return versions
+
+
 class CachingCallback(object):
 
     """A callback class used for cacheable subrequests.
@@ -67,6 +154,8 @@ class CachingTypePadClient(typepad.TypePadClient):
 
     """
 
+    completing_batch = False
+
     def complete_batch(self):
         # check to see if we can provide this from the cache
         requests = []
@@ -79,15 +168,28 @@ class CachingTypePadClient(typepad.TypePadClient):
                 # holds the actual originating callback in this
                 # attribute.
                 cb = cb.orig_callback
+            callback = None
             if hasattr(cb, 'callback'):
                 callback = cb.callback()
                 if isinstance(callback, CachingCallback):
                     if callback.is_cached():
                         continue
+            if not isinstance(callback, CachingCallback):
+                cache_reads.uncached_read()
             requests.append(request)
 
         self.batchrequest.requests = requests
-        super(CachingTypePadClient, self).complete_batch()
+        self.completing_batch = True
+        try:
+            super(CachingTypePadClient, self).complete_batch()
+        finally:
+            self.completing_batch = False
+
+    def request(self, *args, **kwargs):
+        # requests outside of a batch are never served from the cache
+        if not self.completing_batch:
+            cache_reads.uncached_read()
+        return super(CachingTypePadClient, self).request(*args, **kwargs)
 
 
 class CachedTypePadLinkPromise(object):
@@ -128,6 +230,7 @@ class CachedTypePadLinkPromise(object):
         """
 
         cache_key = self.cache_key
+        cache_reads.read(cache_key)
         ids = cache.get(cache_key)
 
         start = self._start
@@ -144,13 +247,15 @@ class CachedTypePadLinkPromise(object):
                 subset = ids[start:end]
                 itemkeys = []
 
-                # if one of our elements is empty, don't bother building
-                # list of ids; this cache is invalid
-                if None not in subset:
+                # if one of our elements is empty (or past the end of the
+                # ids we have), don't bother building list of ids; this
+                # cache is invalid
+                if None not in subset and len(subset) == end - start:
                     for id in subset:
                         itemkeys.append(self._item_cache_key_pattern % id)
 
                 if len(itemkeys) > 0:
+                    cache_reads.read(*itemkeys)
                     itemdict = cache.get_many(itemkeys)
                     for key in itemkeys:
                         if itemdict.get(key) is None:
@@ -175,6 +280,7 @@ class CachedTypePadLinkPromise(object):
 
             if (items is not None) and ((len(items) > 0) or (ids[0] == 0)):
                 log.debug("cache hit for key %s" % cache_key)
+                load_counts(items)
                 l = typepad.ListObject()
                 l._delivered = True
                 l.entries = items
@@ -201,6 +307,18 @@ class CachedTypePadLinkPromise(object):
         del self._inst._cache_callback
 
         self._inst.update_from_response(*args, **kwargs)
+
+        # hmm. we need to rebuild the list cache key based on the
+        # originating url; httpobject changes the _location element
+        # on us, like for member urls with a preferred username
+        # (the username-based urls change to xid urls)
+        # list_key = self.cache_key
+        list_key = 'listcache:' + args[0].split('?')[0]
+        window = '%s:%s:%s' % (list_key, self._start, self._end)
+        if not cache_admission.admit('lists', window, self._start):
+            cache_reads.uncached_read()
+            return
+
         ids = self._id_cache or []
 
         # _start is None or 0, we don't care; start-index can't be less than 1
@@ -221,21 +339,22 @@ class CachedTypePadLinkPromise(object):
                 if hasattr(obj, 'cache_key'):
                     object_key = obj.cache_key
                     log.debug("setting key %s" % object_key)
+                    derive(obj)
                     cache.set(object_key, obj)
+                    touch_key_version(object_key)
+            derive(item)
             cache.set(item_key, item)
+            touch_key_version(item_key)
+            cache_reads.read(item_key)
             ids[idx] = item.xid
             idx += 1
         self._id_cache = ids
 
-        # hmm. we need to rebuild the list cache key based on the
-        # originating url; httpobject changes the _location element
-        # on us, like for member urls with a preferred username
-        # (the username-based urls change to xid urls)
-        # list_key = self.cache_key
-        list_key = 'listcache:' + args[0].split('?')[0]
         log.debug("setting key %s" % list_key)
 
         cache.set(list_key, ids)
+        touch_key_version(list_key)
+        cache_reads.read(list_key)
 
     @property
     def cache_key(self):
@@ -283,6 +402,85 @@ class CachedTypePadLinkPromise(object):
     def __getitem__(self, *args, **kwargs):
         return self._inst.__getitem__(*args, **kwargs)
 
+    def cache_insert(self, entry):
+        """Adds the given new entry to the front of the cached list, and
+        caches the entry itself.
+
+        Returns ``False`` if the cached list can't be updated, in which case
+        it should be invalidated instead.
+
+        """
+        list_key = self.cache_key
+        if not lock_list(list_key):
+            return False
+        try:
+            return self._insert_locked(list_key, entry)
+        finally:
+            unlock_list(list_key)
+
+    def _insert_locked(self, list_key, entry):
+        ids = cache.get(list_key)
+        if ids is None:
+            # nothing to update
+            return True
+        if not ids or ids[0] is None or not entry.xid:
+            return False
+        if entry.xid in ids:
+            return True
+
+        cache_list_entry(entry)
+        ids.insert(1, entry.xid)
+        ids[0] += 1
+        save_list_ids(list_key, ids)
+        log.debug("inserted %s into key %s" % (entry.xid, list_key))
+        return True
+
+    def cache_remove(self, xid):
+        """Removes the entry with the given TypePad identifier (or whose
+        embedded object has that identifier, as for events) from the cached
+        list.
+
+        Returns ``False`` if the cached list can't be updated, in which case
+        it should be invalidated instead.
+
+        """
+        list_key = self.cache_key
+        if not lock_list(list_key):
+            return False
+        try:
+            return self._remove_locked(list_key, xid)
+        finally:
+            unlock_list(list_key)
+
+    def _remove_locked(self, list_key, xid):
+        ids = cache.get(list_key)
+        if ids is None:
+            return True
+        if not ids or ids[0] is None:
+            return False
+
+        complete = len(ids) > ids[0] and None not in ids[1:ids[0] + 1]
+        if xid in ids[1:]:
+            index = ids.index(xid, 1)
+        else:
+            itemkeys = dict((self._item_cache_key_pattern % id, id)
+                for id in ids[1:] if id is not None)
+            items = cache.get_many(itemkeys.keys())
+            if len(items) < len(itemkeys):
+                return False
+            matches = [itemkeys[key] for key, item in items.iteritems()
+                if getattr(getattr(item, 'object', None), 'xid', None) == xid]
+            if not matches:
+                # it's not in the list, unless it's in a part we haven't seen
+                return complete
+            index = ids.index(matches[0], 1)
+
+        del ids[index]
+        ids[0] -= 1
+        save_list_ids(list_key, ids)
+        log.debug("removed %s from key %s" % (xid, list_key))
+        return True
+
     def filter(self, *args, **kwargs):
         """Passes through the requested filter operation to the underlying
         `ListObject`, but keeps track of any ``start_index`` and
@@ -306,6 +504,71 @@ class CachedTypePadLinkPromise(object):
         return self
 
 
+def cache_list_entry(entry):
+    """Caches an entry of a TypePad list (and the object embedded in it, as
+    for events) under its own key."""
+    if hasattr(entry, 'object'):
+        obj = entry.object
+        if hasattr(obj, 'cache_key'):
+            derive(obj)
+            cache.set(obj.cache_key, obj)
+            touch_key_version(obj.cache_key)
+    derive(entry)
+    cache.set(entry.cache_key, entry)
+    touch_key_version(entry.cache_key)
+
+
+def lock_list(list_key, timeout=30):
+    """Takes the lock for changing the cached identifiers of the given
+    TypePad list in place, returning whether it was taken.
+
+    If another process holds the lock, the holder is told its change is
+    contended and ``False`` is returned; the caller should then invalidate
+    the list rather than change it. Release the lock with `unlock_list()`.
+
+    """
+    lock_key = 'listlock:%s' % list_key
+    if cache.add(lock_key, 0, timeout):
+        return True
+    try:
+        cache.incr(lock_key)
+    except ValueError:
+        # it was just released
+        pass
+    log.debug("contended update of key %s" % list_key)
+    return False
+
+
+def unlock_list(list_key):
+    """Releases the lock taken with `lock_list()`.
+
+    If another process tried to change the list while the lock was held,
+    the list is invalidated, since the other process's change is lost.
+    Returns whether the list was left as the lock holder saved it.
+
+    """
+    lock_key = 'listlock:%s' % list_key
+    contended = cache.get(lock_key) != 0
+    cache.delete(lock_key)
+    if contended:
+        invalidate_key(list_key)
+    return not contended
+
+
+def save_list_ids(list_key, ids):
+    """Caches the array of identifiers of a TypePad list that has changed
+    (its total, then the identifiers of its entries in order).
+
+    Hold the list's lock (see `lock_list()`) while reading and saving the
+    identifiers.
+
+    """
+    cache.set(list_key, ids)
+    touch_key_version(list_key)
+    # the pages of the list have moved
+    cache.delete(_cursor_index_key(list_key))
+
+
 class CachedTypePadObject(object):
 
     """A caching class for wrapping a method that returns a single
@@ -331,6 +594,7 @@ class CachedTypePadObject(object):
             return self.func(*args, **kwargs)
 
         key = self.cache_key % args[0]
+        cache_reads.read(key)
         obj = cache.get(key)
         if obj is not None:
             return obj
@@ -339,8 +603,13 @@ class CachedTypePadObject(object):
         def cache_callback(*args, **kwargs):
             del obj._cache_callback
             obj.update_from_response(*args, **kwargs)
+            if not cache_admission.admit('objects', key):
+                cache_reads.uncached_read()
+                return
             log.debug("setting key %s" % key)
+            derive(obj)
             cache.set(key, obj)
+            touch_key_version(key)
 
         kwargs['callback'] = cache_callback
         obj = self.func(*args, **kwargs)
@@ -382,6 +651,54 @@ class CachedTypePadLink(object):
 cache_link = CachedTypePadLink
 
 
+def _cursor_index_key(list_key):
+    return 'cursorindex:%s' % list_key
+
+
+class CursorIndex(object):
+
+    """Remembers where the pages of a paginated TypePad stream start.
+
+    For each page of a stream that's been shown, the index keeps the token
+    with which to request the page after it. The index is kept in the shared
+    cache with the list (see `CachedTypePadLinkPromise`), and is discarded
+    when the list is invalidated.
+
+    """
+
+    max_pages = 1000
+
+    def __init__(self, location):
+        list_key = 'listcache:%s' % location.split('?')[0]
+        self.key = _cursor_index_key(list_key)
+        self._tokens = None
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = cache.get(self.key) or {}
+        return self._tokens
+
+    def start_token(self, number):
+        """Returns the token with which to request the given page of a
+        stream, or ``None`` if it isn't known."""
+        return self.tokens.get(number - 1)
+
+    def record(self, number, page):
+        """Records the token for the page after the given page from the
+        delivered `StreamObject` holding it."""
+        token = getattr(page, 'more_results_token', None)
+        if token is None:
+            return
+        tokens = self.tokens
+        if tokens.get(number) == token:
+            return
+        if len(tokens) >= self.max_pages:
+            tokens.clear()
+        tokens[number] = token
+        cache.set(self.key, tokens, _key_version_timeout())
+
+
 def _expand_cache_keys(item):
     if hasattr(item, 'cache_key'):
         value = item.cache_key
@@ -434,8 +751,658 @@ class CacheInvalidator(object):
     def __call__(self, sender, **kwargs):
         keys = self.cache_key(sender, **kwargs)
         for key in keys:
-            log.debug("invalidating key %s" % key)
-            cache.delete(key)
+            invalidate_key(key)
 
 
 invalidate_rule = CacheInvalidator
+
+
+def invalidate_key(key):
+    """Discards the cached value with the given key."""
+    log.debug("invalidating key %s" % key)
+    cache.delete(key)
+    touch_key_version(key)
+    if isinstance(key, basestring) and key.startswith('listcache:'):
+        cache.delete(_cursor_index_key(key))
+
+
+class CacheListWriter(object):
+    """Updates cached TypePad lists in place as objects are added to and
+    removed from them.
+
+    When one of the ``added`` signals is sent, the object returned by the
+    `target` callable is put at the front of each cached list returned by
+    the `key` callable (as the list entry returned by `entry`, if given), and
+    cached itself, so the next request for the list needn't fetch it from
+    TypePad again. When one of the ``removed`` signals is sent, the object is
+    removed from the lists the same way. Lists that can't be updated
+    consistently are invalidated instead, as by a `CacheInvalidator`.
+
+    """
+
+    def __init__(self, key, target, added=(), removed=(), entry=None, name=None):
+        self.key = key
+        self.target = target
+        self.entry = entry
+        self.name = name
+
+        for signal in added:
+            signal.connect(self.insert)
+        for signal in removed:
+            signal.connect(self.remove)
+
+    def _lists(self, sender, **kwargs):
+        lists = self.key(sender, **kwargs)
+        if not isinstance(lists, list):
+            lists = [lists]
+        # (a list's truth would be its length, which would fetch it)
+        return [l for l in lists if hasattr(l, 'cache_key')
+            or isinstance(l, basestring) and l]
+
+    def _update(self, lists, update):
+        for l in lists:
+            try:
+                updated = update(l)
+            except Exception, exc:
+                log.debug("could not update list %r: %s" % (l, exc))
+                updated = False
+            if not updated:
+                for key in _expand_cache_keys(l):
+                    invalidate_key(key)
+
+    def insert(self, sender, **kwargs):
+        lists = self._lists(sender, **kwargs)
+        if not lists:
+            return
+        obj = self.target(sender, **kwargs)
+        if obj and self.entry is not None:
+            entry = self.entry(obj)
+        else:
+            entry = obj
+        self._update(lists, lambda l: bool(entry) and l.cache_insert(entry))
+
+    def remove(self, sender, **kwargs):
+        lists = self._lists(sender, **kwargs)
+        if not lists:
+            return
+        obj = self.target(sender, **kwargs)
+        xid = obj and obj.xid
+        self._update(lists, lambda l: bool(xid) and l.cache_remove(xid))
+
+
+write_through_rule = CacheListWriter
+
+
+_counters = []
+
+
+class CacheCounter(object):
+    """A count for each object of a TypePad class, kept in the cache.
+
+    The count starts out as the object's `field` when the object is fetched
+    from TypePad, and is then atomically incremented and decremented as the
+    ``increment`` and ``decrement`` signals are sent, so it stays current
+    without fetching the object (or a list just to count it) again. The
+    `target` callable returns the object counted for a signal, as with a
+    `CacheInvalidator` key. Counts are reconciled with the API's figure each
+    time the object is fetched again.
+
+    Once the counter is `install()`ed, reading the object's `field` returns
+    the count.
+
+    """
+
+    def __init__(self, cls, field, target, increment=(), decrement=(), name=None):
+        self.cls = cls
+        self.field = field
+        self.target = target
+        self.name = name or field
+        self.raw_field = None
+        for base in cls.__mro__:
+            if field in base.__dict__:
+                self.raw_field = base.__dict__[field]
+                break
+
+        for signal in increment:
+            signal.connect(self.increment)
+        for signal in decrement:
+            signal.connect(self.decrement)
+        _counters.append(self)
+
+    def install(self):
+        """Makes the counted class's `field` read the count."""
+        setattr(self.cls, self.field, CountedField(self))
+
+    def cache_key(self, obj):
+        return 'counter:%s:%s' % (self.name, obj.cache_key)
+
+    def field_value(self, obj):
+        """Returns the object's `field` as it was fetched from TypePad."""
+        if hasattr(self.raw_field, '__get__'):
+            return self.raw_field.__get__(obj, type(obj))
+        return getattr(obj, self.field, None)
+
+    def _timeout(self):
+        return getattr(settings, 'LONG_TERM_CACHE_PERIOD', 60 * 60 * 24)
+
+    def get(self, obj):
+        """Returns the current count for the given object.
+
+        The count is read from the cache once for each object (see
+        `load_counts()`) and held on the object after that.
+
+        """
+        counts = obj.__dict__.get('_counts')
+        if counts is None or self.name not in counts:
+            load_counts([obj])
+            counts = obj.__dict__['_counts']
+        return counts[self.name]
+
+    def hold(self, obj, value):
+        obj.__dict__.setdefault('_counts', {})[self.name] = value
+
+    def reconcile(self, obj):
+        """Resets the count for the given object to its `field`, as just
+        fetched from TypePad."""
+        value = self.field_value(obj)
+        if value is None:
+            return
+        key = self.cache_key(obj)
+        if cache.get(key) != value:
+            cache.set(key, value, self._timeout())
+            touch_key_version(key)
+        self.hold(obj, value)
+
+    def add(self, obj, delta):
+        key = self.cache_key(obj)
+        try:
+            # memcached won't incr by a negative delta
+            if delta < 0:
+                value = cache.decr(key, -delta)
+            else:
+                value = cache.incr(key, delta)
+        except ValueError:
+            value = None
+        if value is None:
+            # not counted (or evicted), so the cached object's own count
+            # is all there is; have it fetched again
+            obj.__dict__.pop('_counts', None)
+            invalidate_key(obj.cache_key)
+            return
+        if value < 0:
+            # memcached stops at zero, but other backends don't
+            value = 0
+            cache.set(key, value, self._timeout())
+        self.hold(obj, value)
+        log.debug("counted %+d for key %s" % (delta, key))
+        touch_key_version(key)
+        # so fragments and validators depending on the object are rebuilt
+        touch_key_version(obj.cache_key)
+
+    def increment(self, sender, **kwargs):
+        obj = self.target(sender, **kwargs)
+        if obj:
+            self.add(obj, 1)
+
+    def decrement(self, sender, **kwargs):
+        obj = self.target(sender, **kwargs)
+        if obj:
+            self.add(obj, -1)
+
+
+def load_counts(objs):
+    """Reads the counts kept by `CacheCounter` counters for the given
+    objects (and the objects they hold, as events hold assets) with one
+    request to the cache, and holds them on the objects."""
+    wanted = {}
+    for obj in objs:
+        for counted in (obj, getattr(obj, 'object', None)):
+            if counted is None:
+                continue
+            counts = counted.__dict__.get('_counts', {})
+            for counter in _counters:
+                if isinstance(counted, counter.cls) and counter.name not in counts:
+                    wanted[counter.cache_key(counted)] = (counter, counted)
+    if not wanted:
+        return
+
+    values = cache.get_many(wanted.keys())
+    # a missing count is the object's own, which is read already
+    cache_reads.read(*values.keys())
+    for key, (counter, counted) in wanted.iteritems():
+        value = values.get(key)
+        if value is None:
+            value = counter.field_value(counted)
+        else:
+            value = max(int(value), 0)
+        counter.hold(counted, value)
+
+
+class CountedField(object):
+    """Stands in for a field of a TypePad class, reading the count kept by
+    a `CacheCounter` instead."""
+
+    def __init__(self, counter):
+        self.counter = counter
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self.counter.raw_field
+        return self.counter.get(obj)
+
+    def __set__(self, obj, value):
+        self.counter.raw_field.__set__(obj, value)
+
+
+count_rule = CacheCounter
+
+
+class LocalCacheStamp(object):
+    """A version stamp for data that each process also keeps in memory.
+
+    Objects like the TypePad application, group and group admin list are
+    held in process for a long time, so that most requests need not even ask
+    the shared cache for them. When such data changes, `bump()` the stamp: it
+    stores a new version in the shared cache, and every process then sees
+    the new version and discards its local copy.
+
+    To keep checking cheap, a process asks the shared cache for the current
+    version at most once every ``interval`` seconds (by default, the
+    ``LOCAL_CACHE_CHECK_INTERVAL`` setting).
+
+    """
+
+    def __init__(self, name, signals=None, interval=None):
+        self.name = name
+        self.key = 'stamp:%s' % name
+        self.interval = interval
+        self._version = None
+        self._checked = 0
+
+        # If signals are provided, bump the stamp for each of them.
+        if signals is not None:
+            for signal in signals:
+                signal.connect(self.bump)
+
+    def _timeout(self):
+        # an expired stamp only costs each process one refresh
+        return getattr(settings, 'LONG_TERM_CACHE_PERIOD', 60 * 60 * 24)
+
+    def _new_version(self):
+        return '%f:%d' % (time.time(), random.randint(0, 1000000))
+
+    def version(self):
+        """Returns the current version of the stamp."""
+        interval = self.interval
+        if interval is None:
+            interval = getattr(settings, 'LOCAL_CACHE_CHECK_INTERVAL', 10)
+
+        now = time.time()
+        if self._version is None or self._checked + interval <= now:
+            version = cache.get(self.key)
+            if version is None:
+                # No one has stamped yet, or the stamp was evicted. Either
+                # way, any local copies are suspect, so start a new version.
+                cache.add(self.key, self._new_version(), self._timeout())
+                version = cache.get(self.key)
+            self._version = version
+            self._checked = now
+        return self._version
+
+    def bump(self, sender=None, **kwargs):
+        """Marks data held under this stamp as changed for all processes."""
+        log.debug("bumping stamp %s" % self.key)
+        self._version = self._new_version()
+        self._checked = time.time()
+        cache.set(self.key, self._version, self._timeout())
+
+
+local_cache_stamp = LocalCacheStamp
+
+
+class CacheStats(object):
+    """Counts the hits and misses of typepadapp's caches in this process.
+
+    Each cache records its lookups under its own name, so its hit ratio can
+    be reported with `hit_ratio()` or, for all caches at once, `report()`.
+
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, hit):
+        """Counts a lookup in the named cache as a hit or a miss."""
+        self.lock.acquire()
+        try:
+            counts = self.counts.setdefault(name, [0, 0])
+            counts[not hit] += 1
+        finally:
+            self.lock.release()
+
+    def hit(self, name):
+        self.record(name, True)
+
+    def miss(self, name):
+        self.record(name, False)
+
+    def hit_ratio(self, name):
+        """Returns the fraction of lookups in the named cache that were hits,
+        or ``None`` if there have been no lookups."""
+        hits, misses = self.counts.get(name, (0, 0))
+        if not hits + misses:
+            return None
+        return float(hits) / (hits + misses)
+
+    def report(self):
+        """Returns a dictionary of ``(hits, misses, hit ratio)`` tuples,
+        keyed on cache name."""
+        return dict([(name, (hits, misses, self.hit_ratio(name)))
+            for name, (hits, misses) in self.counts.items()])
+
+    def reset(self):
+        self.lock.acquire()
+        try:
+            self.counts.clear()
+        finally:
+            self.lock.release()
+
+
+cache_stats = CacheStats()
+"""The `CacheStats` counters for this process."""
+
+
+class FrequencySketch(object):
+
+    """Estimates how many times keys have been seen, in fixed memory.
+
+    This is a count-min sketch: each key increments one counter in each of
+    four rows, and its count is estimated as the smallest of them. Every
+    `sample_size` increments, all the counters are halved, so keys that
+    were popular long ago don't stay popular forever.
+
+    """
+
+    depth = 4
+
+    def __init__(self, width=4096, sample_size=None):
+        self.width = width
+        self.sample_size = sample_size or width * 10
+        self.rows = [[0] * width for i in range(self.depth)]
+        self.additions = 0
+        self.lock = threading.Lock()
+
+    def _indexes(self, key):
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        width = self.width
+        return [n % width for n in struct.unpack('<4I', hashlib.md5(key).digest())]
+
+    def estimate(self, key):
+        """Returns the estimated number of times the key has been seen."""
+        rows = self.rows
+        return min([rows[i][n] for i, n in enumerate(self._indexes(key))])
+
+    def increment(self, key):
+        """Counts a sighting of the key, returning its new estimated
+        count."""
+        indexes = self._indexes(key)
+        self.lock.acquire()
+        try:
+            rows = self.rows
+            for i, n in enumerate(indexes):
+                rows[i][n] += 1
+            self.additions += 1
+            if self.additions >= self.sample_size:
+                self.age()
+            return min([rows[i][n] for i, n in enumerate(indexes)])
+        finally:
+            self.lock.release()
+
+    def age(self):
+        """Halves all the counts."""
+        for row in self.rows:
+            row[:] = [count >> 1 for count in row]
+        self.additions >>= 1
+
+
+class CacheAdmission(object):
+
+    """Decides which TypePad lists and objects are stored in the cache.
+
+    With the ``CACHE_ADMISSION`` setting, values fetched from TypePad are
+    only stored once they've been fetched ``CACHE_ADMISSION_THRESHOLD``
+    times (as counted by a `FrequencySketch`), so one-off requests don't
+    evict popular entries. Windows of lists starting past the
+    ``CACHE_ADMISSION_MAX_START`` item, and everything fetched for requests
+    from user agents matching ``CACHE_ADMISSION_CRAWLERS``, are never stored.
+    Values that aren't stored are still returned as usual.
+
+    Decisions are counted in `cache_stats` as ``admission:lists`` and
+    ``admission:objects``, with admitted values as hits and rejected values
+    as misses.
+
+    """
+
+    def __init__(self):
+        self.sketch = FrequencySketch()
+        self.local = threading.local()
+
+    def begin(self, request):
+        """Notes the kind of user agent the current request is from."""
+        crawlers = getattr(settings, 'CACHE_ADMISSION_CRAWLERS',
+            r'bot|crawl|spider|slurp')
+        agent = request.META.get('HTTP_USER_AGENT', '')
+        self.local.crawler = bool(crawlers and re.search(crawlers, agent, re.I))
+
+    def end(self, sender=None, **kwargs):
+        self.local.crawler = False
+
+    def admit(self, kind, key, start=None):
+        """Returns whether to store the value for the given key (the window
+        of a list beginning at index `start`, or an object) in the cache."""
+        if not getattr(settings, 'CACHE_ADMISSION', False):
+            return True
+        admitted = self._admit(key, start)
+        cache_stats.record('admission:%s' % kind, admitted)
+        return admitted
+
+    def _admit(self, key, start):
+        if getattr(self.local, 'crawler', False):
+            return False
+        max_start = getattr(settings, 'CACHE_ADMISSION_MAX_START', 250)
+        if start is not None and max_start is not None and start > max_start:
+            return False
+        threshold = getattr(settings, 'CACHE_ADMISSION_THRESHOLD', 2)
+        return self.sketch.increment(key) >= threshold
+
+
+cache_admission = CacheAdmission()
+"""The `CacheAdmission` policy for this process."""
+request_finished.connect(cache_admission.end)
+
+
+class MemoCache(object):
+    """A bounded in-process cache, backed by the shared cache.
+
+    Values are kept in process for the `size` most recently stored keys;
+    older keys are discarded first. Values not found in process are looked
+    for in the shared cache (under ``<prefix>:<key>``), and stored there for
+    `timeout` seconds. Lookups are counted in `cache_stats` under the
+    prefix.
+
+    """
+
+    def __init__(self, prefix, size=1000, timeout=None):
+        self.prefix = prefix
+        self.size = size
+        self.timeout = timeout
+        self.values = {}
+        self.order = deque()
+        self.lock = threading.Lock()
+
+    def _remember(self, key, value):
+        self.lock.acquire()
+        try:
+            if key not in self.values:
+                self.order.append(key)
+                while len(self.order) > self.size:
+                    del self.values[self.order.popleft()]
+            self.values[key] = value
+        finally:
+            self.lock.release()
+
+    def get(self, key):
+        """Returns the value for the given key, or ``None`` if there is
+        none in process or in the shared cache."""
+        try:
+            value = self.values[key]
+        except KeyError:
+            value = cache.get('%s:%s' % (self.prefix, key))
+            if value is not None:
+                self._remember(key, value)
+        cache_stats.record(self.prefix, value is not None)
+        return value
+
+    def set(self, key, value):
+        self._remember(key, value)
+        timeout = self.timeout
+        if timeout is None:
+            timeout = getattr(settings, 'LONG_TERM_CACHE_PERIOD', 60 * 60 * 24)
+        cache.set('%s:%s' % (self.prefix, key), value, timeout)
+
+    def clear(self):
+        """Forgets the values held in process."""
+        self.lock.acquire()
+        try:
+            self.values.clear()
+            self.order.clear()
+        finally:
+            self.lock.release()
+
+
+_derivers = {}
+_class_derivers = {}
+
+
+def deriver(cls, name, version=1):
+    """Registers the decorated function as the deriver of the field `name`
+    of `cls` instances.
+
+    Derivers compute render-ready values (such as sanitized HTML) from an
+    object's fields. They're run by `derive()` when the object is stored in
+    the cache, so the values are cached with it; use `derived()` to read
+    them. Change the `version` when the deriver changes, and values derived
+    by the old deriver are recomputed as they're read.
+
+    """
+    def register(fn):
+        _track_derived(cls)
+        _derivers.setdefault(cls, {})[name] = (version, fn)
+        _class_derivers.clear()
+        return fn
+    return register
+
+
+def _track_derived(cls):
+    """Makes instances of `cls` keep their derived fields when they're
+    pickled, and discard them when their data changes."""
+    if getattr(cls, '_tracks_derived', False):
+        return
+    statefields = cls.statefields.im_func
+    update_from_response = cls.update_from_response.im_func
+    setattr_ = cls.__setattr__
+
+    def tracked_statefields(cls):
+        return statefields(cls) + ['_derived']
+
+    def tracked_update_from_response(self, *args, **kwargs):
+        self.__dict__.pop('_derived', None)
+        return update_from_response(self, *args, **kwargs)
+
+    def tracked_setattr(self, name, value):
+        if name in self.fields:
+            self.__dict__.pop('_derived', None)
+        setattr_(self, name, value)
+
+    cls.statefields = classmethod(tracked_statefields)
+    cls.update_from_response = tracked_update_from_response
+    cls.__setattr__ = tracked_setattr
+    cls._tracks_derived = True
+
+
+def _derivers_for(cls):
+    try:
+        return _class_derivers[cls]
+    except KeyError:
+        found = {}
+        for base in reversed(cls.__mro__):
+            found.update(_derivers.get(base, {}))
+        _class_derivers[cls] = found
+        return found
+
+
+_preparers = []
+
+
+def preparer(fn):
+    """Registers the decorated function to be called with every object
+    `derive()` is called with, to store other precomputed values with it
+    before it's cached."""
+    _preparers.append(fn)
+    return fn
+
+
+@preparer
+def reconcile_counters(obj):
+    for counter in _counters:
+        if isinstance(obj, counter.cls):
+            counter.reconcile(obj)
+
+
+def derive(obj):
+    """Computes all the derived fields of the given object, to be stored
+    with it in the cache."""
+    for fn in _preparers:
+        try:
+            fn(obj)
+        except Exception, exc:
+            log.debug("could not prepare %r with %s: %s" % (obj, fn.__name__, exc))
+
+    fields = {}
+    for name, (version, fn) in _derivers_for(type(obj)).iteritems():
+        try:
+            fields[name] = (version, fn(obj))
+        except Exception, exc:
+            # leave it for derived() to compute (or fail on) when it's used
+            log.debug("could not derive %s of %r: %s" % (name, obj, exc))
+    if fields:
+        obj.__dict__['_derived'] = fields
+    else:
+        obj.__dict__.pop('_derived', None)
+
+
+def derived(obj, name):
+    """Returns the derived field `name` of the given object, computing it if
+    it wasn't derived when the object was cached or its deriver changed."""
+    version, fn = _derivers_for(type(obj))[name]
+    fields = obj.__dict__.get('_derived')
+    if fields is not None:
+        try:
+            field_version, value = fields[name]
+        except KeyError:
+            pass
+        else:
+            if field_version == version:
+                return value
+
+    value = fn(obj)
+    # don't keep values computed from a promised object's missing data
+    if obj.__dict__.get('_delivered', True):
+        obj.__dict__.setdefault('_derived', {})[name] = (version, value)
+    return value
+
+
+# imported last, as typepadapp.middleware itself uses this module
+from typepadapp.middleware.debug import RequestStatTracker
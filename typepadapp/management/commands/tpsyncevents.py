@@ -0,0 +1,85 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+from optparse import make_option
+import time
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+
+class Command(NoArgsCommand):
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--once',
+            action='store_true',
+            help='Sync once and exit, instead of syncing until interrupted'),
+        make_option('-i', '--interval',
+            action='store',
+            dest='interval',
+            type='int',
+            metavar='<seconds>',
+            help='How often to sync (defaults to the EVENT_SYNC_INTERVAL setting)'),
+        make_option('-w', '--window',
+            action='store',
+            dest='window',
+            type='int',
+            metavar='<count>',
+            help='How many of the newest events to fetch each time (defaults to the EVENT_SYNC_WINDOW setting)'),
+        )
+
+    help = ("Keeps the cached event list of your TypePad application's group "
+        "in step with TypePad by repeatedly fetching only its newest events.")
+
+    def handle_noargs(self, **options):
+        import typepadapp.models
+        from typepadapp.utils.eventsync import EventSyncer
+        from typepadapp.utils.warmup import warm_up_application
+
+        warm_up_application()
+        group = typepadapp.models.GROUP
+        if group is None:
+            raise CommandError("Your TypePad application has no group to sync events for.")
+
+        syncer = EventSyncer(group.url_id, window=options.get('window'),
+            interval=options.get('interval'))
+        verbosity = int(options.get('verbosity', 1))
+        while True:
+            try:
+                result = syncer.sync()
+            except Exception, exc:
+                if options.get('once'):
+                    raise CommandError("Could not sync events: %s" % exc)
+                print "Could not sync events: %s" % exc
+            else:
+                if verbosity > 0:
+                    print "%s %s" % (time.strftime('%Y-%m-%d %H:%M:%S'), result)
+            if options.get('once'):
+                break
+            time.sleep(syncer.interval)
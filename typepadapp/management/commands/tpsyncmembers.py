@@ -0,0 +1,62 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+
+class Command(NoArgsCommand):
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--full',
+            action='store_true',
+            help='Request every page of memberships, and remove members who have left the group'),
+        )
+
+    help = ("Brings the local directory of the members of your TypePad "
+        "application's group up to date (see the MEMBER_DIRECTORY setting).")
+
+    def handle_noargs(self, **options):
+        import typepadapp.models
+        from typepadapp.models import members
+        from typepadapp.utils.warmup import warm_up_application
+
+        if not members.directory_enabled():
+            raise CommandError("The member directory isn't in use; set MEMBER_DIRECTORY to use it.")
+
+        warm_up_application()
+        group = typepadapp.models.GROUP
+        if group is None:
+            raise CommandError("Your TypePad application has no group to sync members of.")
+
+        counts = members.refresh_members(group, full=options.get('full'))
+        if int(options.get('verbosity', 1)) > 0:
+            print "%(added)d added, %(updated)d updated, %(removed)d removed" % counts
@@ -0,0 +1,51 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+from django.core.management.base import NoArgsCommand
+
+
+class Command(NoArgsCommand):
+
+    help = ("Loads the TypePad application, group, group admins and "
+        "configured templates, populating the shared cache, and reports "
+        "how long each step took. With --verbosity=2, also reports how long "
+        "each template cached by typepadapp.cached_templates took to compile.")
+
+    def handle_noargs(self, **options):
+        from typepadapp.cached_templates import compile_report
+        from typepadapp.utils.warmup import warm_up
+
+        report = warm_up()
+        for name, elapsed in report:
+            print "%-12s %.3f seconds" % (name, elapsed)
+        print "%-12s %.3f seconds" % ('total', sum([e for n, e in report]))
+
+        if int(options.get('verbosity', 1)) > 1:
+            for template_name, elapsed in compile_report():
+                print "%-40s %.3f seconds" % (template_name, elapsed)
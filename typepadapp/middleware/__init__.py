@@ -44,8 +44,10 @@ from django.db import DatabaseError
 from oauth import oauth
 
 import typepad
+from typepadapp.caching import local_cache_stamp
 from typepadapp.models.auth import OAuthClient
 import typepadapp.models
+from typepadapp import signals
 from batchhttp.client import NonBatchResponseError
 
 
@@ -153,11 +155,27 @@ class UserAgentMiddleware(object):
         return None
 
 
+application_stamp = local_cache_stamp('application')
+"""Version stamp for the application and group held in process by
+`ApplicationMiddleware`."""
+
+
+def invalidate_application(sender, **kwargs):
+    """Discards the cached application and group in every process."""
+    cache.delete('application:%s' % settings.OAUTH_CONSUMER_KEY)
+    cache.delete('group:%s' % settings.OAUTH_CONSUMER_KEY)
+    application_stamp.bump()
+
+signals.group_webhook.connect(invalidate_application)
+
+
 class ApplicationMiddleware(object):
 
     def __init__(self):
-        self.app = None
-        self.group = None
+        # start with the app and group from a warm-up, if there was one
+        self.app = typepadapp.models.APPLICATION
+        self.group = typepadapp.models.GROUP
+        self.version = typepadapp.models.APPLICATION_VERSION
 
     def discover_app_and_group(self, request):
         log = logging.getLogger('.'.join((self.__module__, self.__class__.__name__)))
@@ -166,6 +184,14 @@ class ApplicationMiddleware(object):
         app_key = 'application:%s' % settings.OAUTH_CONSUMER_KEY
         group_key = 'group:%s' % settings.OAUTH_CONSUMER_KEY
 
+        # drop our in-process app/group if another process changed them
+        version = application_stamp.version()
+        if self.version is not None and self.version != version:
+            log.info('TypePad application info changed; reloading')
+            self.app = None
+            self.group = None
+        self.version = version
+
         # we cache in-process and in cache to support both situtations
         # where a cache is unavailable (cache is dummy), and situtations
         # where the application persistence is poor (Google App Engine)
@@ -33,12 +33,17 @@ from typepadapp.models.groups import *
 from typepadapp.models.users import *
 from typepadapp.models.profiles import *
 from typepadapp.models.feedsub import *
+import typepadapp.models.renditions
+import typepadapp.models.members
 
 
 APPLICATION, GROUP = None, None
+APPLICATION_VERSION = None
 
 
 import typepadapp.signals
+import typepadapp.utils.hubpublish
 import typepadapp.utils.loading
+import typepadapp.utils.warmup
 
 typepadapp.signals.post_start.send(None)
@@ -30,7 +30,9 @@
 import re
 from urlparse import urljoin
 
-from django.core.urlresolvers import reverse, NoReverseMatch
+from django.core.urlresolvers import NoReverseMatch
+from django.template.defaultfilters import wordcount
+from django.utils.html import strip_tags
 from django.utils.translation import ugettext as _
 from django.conf import settings
 
@@ -40,6 +42,8 @@ import typepad
 from typepad.tpobject import ListObject
 
 from typepadapp import signals
+from typepadapp.caching import deriver, derived
+from typepadapp.utils.urls import reverse
 import typepadapp.models
 
 
@@ -60,13 +64,7 @@ class Asset(typepad.Asset):
 
     def get_absolute_url(self):
         """Relative url to the asset permalink page."""
-        if self.is_local:
-            try:
-                return reverse('asset', args=[self.url_id])
-            except NoReverseMatch:
-                pass
-
-        return self.permalink_url
+        return derived(self, 'absolute_url')
 
     @property
     def feed_url(self):
@@ -79,7 +77,18 @@ class Asset(typepad.Asset):
 
     @property
     def type_id(self):
-        return (self.object_type or self._class_object_type).lower()
+        return derived(self, 'type_id')
+
+    @property
+    def sanitized_content(self):
+        """The asset's content, with unsafe markup removed by the
+        ``sanitizetags`` filter."""
+        return derived(self, 'sanitized_content')
+
+    @property
+    def word_count(self):
+        """The number of words in the asset's content, without markup."""
+        return derived(self, 'word_count')
 
     @property
     def type_label(self):
@@ -128,13 +137,7 @@ typepad.api.AssetRef.type_label = property(asset_ref_type_label)
 
 
 class Comment(typepad.Comment, Asset):
-
-    def get_absolute_url(self):
-        """Relative URL to the comment anchor on the asset permalink page."""
-        try:
-            return '%s#comment-%s' % (reverse('asset', args=[self.in_reply_to.url_id]), self.url_id)
-        except NoReverseMatch:
-            return None
+    pass
 
 
 class Favorite(typepad.Favorite, Asset):
@@ -241,21 +244,7 @@ class Link(typepad.Link, Asset):
         that may be returned from the link, but this would be an option upon
         creation of the asset, not upon rendering.
         """
-        try:
-            title = self.title
-            assert title is not None and title != ''
-            return title
-        except:
-            pass
-
-        # use link as the display'd value; needs a shave and a haircut tho
-        link = self.link
-        link = re.sub('^https?://(?:.+?@)?', '', link)
-        link = re.sub('^www\.', '', link)
-        link = re.sub('\?.+$', '', link)
-        link = re.sub('/(?:default|index)(\.\w+)?$', '', link)
-        link = re.sub('/$', '', link)
-        return link
+        return derived(self, 'link_title')
 
     def get_link(self):
         import logging
@@ -281,6 +270,10 @@ class Link(typepad.Link, Asset):
 
 class Event(typepad.Event):
 
+    new_asset_url_id = 'new-%s'
+    """The format of the ``url_id`` of events made by `for_new_asset()`,
+    given the asset's ``xid``."""
+
     @property
     def is_new_asset(self):
         return self.verb == 'NewAsset'
@@ -294,11 +287,90 @@ class Event(typepad.Event):
         return self.object and isinstance(self.object, Asset) \
             and self.object.is_local
 
+    @classmethod
+    def for_new_asset(cls, asset):
+        """Makes a ``NewAsset`` event for an asset that was just posted, to
+        stand in for TypePad's own event in cached event lists until they're
+        next fetched.
+
+        Returns ``None`` for comments, and for assets that don't have the
+        details an event needs (their lists are invalidated instead).
+
+        """
+        if isinstance(asset, Comment) or not asset.xid \
+            or asset.author is None or asset.published is None:
+            return None
+        url_id = cls.new_asset_url_id % asset.xid
+        event = cls(id='tag:api.typepad.com,2009:%s' % url_id, url_id=url_id,
+            verb='NewAsset', verbs=['tag:api.typepad.com,2009:NewAsset'],
+            actor=asset.author, object=asset, published=asset.published)
+        event._delivered = True
+        return event
+
+
+### Derived fields, computed when assets are cached (see typepadapp.caching)
+
+@deriver(Asset, 'absolute_url')
+def asset_absolute_url(asset):
+    if asset.is_local:
+        try:
+            return reverse('asset', args=[asset.url_id])
+        except NoReverseMatch:
+            pass
+
+    return asset.permalink_url
+
+
+@deriver(Comment, 'absolute_url')
+def comment_absolute_url(comment):
+    """Relative URL to the comment anchor on the asset permalink page."""
+    try:
+        return '%s#comment-%s' % (reverse('asset', args=[comment.in_reply_to.url_id]), comment.url_id)
+    except NoReverseMatch:
+        return None
+
+
+@deriver(Asset, 'type_id')
+def asset_type_id(asset):
+    return (asset.object_type or asset._class_object_type).lower()
+
+
+@deriver(Asset, 'sanitized_content')
+def asset_sanitized_content(asset):
+    from typepadapp.templatetags.generic_filters import sanitizetags
+    if not asset.content:
+        return u''
+    return sanitizetags(asset.content)
+
+
+@deriver(Asset, 'word_count')
+def asset_word_count(asset):
+    return wordcount(strip_tags(asset.content or ''))
+
+
+@deriver(Link, 'link_title')
+def link_link_title(link):
+    try:
+        title = link.title
+        assert title is not None and title != ''
+        return title
+    except:
+        pass
+
+    # use link as the display'd value; needs a shave and a haircut tho
+    url = link.target_url
+    url = re.sub('^https?://(?:.+?@)?', '', url)
+    url = re.sub('^www\.', '', url)
+    url = re.sub('\?.+$', '', url)
+    url = re.sub('/(?:default|index)(\.\w+)?$', '', url)
+    url = re.sub('/$', '', url)
+    return url
+
 
 ### Cache support
 
 if settings.FRONTEND_CACHING:
-    from typepadapp.caching import cache_link, cache_object, invalidate_rule
+    from typepadapp.caching import cache_link, cache_object, invalidate_rule, count_rule
 
     # this is so we cache all Post, Video, Comment, etc., assets using
     # the same namespace.
@@ -311,10 +383,21 @@ if settings.FRONTEND_CACHING:
             isinstance(instance, Comment) and Asset.get_by_url_id(instance.in_reply_to.url_id),
         signals=[signals.asset_created, signals.asset_deleted],
         name="asset object invalidation for commenting")
-    asset_invalidator_for_favorites = invalidate_rule(
-        key=lambda sender, parent=None, **kwargs: parent,
-        signals=[signals.favorite_created, signals.favorite_deleted],
-        name="asset object invalidation for favoriting")
+
+    # count favorites and comments in the cache, so favoriting doesn't
+    # invalidate the whole asset; reading the asset's favorite_count and
+    # comment_count gives the current counts
+    asset_favorite_counter = count_rule(Asset, 'favorite_count',
+        target=lambda sender, parent=None, **kwargs: parent,
+        increment=[signals.favorite_created],
+        decrement=[signals.favorite_deleted])
+    asset_favorite_counter.install()
+    asset_comment_counter = count_rule(Asset, 'comment_count',
+        target=lambda sender, instance=None, **kwargs:
+            isinstance(instance, Comment) and Asset.get_by_url_id(instance.in_reply_to.url_id),
+        increment=[signals.asset_created],
+        decrement=[signals.asset_deleted])
+    asset_comment_counter.install()
 
     Asset.comments = cache_link(Asset.comments)
     asset_comments_invalidator = invalidate_rule(
@@ -137,3 +137,36 @@ The filters associated with this subscription, one per line:<br/>
     class Meta:
         app_label = 'typepadapp'
         db_table = 'typepadapp_subscription'
+
+
+class GroupMember(models.Model):
+    """Local copy of a member of a TypePad group, for the member directory
+    kept by `typepadapp.models.members`.
+
+    """
+    group_id = models.CharField(max_length=50, verbose_name='group ID')
+    user_id = models.CharField(max_length=50, verbose_name='user ID')
+    preferred_username = models.CharField(max_length=200, blank=True)
+    display_name = models.CharField(max_length=200, blank=True, db_index=True)
+    email = models.CharField(max_length=200, blank=True)
+    joined = models.DateTimeField(null=True, db_index=True,
+        help_text='When the member joined the group, in UTC')
+    is_admin = models.BooleanField(default=False)
+    gender = models.CharField(max_length=100, blank=True)
+    location = models.CharField(max_length=200, blank=True)
+    about_me = models.TextField(blank=True)
+    homepage = models.CharField(max_length=200, blank=True)
+    interests = models.TextField(blank=True)
+    profile_fetched = models.DateTimeField(null=True,
+        help_text='When the profile fields were last fetched from TypePad')
+    synced = models.DateTimeField(null=True, db_index=True,
+        help_text='When the member was last seen in the group on TypePad, in UTC')
+
+    def __unicode__(self):
+        return self.display_name or self.user_id
+
+    class Meta:
+        app_label = 'typepadapp'
+        db_table = 'typepadapp_groupmember'
+        unique_together = (('group_id', 'user_id'),)
+        ordering = ('-joined',)
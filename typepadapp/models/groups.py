@@ -35,25 +35,37 @@ from django.conf import settings
 import typepad
 
 from typepadapp.models.assets import Event
+from typepadapp.models import members
+from typepadapp.caching import local_cache_stamp
 from typepadapp import signals
 
 
 log = logging.getLogger(__name__)
 
 
+admins_stamp = local_cache_stamp('group_admins')
+"""Version stamp for the group admin lists held in process by
+`Group.admins()`."""
+
+
 class Group(typepad.Group):
 
     admin_list = None
     admin_list_time = 0
+    admin_list_version = None
 
     def __init__(self, *args, **kwargs):
         super(Group, self).__init__(*args, **kwargs)
         self.admin_list = None
         self.admin_list_time = 0
+        self.admin_list_version = None
 
     def admins(self):
-        # cache in-process for up to 5 minutes
-        if self.admin_list_time + settings.LONG_TERM_CACHE_PERIOD < time.time():
+        # cache in-process for up to LONG_TERM_CACHE_PERIOD, or until
+        # another process changes the admin list
+        version = admins_stamp.version()
+        if self.admin_list_time + settings.LONG_TERM_CACHE_PERIOD < time.time() \
+            or self.admin_list_version != version:
             admin_list_key = self.cache_key + ':admin_list'
 
             admin_list = cache.get(admin_list_key)
@@ -65,26 +77,54 @@ class Group(typepad.Group):
 
             self.admin_list = admin_list
             self.admin_list_time = time.time()
+            self.admin_list_version = version
             log.debug("Yay, got admin list %r, which we're hard caching until %r",
                 admin_list, self.admin_list_time)
 
         return self.admin_list
 
+    def local_members(self):
+        """Returns the group's members in the local member directory, as a
+        `GroupMember` query set ordered by join date (most recent first), or
+        ``None`` if the ``MEMBER_DIRECTORY`` isn't in use or hasn't been
+        filled yet."""
+        return members.local_directory(self)
+
+    def member_count(self):
+        """Returns the number of members in the group, from the local member
+        directory if it's in use and filled."""
+        local = members.local_directory(self)
+        if local is not None:
+            return local.count()
+        return self.memberships.filter(member=True, max_results=1,
+            cache=False).total_results
+
+
+def invalidate_admins(sender, group=None, **kwargs):
+    """Discards the cached admin list of the given group in every process."""
+    if group is not None:
+        cache.delete(group.cache_key + ':admin_list')
+    admins_stamp.bump()
+
+signals.group_webhook.connect(invalidate_admins)
+
 
 ### Cache support
 
 if settings.FRONTEND_CACHING:
-    from typepadapp.caching import cache_link, cache_object, invalidate_rule
+    from typepadapp.caching import cache_link, cache_object, invalidate_rule, write_through_rule
 
     # Cache population/invalidation
     Group.get_by_url_id = cache_object(Group.get_by_url_id)
     # invalidate with: signals.group_webhook
 
     Group.events = cache_link(Group.events)
-    group_events_invalidator = invalidate_rule(
+    group_events_writer = write_through_rule(
         key=lambda sender, group=None, **kwargs: group and group.events,
-        signals=[signals.asset_created, signals.asset_deleted],
-        name="Group events invalidation for asset_created, asset_deleted signal")
+        target=lambda sender, instance=None, **kwargs: instance,
+        entry=Event.for_new_asset,
+        added=[signals.asset_created], removed=[signals.asset_deleted],
+        name="Group events update for asset_created, asset_deleted signal")
 
     Group.memberships = cache_link(Group.memberships)
     memberships_invalidator = invalidate_rule(
@@ -0,0 +1,274 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Keeps a local directory of the members of TypePad groups.
+
+Listing, counting and exporting a group's members otherwise means paging
+through the group's memberships in the TypePad API. With the
+``MEMBER_DIRECTORY`` setting, each member of the group is also kept as a
+`GroupMember` row in the local database, which is refreshed by the
+``tpsyncmembers`` management command (see `refresh_members()`) and updated as
+the `member_joined`, `member_left`, `member_banned` and `member_unbanned`
+signals are sent. `Group.local_members()`, `Group.member_count()`, the
+``is_superuser`` checks of users and the members CSV export then read from
+the directory instead.
+
+The directory needs the Django database, so it's not available with the
+``KEY_VALUE_STORE_BACKEND`` setting.
+
+"""
+
+from datetime import datetime
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+import typepad
+
+from typepadapp import signals
+
+if not hasattr(settings, 'KEY_VALUE_STORE_BACKEND'):
+    from typepadapp.models.db import GroupMember
+
+
+log = logging.getLogger(__name__)
+
+
+def directory_enabled():
+    """Returns whether the local member directory is in use."""
+    return getattr(settings, 'MEMBER_DIRECTORY', False) \
+        and not hasattr(settings, 'KEY_VALUE_STORE_BACKEND')
+
+
+def members_of(group):
+    """Returns the members of the given group in the local directory, most
+    recently joined first."""
+    return GroupMember.objects.filter(group_id=group.url_id)
+
+
+def local_directory(group):
+    """Returns the members of the given group in the local directory (as
+    `members_of()` does), or ``None`` if the directory isn't in use or
+    hasn't been filled yet, in which case ask TypePad instead."""
+    if group is None or not directory_enabled():
+        return None
+    found = members_of(group)
+    # every group has a member, so no members means no directory
+    if not found[:1]:
+        return None
+    return found
+
+
+_admin_ids = {}
+
+
+def admin_ids(group):
+    """Returns the identifiers of the administrators of the given group in
+    the local directory, or ``None`` if the directory isn't in use or hasn't
+    been filled yet.
+
+    The identifiers are held in process until the group's admins change
+    (see `typepadapp.models.groups.admins_stamp`).
+
+    """
+    if group is None or not directory_enabled():
+        return None
+    from typepadapp.models.groups import admins_stamp
+    version = admins_stamp.version()
+    held = _admin_ids.get(group.url_id)
+    if held is not None and held[0] == version:
+        return held[1]
+
+    ids = members_of(group).filter(is_admin=True).values_list('user_id', flat=True)
+    # every group has an admin, so no admins means no directory
+    ids = list(ids) or None
+    _admin_ids[group.url_id] = (version, ids)
+    return ids
+
+
+def admins_changed():
+    """Discards the admin identifiers held by every process."""
+    from typepadapp.models.groups import admins_stamp
+    admins_stamp.bump()
+
+
+def save_member(group_id, user_id, **fields):
+    """Adds or updates the given member of the given group in the directory.
+
+    Returns ``(created, changed)``.
+
+    """
+    try:
+        member = GroupMember.objects.get(group_id=group_id, user_id=user_id)
+        created = False
+    except GroupMember.DoesNotExist:
+        member = GroupMember(group_id=group_id, user_id=user_id)
+        created = True
+
+    changed = created
+    for name, value in fields.iteritems():
+        if getattr(member, name) != value:
+            setattr(member, name, value)
+            changed = True
+    if changed:
+        member.save()
+    return created, changed
+
+
+def membership_fields(membership):
+    """Returns the `GroupMember` fields for the given TypePad membership
+    `Relationship`."""
+    user = membership.target
+    joined, is_admin = None, False
+    for kind, when in (membership.created or {}).iteritems():
+        if kind.endswith('Member'):
+            joined = when
+            if joined is not None and joined.tzinfo is not None:
+                # store as naive UTC, as the database wants
+                joined = (joined - joined.utcoffset()).replace(tzinfo=None)
+        elif kind.endswith('Admin'):
+            is_admin = True
+    return {
+        'preferred_username': user.preferred_username or '',
+        'display_name': user.display_name or '',
+        'email': user.email or '',
+        'joined': joined,
+        'is_admin': is_admin,
+    }
+
+
+def fetch_profile(member):
+    """Fills in the profile fields of the given `GroupMember` from their
+    TypePad profile."""
+    profile = typepad.UserProfile.get_by_url_id(member.user_id)
+    member.gender = profile.gender or ''
+    member.location = profile.location or ''
+    member.about_me = profile.about_me or ''
+    member.homepage = profile.homepage_url or ''
+    member.interests = ', '.join(profile.interests or [])
+    member.profile_fetched = datetime.now()
+    member.save()
+
+
+def refresh_members(group, full=False, page_size=50):
+    """Brings the local directory of the given group's members up to date.
+
+    Memberships are requested from TypePad a page at a time, most recently
+    joined first, stopping at the first page that holds no new or changed
+    members. With `full`, every page is requested, and members who weren't
+    seen in it (who are no longer in the group) are removed from the
+    directory. Administrators are
+    then marked, and the profiles of members added since the last refresh
+    are fetched. Call this outside of any batch request, as each request is
+    made as it's needed.
+
+    Returns a dictionary of the numbers of members ``added``, ``updated``
+    and ``removed``.
+
+    """
+    group_id = group.url_id
+    counts = {'added': 0, 'updated': 0, 'removed': 0}
+    started = datetime.utcnow()
+
+    start = 1
+    while True:
+        page = group.memberships.filter(member=True, start_index=start,
+            max_results=page_size, cache=False)
+        entries = list(page.entries)
+        if not entries:
+            break
+
+        changed = False
+        user_ids = []
+        for membership in entries:
+            user_id = membership.target.url_id
+            user_ids.append(user_id)
+            created, updated = save_member(group_id, user_id,
+                **membership_fields(membership))
+            if created:
+                counts['added'] += 1
+            elif updated:
+                counts['updated'] += 1
+            changed = changed or updated
+        if full:
+            members_of(group).filter(user_id__in=user_ids).update(synced=started)
+
+        start += len(entries)
+        if not full and not changed:
+            # the rest were here last time
+            break
+        if page.total_results is not None and start > page.total_results:
+            break
+
+    if full:
+        gone = members_of(group).filter(Q(synced__lt=started) | Q(synced=None))
+        counts['removed'] = gone.count()
+        gone.delete()
+
+    admins = group.memberships.filter(admin=True, cache=False)
+    admin_user_ids = [membership.target.url_id for membership in admins.entries]
+    members_of(group).filter(user_id__in=admin_user_ids).update(is_admin=True)
+    members_of(group).exclude(user_id__in=admin_user_ids).update(is_admin=False)
+    admins_changed()
+
+    for member in members_of(group).filter(profile_fetched=None):
+        try:
+            fetch_profile(member)
+        except Exception, exc:
+            log.warning("Could not fetch the profile of member %s: %s", member.user_id, exc)
+
+    return counts
+
+
+def member_joined(sender, instance=None, group=None, **kwargs):
+    if instance is None or group is None or not directory_enabled():
+        return
+    now = datetime.utcnow()
+    save_member(group.url_id, instance.url_id,
+        preferred_username=instance.preferred_username or '',
+        display_name=instance.display_name or '',
+        email=instance.email or '',
+        joined=now, synced=now)
+
+
+def member_left(sender, instance=None, group=None, **kwargs):
+    if instance is None or group is None or not directory_enabled():
+        return
+    gone = members_of(group).filter(user_id=instance.url_id)
+    if gone.filter(is_admin=True).count():
+        admins_changed()
+    gone.delete()
+
+
+signals.member_joined.connect(member_joined)
+signals.member_unbanned.connect(member_joined)
+signals.member_left.connect(member_left)
+signals.member_banned.connect(member_left)
@@ -0,0 +1,125 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Remembers the resized renditions of TypePad images and videos.
+
+Image and video links gain a `rendition()` method, which returns the link
+resized by one of its resizing methods (such as ``square`` or ``by_width``)
+and remembers it on the link for the next call. Remembered renditions are
+pickled with the link, so they're kept with objects in the cache. The sizes
+in the ``PRECOMPUTED_RENDITIONS`` setting are filled in for every image and
+video link of an object as it's stored in the cache.
+
+"""
+
+from django.conf import settings
+
+import typepad
+
+from typepadapp.caching import preparer
+
+
+def rendition(self, kind, size):
+    """Returns this link resized by its `kind` method (such as ``square``,
+    ``by_width`` or ``inscribe``) to the given size."""
+    renditions = self.__dict__.get('_renditions')
+    if renditions is None:
+        renditions = self.__dict__['_renditions'] = {}
+    key = (kind, size)
+    try:
+        return renditions[key]
+    except KeyError:
+        value = getattr(self, kind)(size)
+        if value is not self:
+            # the resized copy shares our renditions, which aren't its own
+            value.__dict__.pop('_renditions', None)
+        renditions[key] = value
+        return value
+
+
+def link_statefields(cls):
+    return _statefields(cls) + ['_renditions']
+
+_statefields = typepad.TypePadObject.statefields.im_func
+
+for cls in (typepad.ImageLink, typepad.VideoLink):
+    cls.rendition = rendition
+    cls.statefields = classmethod(link_statefields)
+
+
+LINK_FIELDS = ('avatar_link', 'image_link', 'video_link')
+"""The fields of TypePad objects holding links to prepare renditions of."""
+
+NESTED_FIELDS = ('actor', 'author', 'object')
+"""The fields of TypePad objects holding other objects whose links to
+prepare renditions of (such as the actor of an event)."""
+
+
+def _loaded_field(obj, name):
+    """Returns the given field of the given object if it has been set or
+    its data has been delivered, without requesting anything."""
+    if name in obj.__dict__:
+        return obj.__dict__[name]
+    field = getattr(type(obj), 'fields', {}).get(name)
+    if field is None or not obj.__dict__.get('_delivered', True):
+        return None
+    if field.api_name not in (obj.__dict__.get('api_data') or {}):
+        return None
+    # decodes the field from the delivered data
+    return getattr(obj, name)
+
+
+def object_links(obj, depth=2):
+    """Yields the image and video links of the given object, and of the
+    objects it holds (as an event holds its actor and asset)."""
+    for name in LINK_FIELDS:
+        link = _loaded_field(obj, name)
+        if link is not None:
+            yield link
+    if depth > 1:
+        for name in NESTED_FIELDS:
+            nested = _loaded_field(obj, name)
+            if isinstance(nested, typepad.TypePadObject):
+                for link in object_links(nested, depth - 1):
+                    yield link
+
+
+@preparer
+def precompute_renditions(obj):
+    """Fills in the renditions named in ``PRECOMPUTED_RENDITIONS`` for the
+    given object's image and video links."""
+    sizes = getattr(settings, 'PRECOMPUTED_RENDITIONS', (('square', 50),))
+    if not sizes or not isinstance(obj, typepad.TypePadObject):
+        return
+    for link in object_links(obj):
+        for kind, size in sizes:
+            if hasattr(link, kind):
+                link.rendition(kind, size)
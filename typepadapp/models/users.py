@@ -33,13 +33,15 @@ from urlparse import urljoin
 from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import SiteProfileNotAvailable, ImproperlyConfigured
-from django.core.urlresolvers import reverse, NoReverseMatch
+from django.core.urlresolvers import NoReverseMatch
 from django.utils.translation import ugettext_lazy as _
 from django.core.cache import cache
 
 import remoteobjects
 import typepad
 import typepadapp.models
+from typepadapp.models import members
+from typepadapp.utils.urls import reverse
 
 
 class User(typepad.User):
@@ -75,6 +77,9 @@ class User(typepad.User):
 
     @property
     def is_superuser(self):
+        admin_ids = members.admin_ids(typepadapp.models.GROUP)
+        if admin_ids is not None:
+            return self.url_id in admin_ids
         for admin in typepadapp.models.GROUP.admins():
             if self.id == admin.target.id:
                 return True
@@ -288,7 +293,7 @@ class User(typepad.User):
 
         """
         try:
-            return self.avatar_link.square(50).url
+            return self.avatar_link.rendition('square', 50).url
         except AttributeError:
             pass
         try:
@@ -302,6 +307,9 @@ class UserProfile(typepad.UserProfile):
 
     @property
     def is_superuser(self):
+        admin_ids = members.admin_ids(typepadapp.models.GROUP)
+        if admin_ids is not None:
+            return self.url_id in admin_ids
         for admin in typepadapp.models.GROUP.admins():
             if self.id == admin.target.id:
                 return True
@@ -327,7 +335,8 @@ class UserProfile(typepad.UserProfile):
 ### Caching support
 
 if settings.FRONTEND_CACHING:
-    from typepadapp.caching import cache_link, cache_object, invalidate_rule
+    from typepadapp.caching import cache_link, cache_object, invalidate_rule, write_through_rule
+    from typepadapp.models.assets import Event
     from typepadapp import signals
 
     def make_user_alias_cache_key(self):
@@ -349,12 +358,14 @@ if settings.FRONTEND_CACHING:
         name="user profile cache invalidation for member_banned, member_unbanned signals")
 
     User.events = cache_link(User.events)
-    user_events_invalidator = invalidate_rule(
+    user_events_writer = write_through_rule(
         key=lambda sender, group=None, instance=None, **kwargs:
             instance and instance.author and group and [instance.author.notifications.filter(by_group=group),
                 instance.author.preferred_username and User.get_by_url_id(instance.author.preferred_username).notifications.filter(by_group=group)],
-        signals=[signals.asset_created, signals.asset_deleted],
-        name="user notifications for group cache invalidation for asset_created, asset_deleted signals")
+        target=lambda sender, instance=None, **kwargs: instance,
+        entry=Event.for_new_asset,
+        added=[signals.asset_created], removed=[signals.asset_deleted],
+        name="user notifications for group update for asset_created, asset_deleted signals")
 
     User.notifications = cache_link(User.notifications)
     # signals.asset_created, signals.asset_deleted
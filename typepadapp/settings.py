@@ -113,6 +113,234 @@ LONG_TERM_CACHE_PERIOD = 60 * 60 * 24  # 1 day
 """Defines a cache timeout (in seconds) for cacheable items that can be
 cached more aggressively."""
 
+LOCAL_CACHE_CHECK_INTERVAL = 10
+"""Defines how often (in seconds) each process checks the shared cache for
+changes to data it keeps in memory, such as the TypePad application, group and
+group admin list.
+
+These in-process copies are discarded when a ``group_webhook`` signal fires in
+any process. A process notices such a change within this many seconds.
+
+"""
+
+WARM_UP_ON_START = False
+"""Whether to warm up the application when the `post_start` signal fires.
+
+When enabled, the TypePad application and group, the group's administrator
+list and the templates named in `WARM_UP_TEMPLATES` are loaded as soon as
+typepadapp starts, rather than on the first request each worker process
+handles. Load your project in the master process before forking (for instance,
+with mod_wsgi's ``WSGIImportScript`` or gunicorn's ``--preload``) so the
+workers share the warmed objects.
+
+The warm-up can also be run explicitly with the
+`typepadapp.utils.warmup.warm_up()` function or the ``tpwarmup`` management
+command.
+
+By default, typepadapp is not warmed up at startup.
+
+"""
+
+WARM_UP_TEMPLATES = ()
+"""A list of template names to compile during the warm-up phase.
+
+See `WARM_UP_ON_START`. By default, no templates are compiled.
+
+"""
+
+PAGE_CACHE_TIMEOUT = 60 * 5  # 5 minutes
+"""Defines how long (in seconds) to cache the pages of `TypePadView` views
+that have the ``page_cache`` option set.
+
+Cached pages are only served to anonymous visitors, and are purged whenever
+the group's content changes (see `typepadapp.signals`). Other processes notice
+such a purge within `LOCAL_CACHE_CHECK_INTERVAL` seconds.
+
+By default, pages are cached for five minutes.
+
+"""
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60  # 1 hour
+"""Defines how long (in seconds) to cache template fragments rendered with
+the ``typepadcache`` template tag.
+
+Fragments are also rebuilt whenever the objects they're cached on change. By
+default, fragments are cached for an hour.
+
+"""
+
+PAGINATE_CACHE_DEPTH = 10
+"""The number of pages of a TypePad list that `TypePadView.paginate()` keeps
+in the cache.
+
+Deeper pages are seldom seen twice, so they're requested from TypePad each
+time instead of taking space in the cache. Set this to `None` to cache every
+page. By default, the first ten pages of each list are cached.
+
+"""
+
+CACHE_ADMISSION = False
+"""Whether to store TypePad lists and objects in the cache only once they've
+been requested ``CACHE_ADMISSION_THRESHOLD`` times.
+
+With a small cache, values that are only ever read once (such as the deep
+pages of a list a crawler walks through) push out values that are read again
+and again. When this setting is True, `typepadapp.caching.cache_admission`
+counts how often each value is fetched and only stores the ones fetched more
+than once. Admitted and rejected values are counted in
+`typepadapp.caching.cache_stats`. By default, every value is stored.
+
+"""
+
+CACHE_ADMISSION_THRESHOLD = 2
+"""The number of times a TypePad list or object must be fetched before it's
+stored in the cache, when ``CACHE_ADMISSION`` is set."""
+
+CACHE_ADMISSION_MAX_START = 250
+"""The highest list index at which a window of a TypePad list is stored in
+the cache, when ``CACHE_ADMISSION`` is set. Set this to `None` to store
+windows of lists at any depth."""
+
+CACHE_ADMISSION_CRAWLERS = r'bot|crawl|spider|slurp'
+"""A regular expression matching the ``User-Agent`` headers of clients whose
+requests don't store anything in the cache, when ``CACHE_ADMISSION`` is set."""
+
+FEED_CACHE_TIMEOUT = 60 * 15  # 15 minutes
+"""Defines how long (in seconds) to cache the serialized feeds of
+`typepadapp.views.base.TypePadFeed` feeds.
+
+Cached feeds are also purged whenever the group's assets or favorites change
+(see `typepadapp.signals`). By default, feeds are cached for fifteen minutes.
+
+"""
+
+HUB_PUBLISH_FEEDS = {}
+"""A dictionary of feed URLs to announce to PubSubHubbub hubs whenever the
+group's assets or favorites change, keyed on hub URL.
+
+Each value is a list of absolute feed URLs. A list item can also be a callable,
+which is called with the arguments of the signal that fired and returns a list
+of feed URLs to announce. See `typepadapp.utils.hubpublish`.
+
+By default, no feeds are announced.
+
+"""
+
+HUB_PUBLISH_DELAY = 11
+"""Defines how long (in seconds) to collect changed feeds before announcing
+them to their hubs.
+
+All the feeds that change within this time are announced with one request per
+hub. The delay is always longer than `LOCAL_CACHE_CHECK_INTERVAL`, so that
+hubs don't fetch a feed from a process still serving its old cached copy. By
+default, changes are collected for eleven seconds.
+
+"""
+
+HUB_PUBLISH_RETRIES = 3
+"""The number of times to retry announcing feeds to a hub that can't be
+reached or rejects the request.
+
+Each retry waits twice as long as the one before, starting with
+`HUB_PUBLISH_RETRY_DELAY` seconds. By default, announcements are retried three
+times.
+
+"""
+
+HUB_PUBLISH_RETRY_DELAY = 30
+"""Defines how long (in seconds) to wait before first retrying a failed hub
+announcement. See `HUB_PUBLISH_RETRIES`. By default, the first retry is
+made after 30 seconds.
+
+"""
+
+MEMBER_DIRECTORY = False
+"""Whether to keep a local directory of the group's members in the database.
+
+When this setting is True, `typepadapp.models.members` keeps a `GroupMember`
+row for each member of the group, which the ``tpsyncmembers`` management
+command refreshes and the membership signals keep current. Group member counts
+and listings, the ``is_superuser`` checks of users and the members CSV export
+then read the directory instead of paging through the group's memberships in
+the TypePad API. The directory needs the Django database, so it's not used
+with ``KEY_VALUE_STORE_BACKEND``. By default, there is no directory.
+
+"""
+
+EVENT_SYNC_INTERVAL = 30
+"""Defines how often (in seconds) a `typepadapp.utils.eventsync.EventSyncer`,
+such as the one run by the ``tpsyncevents`` management command, fetches the
+group's newest events. By default, they're fetched every 30 seconds.
+
+"""
+
+EVENT_SYNC_WINDOW = 20
+"""Defines how many of the group's newest events an `EventSyncer` fetches
+each time. If more events than this are posted between fetches, the cached
+event list is started again. By default, the 20 newest events are fetched.
+
+"""
+
+PRECOMPUTED_RENDITIONS = (('square', 50),)
+"""A list of the image and video sizes to compute when TypePad objects are
+stored in the cache.
+
+Each item is a pair of the name of a resizing method of TypePad image and
+video links (``square``, ``inscribe``, ``by_width`` or ``by_height``) and a
+size. Use the sizes your templates ask for with the ``userpicsquare``,
+``userpicbywidth`` and ``enclosurebywidth`` filters, so cached users and
+assets carry those URLs with them (see `typepadapp.models.renditions`).
+
+By default, the 50 pixel square used by `User.userpic` is computed.
+
+"""
+
+SANITIZE_SINGLE_PASS = False
+"""Whether the ``sanitizetags`` template filter should sanitize HTML with its
+own single-pass parser instead of feedparser's.
+
+The single-pass parser produces the same output, but scans the HTML once and
+builds the result directly. HTML it doesn't handle itself (such as
+declarations and processing instructions) is sanitized with feedparser's
+parser as before.
+
+By default, feedparser's parser is used.
+
+"""
+
+SANITIZE_CACHE_SIZE = 1000
+"""The number of sanitized HTML values the ``sanitizetags`` template filter
+keeps in each process.
+
+Sanitized values are also kept in the shared cache for
+`LONG_TERM_CACHE_PERIOD` seconds. By default, the last 1000 values are kept
+in process.
+
+"""
+
+TYPEPAD_USER_SNAPSHOT = False
+"""Whether to keep a snapshot of the signed-in TypePad user in their session.
+
+When enabled, the signed-in user's display fields (such as their display name,
+avatar and profile URL) are stored in their session, signed with your
+`SECRET_KEY`. Requests then use those fields without asking TypePad for the
+user. Accessing any other field of the user loads the full user from TypePad
+as before.
+
+By default, no snapshot is kept and the signed-in user is requested from
+TypePad on every request.
+
+"""
+
+TYPEPAD_USER_SNAPSHOT_REFRESH = 60 * 5  # 5 minutes
+"""Defines how old (in seconds) a session's user snapshot can be before the
+user is loaded from TypePad again.
+
+See `TYPEPAD_USER_SNAPSHOT`. By default, snapshots are refreshed every five
+minutes.
+
+"""
+
 WELCOME_URL = None
 """A URL for a welcome page to which to send newly registered site members.
 
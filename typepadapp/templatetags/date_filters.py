@@ -28,13 +28,90 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 import datetime, time
-from gettext import ngettext
-from django.utils.translation import ngettext, ugettext as _
+import threading
+from django.core.signals import request_started, request_finished
+from django.utils.translation import get_language, ngettext, ugettext as _
+from django.utils.tzinfo import LocalTimezone
 from django.template import defaultfilters
 from django import template
 
 register = template.Library()
 
+
+class RequestClock(threading.local):
+
+    """The current local time, read once per request.
+
+    Between the `request_started` and `request_finished` signals, `now()`
+    returns the time of its first call in the request, so a page's dates are
+    all compared to the same time and the clock is only read once. Outside of
+    requests, it returns the current time.
+
+    """
+
+    in_request = False
+    times = None
+
+    def start(self, sender=None, **kwargs):
+        self.in_request = True
+        self.times = None
+
+    def stop(self, sender=None, **kwargs):
+        self.in_request = False
+        self.times = None
+
+    def now(self, aware=False):
+        """Returns the current local time, without microseconds, as a naive
+        datetime or (if `aware` is true) one in the local timezone."""
+        times = self.times
+        if times is None:
+            t = time.localtime()
+            naive = datetime.datetime(t[0], t[1], t[2], t[3], t[4], t[5])
+            times = (naive, naive.replace(tzinfo=LocalTimezone(naive)))
+            if self.in_request:
+                self.times = times
+        return times[aware and 1 or 0]
+
+clock = RequestClock()
+request_started.connect(clock.start)
+request_finished.connect(clock.stop)
+
+
+_localized_dates = {}
+
+def localized_date(d, format):
+    """Formats the date of `d` with the date filter, remembering the result
+    for each date, format and language."""
+    key = (d.year, d.month, d.day, format, get_language())
+    try:
+        return _localized_dates[key]
+    except KeyError:
+        if len(_localized_dates) > 1000:
+            _localized_dates.clear()
+        value = _localized_dates[key] = defaultfilters.date(d, format)
+        return value
+
+
+def _seconds_since(d):
+    # ignore microsecond part of 'd' since we removed it from 'now'
+    delta = clock.now(d.tzinfo is not None) - (d - datetime.timedelta(0, 0, d.microsecond))
+    return delta.days * 24 * 60 * 60 + delta.seconds
+
+
+def _date_label(format):
+    def label(n, d, preposition):
+        return _('%(prep)s %(date)s') % { 'prep': preposition, 'date': localized_date(d, format) }
+    return label
+
+TIMESINCE_CHUNKS = (
+  (60 * 60 * 24 * 365, _date_label('M j, Y')), # 1 year+
+  (60 * 60 * 24 * 7, _date_label('M jS')), # 1 week+
+  (60 * 60 * 24, lambda n, d, p: ngettext('%d day ago', '%d days ago', n // (60 * 60 * 24)) % (n // (60 * 60 * 24),)), # 1 day+
+  (60 * 60, lambda n, d, p: ngettext('%d hour ago', '%d hours ago', n // (60 * 60)) % (n // (60 * 60),)), # 1 hour+
+  (60 * 2, lambda n, d, p: ngettext('%d minute ago', '%d minutes ago', n // 60) % (n // 60,)), # 2 minutes+
+  (1, lambda n, d, p: _('just now')) # under 2 mins ago
+)
+
 @register.filter
 def pithy_timesince(d, preposition=''):
     '''
@@ -43,29 +120,13 @@ def pithy_timesince(d, preposition=''):
     '''
     if d is None:
         return None
-    chunks = (
-      (60 * 60 * 24 * 365, lambda n, d: _('%(prep)s %(date)s') % { 'prep': preposition, 'date': defaultfilters.date(d, 'M j, Y') }), # 1 year+
-      (60 * 60 * 24 * 7, lambda n, d: _('%(prep)s %(date)s') % { 'prep': preposition, 'date': defaultfilters.date(d, 'M jS') }), # 1 week+
-      (60 * 60 * 24, lambda n, d: ngettext('%d day ago', '%d days ago', n // (60 * 60 * 24)) % (n // (60 * 60 * 24),)), # 1 day+
-      (60 * 60, lambda n, d: ngettext('%d hour ago', '%d hours ago', n // (60 * 60)) % (n // (60 * 60),)), # 1 hour+
-      (60 * 2, lambda n, d: ngettext('%d minute ago', '%d minutes ago', n // 60) % (n // 60,)), # 2 minutes+
-      (1, lambda n, d: _('just now')) # under 2 mins ago
-    )
-    t = time.localtime()
-    if d.tzinfo:
-        tz = LocalTimezone(d)
-    else:
-        tz = None
-    now = datetime.datetime(t[0], t[1], t[2], t[3], t[4], t[5], tzinfo=tz)
-    # ignore microsecond part of 'd' since we removed it from 'now'
-    delta = now - (d - datetime.timedelta(0, 0, d.microsecond))
-    since = delta.days * 24 * 60 * 60 + delta.seconds
+    since = _seconds_since(d)
 
-    for i, (seconds, label) in enumerate(chunks):
+    for seconds, label in TIMESINCE_CHUNKS:
         count = since // seconds # truncated division
         if count != 0:
             break
-    return label(since, d)
+    return label(since, d, preposition)
 
 @register.filter
 def is_relative(d):
@@ -74,17 +135,8 @@ def is_relative(d):
     '''
     if d is None:
         return False
-    t = time.localtime()
-    if d.tzinfo:
-        tz = LocalTimezone(d)
-    else:
-        tz = None
-    now = datetime.datetime(t[0], t[1], t[2], t[3], t[4], t[5], tzinfo=tz)
-    # ignore microsecond part of 'd' since we removed it from 'now'
-    delta = now - (d - datetime.timedelta(0, 0, d.microsecond))
-    since = delta.days * 24 * 60 * 60 + delta.seconds
     # timestamp is one week or less old
-    return since <= 60 * 60 * 24 * 7
+    return _seconds_since(d) <= 60 * 60 * 24 * 7
 
 @register.filter
 def date_microformat(d):
@@ -27,13 +27,18 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import hashlib
 import re
+import sgmllib
 
 from django import template
+from django.conf import settings
 from django.utils.safestring import mark_safe
 
 import feedparser
 
+from typepadapp.caching import MemoCache
+
 
 register = template.Library()
 
@@ -92,20 +97,7 @@ class Sanitizer(feedparser._HTMLSanitizer):
         feedparser._HTMLSanitizer.feed(self, value)
 
     def is_safe_href(self, href):
-        href = re.sub(self.nul_re, '', href)
-        href = re.sub(self.comma_decimal_entity_re, ':', href)
-        href = re.sub(self.comma_hex_entity_re, ':', href)
-        if ':' not in href:
-            return True
-
-        scheme = href.split(':', 1)[0]
-        scheme = re.sub(self.space_re, '', scheme)
-        if (re.search(self.nonscheme_character_re, scheme)
-            or re.search(self.ends_in_script_re, scheme)
-            or re.search(self.has_numeric_entity_re, scheme)):
-            return False
-
-        return True
+        return is_safe_href(href)
 
     def normalize_attrs(self, attr):
         attr = feedparser._HTMLSanitizer.normalize_attrs(self, attr)
@@ -115,9 +107,251 @@ class Sanitizer(feedparser._HTMLSanitizer):
         return attr
 
 
+def is_safe_href(href):
+    """Returns whether the given URL is safe to link to (that is, it isn't
+    a ``javascript:`` URL, however obfuscated)."""
+    href = Sanitizer.nul_re.sub('', href)
+    href = Sanitizer.comma_decimal_entity_re.sub(':', href)
+    href = Sanitizer.comma_hex_entity_re.sub(':', href)
+    if ':' not in href:
+        return True
+
+    scheme = href.split(':', 1)[0]
+    scheme = Sanitizer.space_re.sub('', scheme)
+    if (Sanitizer.nonscheme_character_re.search(scheme)
+        or Sanitizer.ends_in_script_re.search(scheme)
+        or Sanitizer.has_numeric_entity_re.search(scheme)):
+        return False
+
+    return True
+
+
+class _Unsupported(Exception):
+    pass
+
+
+_declaration_re = re.compile(r'<!((?!DOCTYPE|--|\[))', re.IGNORECASE)
+_shorttag_re = re.compile(r'<([^<\s]+?)\s*/>')
+_commentclose_re = re.compile(r'--\s*>')
+_acceptable_elements = frozenset(Sanitizer.acceptable_elements)
+_acceptable_attributes = frozenset(Sanitizer.acceptable_attributes)
+_unacceptable_elements_with_end_tag = frozenset(Sanitizer.unacceptable_elements_with_end_tag)
+_elements_no_end_tag = frozenset(Sanitizer.elements_no_end_tag)
+
+
+def _shorttag_replace(match):
+    # as in _BaseHTMLProcessor._shorttag_replace
+    tag = match.group(1)
+    if tag in _elements_no_end_tag:
+        return '<' + tag + ' />'
+    else:
+        return '<' + tag + '></' + tag + '>'
+
+
+def _convert_ref(match):
+    # as in SGMLParser._convert_ref
+    if match.group(2):
+        n = int(match.group(2))
+        if 0 <= n <= 127:
+            return chr(n)
+        return '&#%s%s' % match.groups()[1:]
+    elif match.group(3):
+        return (sgmllib.SGMLParser.entitydefs.get(match.group(1))
+            or '&%s;' % match.group(1))
+    else:
+        return '&%s' % match.group(1)
+
+
+def _start_tag(pieces, rawdata, i, j, hidden):
+    # as in SGMLParser.parse_starttag and Sanitizer.unknown_starttag
+    match = sgmllib.tagfind.match(rawdata, i+1)
+    k = match.end(0)
+    tag = rawdata[i+1:k].lower()
+    if tag not in _acceptable_elements:
+        if tag in _unacceptable_elements_with_end_tag:
+            return hidden + 1
+        return hidden
+
+    strattrs = []
+    attrfind, entity_or_charref = sgmllib.attrfind, sgmllib.SGMLParser.entity_or_charref
+    while k < j:
+        match = attrfind.match(rawdata, k)
+        if not match:
+            break
+        attrname, rest, attrvalue = match.group(1, 2, 3)
+        k = match.end(0)
+        if not rest:
+            attrvalue = attrname
+        else:
+            if (attrvalue[:1] == "'" == attrvalue[-1:] or
+                attrvalue[:1] == '"' == attrvalue[-1:]):
+                attrvalue = attrvalue[1:-1]
+            attrvalue = entity_or_charref.sub(_convert_ref, attrvalue)
+        attrname = attrname.lower()
+        if attrname not in _acceptable_attributes:
+            continue
+        if attrname in ('rel', 'type'):
+            attrvalue = attrvalue.lower()
+        elif attrname in ('href', 'src') and not is_safe_href(attrvalue):
+            continue
+        strattrs.append(u' %s="%s"' % (unicode(attrname, 'utf-8'), unicode(attrvalue, 'utf-8')))
+
+    strattrs = u''.join(strattrs).encode('utf-8')
+    if tag in _elements_no_end_tag:
+        pieces.append('<%s%s />' % (tag, strattrs))
+    else:
+        pieces.append('<%s%s>' % (tag, strattrs))
+    return hidden
+
+
+def sanitize_single_pass(value):
+    """Sanitizes the given HTML as the feedparser-based `Sanitizer` does,
+    returning the same UTF-8 output, but in one pass over the markup without
+    building a parser.
+
+    Markup that this pass doesn't handle itself (SGML short tags,
+    declarations and processing instructions) is sanitized with `Sanitizer`
+    instead.
+
+    """
+    # as in Sanitizer.feed
+    data = Sanitizer.nul_re.sub('', value)
+    data = _declaration_re.sub(r'&lt;!\1', data)
+    data = _shorttag_re.sub(_shorttag_replace, data)
+    data = data.replace('&#39;', "'").replace('&#34;', '"')
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+
+    try:
+        pieces = _sanitize_pieces(data)
+    except _Unsupported:
+        s = Sanitizer('utf-8')
+        s.feed(value)
+        return s.output()
+    return ''.join(pieces)
+
+
+def _sanitize_pieces(rawdata):
+    # as in SGMLParser.goahead, with the Sanitizer's handlers inlined
+    interesting, endbracket = sgmllib.interesting, sgmllib.endbracket
+    charref, entityref = sgmllib.charref, sgmllib.entityref
+    pieces = []
+    append = pieces.append
+    hidden = 0
+    i = 0
+    n = len(rawdata)
+    while i < n:
+        match = interesting.search(rawdata, i)
+        if match:
+            j = match.start()
+        else:
+            j = n
+        if i < j and not hidden:
+            append(rawdata[i:j])
+        i = j
+        if i == n:
+            break
+
+        if rawdata[i] == '<':
+            next = rawdata[i+1:i+2]
+            if sgmllib.starttagopen.match(rawdata, i):
+                if next == '>' or sgmllib.shorttagopen.match(rawdata, i):
+                    raise _Unsupported
+                match = endbracket.search(rawdata, i+1)
+                if not match:
+                    break
+                j = match.start(0)
+                hidden = _start_tag(pieces, rawdata, i, j, hidden)
+                if rawdata[j] == '>':
+                    j += 1
+                i = j
+                continue
+            if next == '/':
+                match = endbracket.search(rawdata, i+1)
+                if not match:
+                    break
+                j = match.start(0)
+                tag = rawdata[i+2:j].strip().lower()
+                if tag in _acceptable_elements:
+                    if tag not in _elements_no_end_tag:
+                        append('</%s>' % tag)
+                elif tag in _unacceptable_elements_with_end_tag:
+                    hidden -= 1
+                if rawdata[j] == '>':
+                    j += 1
+                i = j
+                continue
+            if rawdata.startswith('<!--', i):
+                match = _commentclose_re.search(rawdata, i+4)
+                if not match:
+                    break
+                append('<!--%s-->' % rawdata[i+4:match.start(0)])
+                i = match.end(0)
+                continue
+            if next in ('?', '!'):
+                raise _Unsupported
+        else:
+            match = charref.match(rawdata, i) or entityref.match(rawdata, i)
+            if match:
+                if match.re is charref:
+                    append('&#%s;' % match.group(1))
+                else:
+                    append('&%s;' % match.group(1))
+                i = match.end(0)
+                if rawdata[i-1] != ';':
+                    i -= 1
+                continue
+
+        # as for incomplete markup in SGMLParser.goahead
+        match = sgmllib.incomplete.match(rawdata, i)
+        if not match:
+            if not hidden:
+                append(rawdata[i])
+            i += 1
+            continue
+        j = match.end(0)
+        if j == n:
+            break
+        if not hidden:
+            append(rawdata[i:j])
+        i = j
+    return pieces
+
+
+SANITIZER_VERSION = 1
+"""The version of the sanitizers' output, which is part of the key under which
+sanitized values are memoized. Increase it when their output changes."""
+
+_sanitized = MemoCache('sanitized', size=getattr(settings, 'SANITIZE_CACHE_SIZE', 1000))
+
+
 @register.filter
 def sanitizetags(value):
-    s = Sanitizer('utf-8')
-    s.feed(value)
-    data = s.output().strip().replace('\r\n', '\n')
+    """Removes unsafe markup (such as scripts, event handler attributes and
+    ``javascript:`` links) from the given HTML.
+
+    Results are memoized by the digest of the HTML, the sanitizer used and
+    the `SANITIZER_VERSION`, in process (for the last ``SANITIZE_CACHE_SIZE``
+    values) and in the shared cache. With the ``SANITIZE_SINGLE_PASS``
+    setting, HTML is sanitized with `sanitize_single_pass()` instead of
+    feedparser's parser.
+
+    """
+    if isinstance(value, unicode):
+        digest = hashlib.sha1(value.encode('utf-8')).hexdigest()
+    else:
+        digest = hashlib.sha1(value).hexdigest()
+    single_pass = getattr(settings, 'SANITIZE_SINGLE_PASS', False)
+    key = '%d:%s:%s' % (SANITIZER_VERSION, single_pass and 'single' or 'feedparser',
+        digest)
+    data = _sanitized.get(key)
+    if data is None:
+        if single_pass:
+            data = sanitize_single_pass(value)
+        else:
+            s = Sanitizer('utf-8')
+            s.feed(value)
+            data = s.output()
+        data = data.strip().replace('\r\n', '\n')
+        _sanitized.set(key, data)
     return mark_safe(data)
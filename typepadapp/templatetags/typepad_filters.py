@@ -40,8 +40,11 @@ def morelink(entry, wordcount):
     Display a 'continue reading...' link if the entry contains
     more words than the supplied wordcount.
     """
-    content = strip_tags(entry.content)
-    if template.defaultfilters.wordcount(content) > wordcount:
+    try:
+        count = entry.word_count
+    except AttributeError:
+        count = template.defaultfilters.wordcount(strip_tags(entry.content))
+    if count > wordcount:
         more = '<p class="more-link"><a href="%s">continue reading...</a></p>' % entry.get_absolute_url()
         return mark_safe(more)
     return ''
@@ -49,43 +52,43 @@ def morelink(entry, wordcount):
 
 @register.filter
 def userpicbywidth(user, width=0):
-    return user.avatar_link.by_width(int(width))
+    return user.avatar_link.rendition('by_width', int(width))
 
 
 @register.filter
 def userpicbysize(user, size=0):
-    return user.avatar_link.inscribe(int(size))
+    return user.avatar_link.rendition('inscribe', int(size))
 
 
 @register.filter
 def userpicsquare(user, size=0):
-    return user.avatar_link.square(int(size))
+    return user.avatar_link.rendition('square', int(size))
 
 
 @register.filter
 def enclosurebywidth(asset, width=0):
     if asset.type_id == 'photo':
-        return asset.image_link.by_width(int(width))
+        return asset.image_link.rendition('by_width', int(width))
     elif asset.type_id == 'video':
-        return asset.video_link.by_width(int(width))
+        return asset.video_link.rendition('by_width', int(width))
     return None
 
 
 @register.filter
 def enclosurebysize(asset, size=0):
     if asset.type_id == 'photo':
-        return asset.image_link.inscribe(int(size))
+        return asset.image_link.rendition('inscribe', int(size))
     elif asset.type_id == 'video':
-        return asset.video_link.by_width(int(width))
+        return asset.video_link.rendition('by_width', int(size))
     return None
 
 
 @register.filter
 def enclosurebymaxwidth(asset, width=0):
     if asset.type_id == 'photo':
-        return asset.image_link.by_width(int(width))
+        return asset.image_link.rendition('by_width', int(width))
     elif asset.type_id == 'video':
-        return asset.video_link.by_width(int(width))
+        return asset.video_link.rendition('by_width', int(width))
     return None
 
 
@@ -0,0 +1,134 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Caches rendered template fragments for TypePad objects.
+
+The output of a ``typepadcache`` block is cached on the cache keys of the
+objects given as its arguments::
+
+    {% load typepadcache %}
+    {% typepadcache "event" event event.object %}
+        ... markup that depends only on the event and its asset ...
+    {% endtypepadcache %}
+
+The optional quoted string names the fragment for the hit counts recorded in
+`typepadapp.caching.cache_stats` (as ``fragment:<name>``).
+
+Whenever one of the objects changes in the cache, or is invalidated through a
+`CacheInvalidator`, its fragments are rebuilt. All fragments for one kind of
+object can also be discarded with `purge_fragments()`, such as when the
+templates showing them change. Only cache markup that depends on nothing but
+the given objects: a fragment rendered for one viewer is shown to all.
+
+"""
+
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from typepadapp.caching import cache_stats, key_versions, touch_key_version
+
+
+register = template.Library()
+
+
+def _generation_key(namespace):
+    return 'fragmentgeneration:%s' % namespace
+
+
+def purge_fragments(namespace):
+    """Discards all cached fragments for objects in the given cache
+    namespace (such as ``Asset`` or ``User``)."""
+    touch_key_version(_generation_key(namespace))
+
+
+class TypePadCacheNode(template.Node):
+
+    def __init__(self, name, variables, nodelist):
+        self.name = name
+        self.variables = variables
+        self.nodelist = nodelist
+
+    def fragment_key(self, context):
+        """Returns the cache key for the fragment in the given context, or
+        ``None`` if the fragment can't be cached."""
+        keys = []
+        for variable in self.variables:
+            try:
+                obj = variable.resolve(context)
+            except template.VariableDoesNotExist:
+                return None
+            try:
+                keys.append(obj.cache_key)
+                keys.append(_generation_key(obj.cache_namespace))
+            except AttributeError:
+                return None
+
+        versions = key_versions(keys, create=True)
+        key = repr((self.name, [(key, versions[key]) for key in keys]))
+        return 'fragment:%s' % hashlib.md5(key).hexdigest()
+
+    def render(self, context):
+        key = self.fragment_key(context)
+        if key is None:
+            return self.nodelist.render(context)
+
+        stat = 'fragment:%s' % self.name
+        value = cache.get(key)
+        if value is not None:
+            cache_stats.hit(stat)
+            return value
+
+        cache_stats.miss(stat)
+        value = self.nodelist.render(context)
+        timeout = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 60 * 60)
+        cache.set(key, value, timeout)
+        return value
+
+
+@register.tag
+def typepadcache(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError("%r tag requires at least 1 argument" % bits[0])
+
+    args = bits[1:]
+    if args[0][0] in ('"', "'") and args[0][0] == args[0][-1]:
+        name = args.pop(0)[1:-1]
+        if not args:
+            raise template.TemplateSyntaxError("%r tag requires at least 1 object to cache on" % bits[0])
+    else:
+        name = ' '.join(args)
+
+    nodelist = parser.parse(('endtypepadcache',))
+    parser.delete_first_token()
+    return TypePadCacheNode(name, [template.Variable(arg) for arg in args], nodelist)
@@ -30,6 +30,7 @@
 import cgi
 import os
 import sys
+import threading
 import unittest
 from urllib import urlencode, quote
 import urlparse
@@ -48,12 +49,22 @@ from typepadapp.utils.loading import DjangoHttplib2Cache
 class SanitizeTestsMeta(type):
 
     def __new__(cls, name, bases, attr):
-        cls.add_feedparser_tests(attr)
-        cls.add_mt_tests(attr)
+        cls.add_feedparser_tests(attr, bases)
+        cls.add_mt_tests(attr, bases)
         return type.__new__(cls, name, bases, attr)
 
+    @staticmethod
+    def has_test(testname, attr, bases):
+        # subclasses inherit (or skip) the tests of their bases
+        if testname in attr:
+            return True
+        for base in bases:
+            if hasattr(base, testname):
+                return True
+        return False
+
     @classmethod
-    def add_feedparser_tests(cls, attr):
+    def add_feedparser_tests(cls, attr, bases):
         testdir = os.path.dirname(__file__)
         testpath = os.path.join(testdir, 'feedparser')
         for filename in os.listdir(testpath):
@@ -65,7 +76,7 @@ class SanitizeTestsMeta(type):
 
             # Don't generate a test if we already have one by that name.
             testname = '_'.join(('test_feedparser', filename[14:].split('.', 1)[0]))
-            if testname in attr:
+            if cls.has_test(testname, attr, bases):
                 continue
 
             filepath = os.path.join(testpath, filename)
@@ -79,11 +90,11 @@ class SanitizeTestsMeta(type):
             attr[testname] = tester(filepath)
 
     @classmethod
-    def add_mt_tests(cls, attr):
+    def add_mt_tests(cls, attr, bases):
         mt_tests = attr.get('mt_tests', {})
         for key, value in mt_tests.iteritems():
             testname = '_'.join(('test_mt', key))
-            if testname in attr:
+            if cls.has_test(testname, attr, bases):
                 continue
 
             def tester(given, expected):
@@ -181,6 +192,48 @@ class SanitizeTests(unittest.TestCase):
         pass
 
 
+class SinglePassSanitizeTests(SanitizeTests):
+
+    """Runs the `SanitizeTests` against the single-pass sanitizer."""
+
+    def runTest(self, given, expected):
+        from typepadapp.templatetags.generic_filters import sanitize_single_pass
+        built = sanitize_single_pass(given).strip().replace('\r\n', '\n')
+        self.assertEquals(built, expected)
+
+    def test_fallback(self):
+        # markup the single-pass parser doesn't handle itself is sanitized
+        # by feedparser's parser instead
+        from typepadapp.templatetags.generic_filters import Sanitizer
+        for given in ('a<>b<br/>', '<!DOCTYPE html><p>x</p>', '<?php x ?><b>y</b>'):
+            s = Sanitizer('utf-8')
+            s.feed(given)
+            self.runTest(given, s.output().strip())
+
+    def test_memoized(self):
+        from typepadapp.templatetags import generic_filters
+        from typepadapp.templatetags.generic_filters import sanitizetags
+        calls = []
+        def sanitize(value):
+            calls.append(value)
+            return u'<b>memo</b>'
+        single_pass = getattr(settings, 'SANITIZE_SINGLE_PASS', False)
+        settings.SANITIZE_SINGLE_PASS = True
+        orig, generic_filters.sanitize_single_pass = generic_filters.sanitize_single_pass, sanitize
+        try:
+            given = '<b>memo %s</b>' % id(calls)
+            self.assertEquals(sanitizetags(given), u'<b>memo</b>')
+            self.assertEquals(sanitizetags(given), u'<b>memo</b>')
+            self.assertEquals(calls, [given])
+
+            # values are memoized separately for each sanitizer
+            settings.SANITIZE_SINGLE_PASS = False
+            self.assertEquals(sanitizetags(given), given)
+        finally:
+            generic_filters.sanitize_single_pass = orig
+            settings.SANITIZE_SINGLE_PASS = single_pass
+
+
 class OAuthTests(unittest.TestCase):
 
     def build_oauth_url(self, callback_url):
@@ -222,3 +275,1448 @@ class OAuthTests(unittest.TestCase):
         }
         cb_url = '%s?%s' % ('http://test.example.com/', urlencode(params))
         self.assertCallback(cb_url, 'url with query encoded with urllib.urlencode encodes right')
+
+
+class WarmUpTests(unittest.TestCase):
+
+    def test_report(self):
+        from typepadapp.utils.warmup import warm_up
+        calls = []
+        report = warm_up([
+            ('first', lambda: calls.append('first')),
+            ('second', lambda: calls.append('second')),
+        ])
+        self.assertEquals(calls, ['first', 'second'])
+        self.assertEquals([name for name, elapsed in report], ['first', 'second'])
+        for name, elapsed in report:
+            self.assert_(elapsed >= 0)
+
+    def test_failed_step(self):
+        from typepadapp.utils.warmup import warm_up
+        def fail():
+            raise ValueError('oops')
+        report = warm_up([('fail', fail), ('pass', lambda: None)])
+        self.assertEquals([name for name, elapsed in report], ['pass'])
+
+    def test_changed_since_warm_up(self):
+        import typepadapp.models
+        from typepadapp.middleware import ApplicationMiddleware, application_stamp
+
+        cache = django.core.cache.cache
+        old_key = getattr(settings, 'OAUTH_CONSUMER_KEY', None)
+        settings.OAUTH_CONSUMER_KEY = 'key'
+        app_key = 'application:key'
+        group_key = 'group:key'
+        saved = (typepadapp.models.APPLICATION, typepadapp.models.GROUP,
+            typepadapp.models.APPLICATION_VERSION)
+        try:
+            typepadapp.models.APPLICATION = 'warm app'
+            typepadapp.models.GROUP = 'warm group'
+            typepadapp.models.APPLICATION_VERSION = application_stamp.version()
+
+            # the app changes after warm-up but before the worker's first request
+            application_stamp.bump()
+            cache.set(app_key, 'new app')
+            cache.set(group_key, 'new group')
+
+            middleware = ApplicationMiddleware()
+            self.assertEquals(middleware.discover_app_and_group(None),
+                ('new app', 'new group'))
+        finally:
+            (typepadapp.models.APPLICATION, typepadapp.models.GROUP,
+                typepadapp.models.APPLICATION_VERSION) = saved
+            cache.delete(app_key)
+            cache.delete(group_key)
+            settings.OAUTH_CONSUMER_KEY = old_key
+
+
+class LocalCacheStampTests(unittest.TestCase):
+
+    def setUp(self):
+        django.core.cache.cache.delete('stamp:test')
+
+    def test_version(self):
+        from typepadapp.caching import local_cache_stamp
+        stamp = local_cache_stamp('test', interval=0)
+        version = stamp.version()
+        self.assert_(version is not None)
+        self.assertEquals(stamp.version(), version)
+
+    def test_bump(self):
+        from typepadapp.caching import local_cache_stamp
+        stamp = local_cache_stamp('test', interval=0)
+        other = local_cache_stamp('test', interval=0)
+        version = other.version()
+        stamp.bump()
+        self.assertNotEquals(other.version(), version)
+        self.assertEquals(other.version(), stamp.version())
+
+    def test_interval(self):
+        from typepadapp.caching import local_cache_stamp
+        stamp = local_cache_stamp('test', interval=0)
+        other = local_cache_stamp('test', interval=3600)
+        version = other.version()
+        stamp.bump()
+        # other won't look again until its interval passes
+        self.assertEquals(other.version(), version)
+
+
+class UserSnapshotTests(unittest.TestCase):
+
+    user_id = 'tag:api.typepad.com,2009:6p1234123412341234'
+
+    def make_request(self):
+        class FakeRequest(object):
+            pass
+        request = FakeRequest()
+        request.session = {}
+        return request
+
+    def make_user(self):
+        from typepadapp.models import User
+        return User.from_dict({
+            'id': self.user_id,
+            'urlId': '6p1234123412341234',
+            'displayName': 'Example User',
+            'preferredUsername': 'example',
+            'email': 'example@example.com',
+        })
+
+    def test_snapshot(self):
+        from typepadapp.auth import save_user_snapshot, load_user_snapshot
+        request = self.make_request()
+        save_user_snapshot(request, self.make_user())
+
+        user = load_user_snapshot(request, self.user_id)
+        self.assert_(user is not None)
+        self.assertEquals(user.display_name, 'Example User')
+        self.assertEquals(user.username, 'example')
+        # only the snapshot fields are kept
+        self.assert_(user.email is None)
+
+        # snapshots are only good for the user they were made for
+        self.assert_(load_user_snapshot(request, 'tag:api.typepad.com,2009:6p0') is None)
+
+    def test_tampered(self):
+        from typepadapp.auth import save_user_snapshot, load_user_snapshot, TYPEPAD_SNAPSHOT_KEY
+        request = self.make_request()
+        save_user_snapshot(request, self.make_user())
+        request.session[TYPEPAD_SNAPSHOT_KEY]['data']['displayName'] = 'Someone Else'
+        self.assert_(load_user_snapshot(request, self.user_id) is None)
+
+    def test_bad_signature(self):
+        from typepadapp.auth import save_user_snapshot, load_user_snapshot, TYPEPAD_SNAPSHOT_KEY
+        request = self.make_request()
+        save_user_snapshot(request, self.make_user())
+        snapshot = request.session[TYPEPAD_SNAPSHOT_KEY]
+        signature = snapshot['signature']
+        for bad in (signature[:-1] + 'x', signature[:-1], '', None):
+            snapshot['signature'] = bad
+            self.assert_(load_user_snapshot(request, self.user_id) is None)
+        snapshot['signature'] = unicode(signature)
+        self.assert_(load_user_snapshot(request, self.user_id) is not None)
+
+    def test_stale(self):
+        from typepadapp.auth import save_user_snapshot, load_user_snapshot
+        request = self.make_request()
+        save_user_snapshot(request, self.make_user())
+        settings.TYPEPAD_USER_SNAPSHOT_REFRESH = -1
+        try:
+            self.assert_(load_user_snapshot(request, self.user_id) is None)
+        finally:
+            del settings.TYPEPAD_USER_SNAPSHOT_REFRESH
+
+    def test_no_user(self):
+        from django.contrib.auth.models import AnonymousUser
+        from typepadapp.auth import get_user, TypePadBackend, TYPEPAD_SESSION_KEY
+        request = self.make_request()
+        request.session[TYPEPAD_SESSION_KEY] = self.user_id
+        backend_get_user = TypePadBackend.get_user
+        TypePadBackend.get_user = lambda self, user_id: None
+        snapshots = getattr(settings, 'TYPEPAD_USER_SNAPSHOT', False)
+        settings.TYPEPAD_USER_SNAPSHOT = True
+        try:
+            self.assert_(isinstance(get_user(request), AnonymousUser))
+        finally:
+            TypePadBackend.get_user = backend_get_user
+            settings.TYPEPAD_USER_SNAPSHOT = snapshots
+
+
+class LazyProxyTests(unittest.TestCase):
+
+    def test_lazy(self):
+        from typepadapp.views.base import _LazyProxy
+        class Thing(object):
+            name = 'thing'
+            def __unicode__(self):
+                return u'a thing'
+        calls = []
+        def load():
+            calls.append(True)
+            return Thing()
+
+        proxy = _LazyProxy(load)
+        self.assertEquals(calls, [])
+        self.assertEquals(proxy.name, 'thing')
+        self.assertEquals(unicode(proxy), u'a thing')
+        self.assertEquals(len(calls), 1)
+        self.assert_(proxy == proxy.resolve())
+
+    def test_request_attribute(self):
+        import pickle
+        from django.http import HttpRequest
+        from typepadapp.views.base import _LazyRequestAttribute
+        from typepadapp.models import User
+        calls = []
+        def load():
+            calls.append(True)
+            return User(url_id='6p1234')
+
+        request = HttpRequest()
+        proxy = _LazyRequestAttribute.set_lazy(request, 'typepad_user', load)
+        self.assertEquals(calls, [])
+
+        # view code gets the real user
+        self.assert_(isinstance(request.typepad_user, User))
+        self.assertEquals(pickle.loads(pickle.dumps(request.typepad_user)).url_id, '6p1234')
+        self.assertEquals(proxy.url_id, '6p1234')
+        self.assertEquals(len(calls), 1)
+
+        request.typepad_user = None
+        self.assert_(request.typepad_user is None)
+        self.failIf(hasattr(HttpRequest(), 'typepad_user'))
+
+
+class LazyRequestContextTests(unittest.TestCase):
+
+    def test_lazy(self):
+        from django.http import HttpRequest
+        from typepadapp.views.base import LazyRequestContext
+        calls = []
+        def processor(request):
+            calls.append(request)
+            return {'processed': True, 'shadowed': 'processor'}
+
+        request = HttpRequest()
+        context = LazyRequestContext(request, processors=[processor])
+        context['shadowed'] = 'view'
+        self.assertEquals(context['shadowed'], 'view')
+        self.assertEquals(calls, [])
+
+        self.assertEquals(context['processed'], True)
+        self.assertEquals(context.get('processed'), True)
+        self.assertEquals(calls, [request])
+
+
+class PageCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        from typepadapp.views.base import page_cache_stamp
+        page_cache_stamp.bump()
+
+    def make_request(self, session=None):
+        from django.contrib.auth.models import AnonymousUser
+        from django.http import HttpRequest, QueryDict
+        request = HttpRequest()
+        request.method = 'GET'
+        request.path = '/page-cache-test'
+        request.GET = QueryDict('')
+        request.user = AnonymousUser()
+        request.session = session or {}
+        return request
+
+    def make_view(self):
+        from django import http
+        from typepadapp.views.base import TypePadView
+        calls = []
+        class View(TypePadView):
+            page_cache = True
+            def get(self, request, *args, **kwargs):
+                calls.append(request)
+                return http.HttpResponse('page %d' % len(calls))
+        return View, calls
+
+    def test_cache(self):
+        from typepadapp import signals
+        from typepadapp.caching import cache_stats
+        View, calls = self.make_view()
+        cache_stats.reset()
+
+        self.assertEquals(View(self.make_request()).content, 'page 1')
+        self.assertEquals(View(self.make_request()).content, 'page 1')
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(cache_stats.hit_ratio('pages'), 0.5)
+
+        signals.asset_created.send(sender=None, instance=None, group=None)
+        self.assertEquals(View(self.make_request()).content, 'page 2')
+
+    def test_signed_in(self):
+        from typepadapp.auth import TYPEPAD_SESSION_KEY
+        View, calls = self.make_view()
+        session = {TYPEPAD_SESSION_KEY: 'tag:api.typepad.com,2009:6p1234'}
+        View(self.make_request(session))
+        View(self.make_request(session))
+        self.assertEquals(len(calls), 2)
+
+    def test_visitor_state(self):
+        View, calls = self.make_view()
+        View(self.make_request())
+
+        # a page cached for others isn't shown with this visitor's messages
+        request = self.make_request({'next': '/'})
+        self.assertEquals(View(request).content, 'page 2')
+        request = self.make_request()
+        request.flash = {'notice': 'Saved.'}
+        self.assertEquals(View(request).content, 'page 3')
+        self.assertEquals(View(self.make_request()).content, 'page 1')
+
+    def test_vary_cookie(self):
+        View, calls = self.make_view()
+        get = View.get
+        def get_varying(self, request, *args, **kwargs):
+            response = get(self, request, *args, **kwargs)
+            response['Vary'] = 'Accept-Encoding, Cookie'
+            return response
+        View.get = get_varying
+        View(self.make_request())
+        View(self.make_request())
+        self.assertEquals(len(calls), 2)
+
+
+class AutoValidatorsTests(unittest.TestCase):
+
+    key = 'objectcache:Test:6p1234'
+
+    def setUp(self):
+        from typepadapp.caching import touch_key_version
+        django.core.cache.cache.set(self.key, 'test')
+        touch_key_version(self.key)
+
+    def make_request(self, etag=None):
+        from django.http import HttpRequest, QueryDict
+        request = HttpRequest()
+        request.method = 'GET'
+        request.path = '/validators-test'
+        request.GET = QueryDict('')
+        request.session = {}
+        if etag is not None:
+            request.META['HTTP_IF_NONE_MATCH'] = etag
+        return request
+
+    def make_view(self, uncached=False):
+        from django import http
+        from typepadapp.caching import cache_reads
+        from typepadapp.views.base import TypePadView
+        calls = []
+        key = self.key
+        class View(TypePadView):
+            auto_validators = True
+            def select_from_typepad(self, request, *args, **kwargs):
+                calls.append(request)
+                cache_reads.read(key)
+                if uncached:
+                    cache_reads.uncached_read()
+            def get(self, request, *args, **kwargs):
+                return http.HttpResponse('page')
+        return View, calls
+
+    def test_not_modified(self):
+        from typepadapp.caching import touch_key_version
+        View, calls = self.make_view()
+        response = View(self.make_request())
+        self.assertEquals(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEquals(response['Cache-Control'], 'private, must-revalidate')
+
+        response = View(self.make_request(etag))
+        self.assertEquals(response.status_code, 304)
+        self.assertEquals(response['Cache-Control'], 'private, must-revalidate')
+        self.assertEquals(len(calls), 1)
+
+        touch_key_version(self.key)
+        response = View(self.make_request(etag))
+        self.assertEquals(response.status_code, 200)
+        self.assertNotEquals(response['ETag'], etag)
+
+    def test_uncached(self):
+        View, calls = self.make_view(uncached=True)
+        response = View(self.make_request())
+        self.failIf(response.has_header('ETag'))
+
+    def test_expired(self):
+        View, calls = self.make_view()
+        etag = View(self.make_request())['ETag']
+        # what was read may have changed on TypePad since it expired
+        django.core.cache.cache.delete(self.key)
+        response = View(self.make_request(etag))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(calls), 2)
+
+    def test_not_allowed(self):
+        View, calls = self.make_view()
+        etag = View(self.make_request())['ETag']
+        View.login_required = True
+        response = View(self.make_request(etag))
+        self.assertEquals(response.status_code, 302)
+
+    def test_off_by_default(self):
+        View, calls = self.make_view()
+        View.auto_validators = False
+        response = View(self.make_request())
+        self.failIf(response.has_header('ETag'))
+        self.failIf(response.has_header('Cache-Control'))
+
+
+class TypePadCacheTagTests(unittest.TestCase):
+
+    def test_fragment(self):
+        from typepadapp.caching import touch_key_version, cache_stats
+        from typepadapp.models import Asset
+        asset = Asset.from_dict({'urlId': '6a00frag00000001', 'title': 'First'})
+        tmpl = Template('{% load typepadcache %}'
+            '{% typepadcache "title" asset %}{{ asset.title }}{% endtypepadcache %}')
+        touch_key_version(asset.cache_key)
+        cache_stats.reset()
+
+        self.assertEquals(tmpl.render(Context({'asset': asset})), 'First')
+        asset.title = 'Second'
+        self.assertEquals(tmpl.render(Context({'asset': asset})), 'First')
+        self.assertEquals(cache_stats.hit_ratio('fragment:title'), 0.5)
+
+        # changing the object in the cache rebuilds the fragment
+        touch_key_version(asset.cache_key)
+        self.assertEquals(tmpl.render(Context({'asset': asset})), 'Second')
+
+    def test_uncacheable(self):
+        tmpl = Template('{% load typepadcache %}'
+            '{% typepadcache thing %}{{ thing }}{% endtypepadcache %}')
+        self.assertEquals(tmpl.render(Context({'thing': 'a'})), 'a')
+        self.assertEquals(tmpl.render(Context({'thing': 'b'})), 'b')
+
+
+class StreamingTests(unittest.TestCase):
+
+    def make_template(self):
+        base = Template('<html>{% block head %}Head{% endblock %}'
+            '{% block body %}{% endblock %}</html>')
+        page = Template('{% extends base %}{% block body %}{% with "!" as bang %}'
+            '{% for comment in comments %}{% if comment %}<p>{{ comment }}{{ bang }}</p>'
+            '{% else %}<p>-</p>{% endif %}{% empty %}none{% endfor %}'
+            '{% endwith %}{{ block.super }}{% endblock %}')
+        return base, page
+
+    def test_iter_render(self):
+        from typepadapp.utils.streaming import iter_render
+        for comments in (['a', '', 'c'], []):
+            base, page = self.make_template()
+            expected = page.render(Context({'base': base, 'comments': comments}))
+            base, page = self.make_template()
+            chunks = list(iter_render(page, Context({'base': base, 'comments': comments})))
+            self.assertEquals(u''.join(chunks), expected)
+        self.assert_(len(chunks) > 1)
+
+    def test_response(self):
+        from django.http import HttpRequest
+        from django.template import loader
+        from typepadapp.views.base import GenericView
+        base, page = self.make_template()
+        class View(GenericView):
+            stream_response = True
+            def get(self, request, *args, **kwargs):
+                self.context.update({'base': base})
+                return self.render_to_response('page.html', {'comments': ['a', 'b']})
+
+        # render_to_response takes template names, so load ours by name
+        get_template = loader.get_template
+        loader.get_template = lambda name: page
+        try:
+            request = HttpRequest()
+            request.method = 'GET'
+            response = View(request)
+        finally:
+            loader.get_template = get_template
+        self.failIf(response._is_string)
+
+        # the streamed render is scoped as a request of its own
+        from django.core.signals import request_finished
+        finished = []
+        def note_finished(sender, **kwargs):
+            finished.append(sender)
+        request_finished.connect(note_finished)
+        try:
+            self.assertEquals(response.content, '<html>Head<p>a!</p><p>b!</p></html>')
+        finally:
+            request_finished.disconnect(note_finished)
+        self.assertEquals(finished, [View])
+
+
+class FeedCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        from typepadapp.views.base import feed_cache_stamp
+        feed_cache_stamp.bump()
+
+    def make_request(self, **meta):
+        from django.http import HttpRequest, QueryDict
+        request = HttpRequest()
+        request.method = 'GET'
+        request.path = '/feeds/test'
+        request.GET = QueryDict('')
+        request.META = dict(SERVER_NAME='example.com', SERVER_PORT='80', **meta)
+        return request
+
+    def make_feed(self, **attrs):
+        import datetime
+        from typepadapp.views.base import TypePadFeed
+        builds = []
+        class Item(object):
+            def __init__(self, i):
+                self.title = 'Entry %d' % i
+                self.published = datetime.datetime(2010, 1, i)
+            def __unicode__(self):
+                return self.title
+            def get_absolute_url(self):
+                return '/entry/%s' % self.title
+        class TestFeed(TypePadFeed):
+            title = 'Test feed'
+            link = '/'
+            def get_object(self, bits):
+                builds.append(bits)
+            def items(self):
+                return [Item(1), Item(2), Item(3)]
+            def item_pubdate(self, item):
+                return item.published
+        for name, value in attrs.items():
+            setattr(TestFeed, name, value)
+        return TestFeed, builds
+
+    def test_cache(self):
+        from typepadapp import signals
+        from typepadapp.views.base import feed
+        TestFeed, builds = self.make_feed()
+        feeds = {'test': TestFeed}
+
+        response = feed(self.make_request(), 'test', feeds)
+        self.assert_('Entry 3' in response.content)
+        etag = response['ETag']
+        # the latest entry's date, converted from local time
+        self.assert_(response['Last-Modified'].startswith('Sun, 03 Jan 2010 '))
+        self.assertEquals(feed(self.make_request(), 'test', feeds).content, response.content)
+        self.assertEquals(len(builds), 1)
+
+        response = feed(self.make_request(HTTP_IF_NONE_MATCH=etag), 'test', feeds)
+        self.assertEquals(response.status_code, 304)
+        response = feed(self.make_request(HTTP_IF_NONE_MATCH='"other"'), 'test', feeds)
+        self.assertEquals(response.status_code, 200)
+
+        signals.favorite_created.send(sender=None, instance=None, group=None, parent=None)
+        feed(self.make_request(HTTP_IF_NONE_MATCH=etag), 'test', feeds)
+        self.assertEquals(len(builds), 2)
+
+    def test_stream(self):
+        from typepadapp.views.base import feed
+        TestFeed, builds = self.make_feed(cache_feed=False)
+        expected = TestFeed('test', self.make_request()).get_feed().writeString('utf-8')
+
+        TestFeed, builds = self.make_feed(stream_feed=True)
+        feedgen, content = TestFeed('test', self.make_request()).iter_feed()
+        content = list(content)
+        self.assertEquals(len(content), 5)
+        self.assertEquals(''.join(content), expected)
+
+        # the streamed feed was cached as it was written
+        response = feed(self.make_request(), 'test', {'test': TestFeed})
+        self.assertEquals(response.content, expected)
+        self.assertEquals(len(builds), 1)
+
+
+class HubPublisherTests(unittest.TestCase):
+
+    def setUp(self):
+        from typepadapp.tests.stubhub import StubHub
+        self.hub = StubHub()
+        self.hub.start()
+
+    def tearDown(self):
+        self.hub.stop()
+
+    def make_publisher(self):
+        from typepadapp.utils.hubpublish import HubPublisher
+        scheduled = []
+        class Publisher(HubPublisher):
+            def schedule(self, delay, fn, *args):
+                scheduled.append((delay, fn, args))
+                return threading.Timer(delay, fn, args)
+        return Publisher(delay=5, retries=2, retry_delay=10), scheduled
+
+    def test_batch(self):
+        publisher, scheduled = self.make_publisher()
+        publisher.publish(self.hub.url, 'http://example.com/a')
+        publisher.publish(self.hub.url, 'http://example.com/b', 'http://example.com/a')
+        self.assertEquals(len(scheduled), 1)
+        self.assertEquals(self.hub.published, [])
+
+        publisher.flush()
+        self.assertEquals(self.hub.published,
+            [['http://example.com/a', 'http://example.com/b']])
+
+    def test_delay(self):
+        publisher, scheduled = self.make_publisher()
+        # feeds aren't announced before every process sees they changed
+        self.assertEquals(publisher.delay, 11)
+        publisher.publish(self.hub.url, 'http://example.com/a')
+        self.assertEquals(scheduled[0][0], 11)
+
+    def test_retry(self):
+        publisher, scheduled = self.make_publisher()
+        self.hub.failures = 5
+        self.failIf(publisher.send(self.hub.url, ['http://example.com/a']))
+        while scheduled:
+            delay, fn, args = scheduled.pop(0)
+            fn(*args)
+        self.assertEquals(self.hub.failures, 2)
+        self.assertEquals(self.hub.published, [])
+
+        self.hub.failures = 1
+        self.failIf(publisher.send(self.hub.url, ['http://example.com/a']))
+        self.assertEquals([delay for delay, fn, args in scheduled], [10])
+        delay, fn, args = scheduled.pop()
+        self.assert_(fn(*args))
+        self.assertEquals(self.hub.published, [['http://example.com/a']])
+
+    def test_signals(self):
+        from typepadapp import signals
+        from typepadapp.utils import hubpublish
+        publisher, scheduled = self.make_publisher()
+        original = hubpublish.publisher
+        hubpublish.publisher = publisher
+        settings.HUB_PUBLISH_FEEDS = {self.hub.url: ['http://example.com/events',
+            lambda sender, **kwargs: ['http://example.com/%s' % sender]]}
+        try:
+            signals.asset_created.send(sender='asset', instance=None, group=None, parent=None)
+            publisher.flush()
+        finally:
+            hubpublish.publisher = original
+            settings.HUB_PUBLISH_FEEDS = {}
+        self.assertEquals(self.hub.published,
+            [['http://example.com/asset', 'http://example.com/events']])
+
+
+class TemplateCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.template_dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.template_dir, 'sub'))
+        self.write('a.html', 'A')
+        self.write('sub/b.html', '{% extends "a.html" %}')
+        self.write('.hidden', 'hidden')
+        self.template_dirs = settings.TEMPLATE_DIRS
+        settings.TEMPLATE_DIRS = (self.template_dir,)
+
+    def tearDown(self):
+        import shutil
+        settings.TEMPLATE_DIRS = self.template_dirs
+        shutil.rmtree(self.template_dir)
+
+    def write(self, name, content, mtime=None):
+        path = os.path.join(self.template_dir, name)
+        f = open(path, 'w')
+        f.write(content)
+        f.close()
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_preload(self):
+        from typepadapp.cached_templates import TemplateCache
+        cache = TemplateCache()
+        names = cache.template_names()
+        self.assert_('a.html' in names)
+        self.assert_('sub/b.html' in names)
+        self.failIf('.hidden' in names)
+
+        cache.preload(['a.html', 'sub/b.html', 'missing.html'])
+        self.assertEquals(sorted(cache.templates.keys()), ['a.html', 'sub/b.html'])
+        self.assertEquals(sorted([name for name, seconds in cache.report()]),
+            ['a.html', 'sub/b.html'])
+
+    def test_reload(self):
+        from typepadapp.cached_templates import TemplateCache
+        for reload in (False, True):
+            self.write('a.html', 'A', mtime=1000000000)
+            cache = TemplateCache(reload=reload)
+            template = cache.get('a.html')
+            self.assert_(cache.get('a.html') is template)
+
+            self.write('a.html', 'B', mtime=1000000010)
+            expected = reload and 'B' or 'A'
+            self.assertEquals(cache.get('a.html').render(Context()), expected)
+
+    def test_threads(self):
+        from typepadapp.cached_templates import TemplateCache
+        compiled = []
+        class CountingCache(TemplateCache):
+            def compile(self, template_name):
+                compiled.append(template_name)
+                return super(CountingCache, self).compile(template_name)
+        cache = CountingCache()
+        threads = [threading.Thread(target=cache.get, args=('a.html',))
+            for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(compiled, ['a.html'])
+
+
+class TemplateStackTests(unittest.TestCase):
+
+    def test_parser_context(self):
+        from typepadapp.cached_templates import ParserContext
+        context = ParserContext({'a': 1})
+        context.push()['a'] = 2
+        context['b'] = 3
+        self.assertEquals(list(context), [{'a': 2, 'b': 3}, {'a': 1}])
+        self.assertEquals(context.pop(), {'a': 2, 'b': 3})
+        self.assertEquals(context['a'], 1)
+        self.failIf(context.has_key('b'))
+
+    def test_block_context(self):
+        from typepadapp.cached_templates import BlockContext
+        blocks = BlockContext()
+        blocks.add_blocks({'body': 'child'})
+        blocks.add_blocks({'body': 'parent', 'head': 'parent head'})
+        self.assertEquals(blocks.get_block('body'), 'child')
+        self.assertEquals(blocks.pop('body'), 'child')
+        self.assertEquals(blocks.pop('body'), 'parent')
+        self.assertEquals(blocks.pop('body'), None)
+        blocks.push('body', 'parent')
+        self.assertEquals(blocks.get_block('body'), 'parent')
+
+    def test_root_blocks(self):
+        from typepadapp.cached_templates import root_blocks
+        base = Template('<{% block a %}A{% endblock %}{% block b %}B{% endblock %}>')
+        child = Template('{% extends base %}{% block a %}{% endblock %}')
+        blocks = root_blocks(base.nodelist)
+        self.assertEquals(sorted(blocks.keys()), ['a', 'b'])
+        self.assert_(root_blocks(base.nodelist) is blocks)
+        self.assertEquals(root_blocks(child.nodelist), None)
+
+
+class CompilerTests(unittest.TestCase):
+
+    templates = (
+        '{{ obj.name }} {{ obj.method }} {{ obj.needs_arg }}|{{ obj.delete }}|{{ obj.key }}',
+        '{{ d.a.b }} {{ d.items }} {{ l.1 }} {{ l.5 }} {{ missing }} {{ missing.x|default:"-" }}',
+        '{{ html }} {{ html|safe }} {{ html|upper|lower }} {{ "lit"|upper }} {{ 3 }} {{ html|cut:obj.name }}',
+        '{% for x in l %}{{ forloop.counter }}{{ x }}{% if forloop.last %}!{% endif %}{% endfor %}',
+        '{% for a, b in pairs reversed %}{{ a }}{{ b }}{{ forloop.revcounter0 }}{% endfor %}{{ a }}',
+        '{% for x in none %}x{% empty %}empty{% endfor %}{% for x in l %}{% for y in pairs %}'
+            '{{ forloop.parentloop.counter }}{{ y.1 }}{% endfor %}{% endfor %}',
+        '{% if num and l %}yes{% else %}no{% endif %}{% if none or missing %}a{% else %}b{% endif %}'
+            '{% if not none %}c{% endif %}{% if missing and crash.x %}d{% endif %}',
+        '{% with d.a.b as v %}{{ v }}{% with "x" as v %}{{ v }}{% endwith %}{{ v }}{% endwith %}{{ v }}',
+        '{% autoescape off %}{{ html }}{% endautoescape %}{% ifequal num 5 %}five{% endifequal %}',
+    )
+
+    def make_context(self):
+        class Obj(object):
+            name = '<b>obj</b>'
+            def method(self):
+                return 'called'
+            def needs_arg(self, x):
+                return x
+            def delete(self):
+                return 'deleted'
+            delete.alters_data = True
+            def __getitem__(self, key):
+                if key == 'key':
+                    return 'item'
+                raise KeyError(key)
+        return Context({'obj': Obj(), 'd': {'a': {'b': 'deep'}, 'items': 'dict'},
+            'l': ['zero', 'one'], 'pairs': [(1, 'a'), (2, 'b')], 'none': None,
+            'html': '<i>x</i>', 'num': 5})
+
+    def test_output(self):
+        from typepadapp.utils.compiler import compile_template, CompiledNodeList
+        for source in self.templates:
+            expected = Template(source).render(self.make_context())
+            template = compile_template(Template(source))
+            self.assert_(isinstance(template.nodelist, CompiledNodeList))
+            self.assertEquals(template.render(self.make_context()), expected)
+
+    def test_extends(self):
+        from typepadapp.utils.compiler import compile_template
+        def make_templates():
+            base = Template('<{% block a %}A{% for x in l %}{{ x }}{% endfor %}{% endblock %}'
+                '|{% block b %}B{% endblock %}>')
+            child = Template('{% extends base %}{% block a %}({{ block.super }}c){% endblock %}'
+                '{% block b %}{% if num %}{{ block.super }}c{% endif %}{% endblock %}')
+            return base, child
+
+        base, child = make_templates()
+        context = self.make_context()
+        context['base'] = base
+        expected = child.render(context)
+
+        base, child = make_templates()
+        context['base'] = compile_template(base)
+        self.assertEquals(compile_template(child).render(context), expected)
+        self.assertEquals(expected, '<(Azeroonec)|Bc>')
+
+
+class MemoCacheTests(unittest.TestCase):
+
+    def test_memo(self):
+        from typepadapp.caching import MemoCache
+        memo = MemoCache('memotest', size=2)
+        memo.clear()
+        memo.set('a', 'A')
+        memo.set('b', 'B')
+        memo.set('c', 'C')
+        self.assertEquals(sorted(memo.values.keys()), ['b', 'c'])
+
+        # evicted values are found again in the shared cache
+        self.assertEquals(memo.get('a'), 'A')
+        self.assertEquals(sorted(memo.values.keys()), ['a', 'c'])
+
+        memo.clear()
+        self.assertEquals(memo.values, {})
+        django.core.cache.cache.delete('memotest:b')
+        self.assert_(memo.get('b') is None)
+
+
+class DeriverTests(unittest.TestCase):
+
+    def test_derived(self):
+        import cPickle as pickle
+        from typepadapp.caching import derive, derived, deriver
+        from typepadapp.models import Link, Post
+
+        link = Link(target_url='http://user@www.example.com/index.html?x=1')
+        derive(link)
+        link = pickle.loads(pickle.dumps(link))
+        self.assertEquals(link.__dict__['_derived']['link_title'], (1, 'example.com'))
+        self.assertEquals(link.link_title, 'example.com')
+        self.assertEquals(link.type_id, 'link')
+
+        post = Post(content='<p>One <b>two</b> three</p>\n<p>four</p><script>x</script>')
+        derive(post)
+        post = pickle.loads(pickle.dumps(post))
+        self.assertEquals(post.sanitized_content, '<p>One <b>two</b> three</p>\n<p>four</p>')
+        self.assertEquals(post.word_count, 4)
+
+        # derived fields are discarded when the object changes
+        post.content = 'five six'
+        self.assertEquals(post.word_count, 2)
+
+        # only classes with derivers keep derived fields
+        import typepad
+        self.failIf('_derived' in typepad.TypePadObject.statefields())
+        self.assert_('_derived' in Post.statefields())
+
+        # a changed deriver rederives its field as it's read
+        calls = []
+        @deriver(Post, 'word_count', version=2)
+        def counter(post):
+            calls.append(post)
+            return 'new'
+        try:
+            self.assertEquals(post.word_count, 'new')
+            self.assertEquals(post.word_count, 'new')
+            self.assertEquals(len(calls), 1)
+        finally:
+            from typepadapp.caching import _derivers, _class_derivers
+            del _derivers[Post]
+            _class_derivers.clear()
+
+
+class DateFilterTests(unittest.TestCase):
+
+    def test_pithy_timesince(self):
+        import datetime
+        from django.utils.tzinfo import FixedOffset
+        from typepadapp.templatetags.date_filters import clock, pithy_timesince, is_relative
+
+        clock.start()
+        try:
+            now = clock.now()
+            self.assert_(clock.now() is now)
+            ago = lambda **kwargs: now - datetime.timedelta(**kwargs)
+
+            self.assertEquals(pithy_timesince(ago(seconds=30)), 'just now')
+            self.assertEquals(pithy_timesince(ago(minutes=5)), '5 minutes ago')
+            self.assertEquals(pithy_timesince(ago(hours=3)), '3 hours ago')
+            self.assertEquals(pithy_timesince(ago(days=2)), '2 days ago')
+            self.assertEquals(pithy_timesince(datetime.datetime(2009, 1, 5), 'on'), 'on Jan 5, 2009')
+            if now.month > 2:
+                self.assertEquals(pithy_timesince(now.replace(month=1, day=2), 'on'), 'on Jan 2nd')
+            self.assert_(is_relative(ago(days=7)))
+            self.assert_(not is_relative(ago(days=8)))
+
+            # aware dates are compared in the local timezone
+            utc = (clock.now(True) - clock.now(True).utcoffset()).replace(tzinfo=FixedOffset(0))
+            self.assertEquals(pithy_timesince(utc - datetime.timedelta(hours=2)), '2 hours ago')
+        finally:
+            clock.stop()
+        self.assert_(clock.times is None)
+
+
+class URLBuilderTests(unittest.TestCase):
+
+    class urlconf(object):
+        from django.conf.urls.defaults import patterns, url
+        urlpatterns = patterns('',
+            url(r'^(?P<page>\d+)?$', 'django.views.generic.simple.direct_to_template', name='home'),
+            url(r'^entry/(\w+)/?$', 'django.views.generic.simple.direct_to_template', name='asset'),
+            url(r'^members/(?P<userid>\w+)/?$', 'django.views.generic.simple.direct_to_template', name='member'),
+            url(r'^feeds/(?P<url>.*)$', 'django.views.generic.simple.direct_to_template', name='feeds'),
+        )
+
+    def test_reverse(self):
+        from django.core.urlresolvers import reverse as django_reverse, NoReverseMatch
+        from typepadapp.utils.urls import reverse
+
+        for name, args, kwargs in (('home', None, None), ('home', None, {'page': 2}),
+                                   ('asset', ['6a00abc'], None), ('member', None, {'userid': 'mtalk'}),
+                                   ('feeds', None, {'url': u'members/caf\xe9'})):
+            expected = django_reverse(name, self.urlconf, args, kwargs)
+            self.assertEquals(reverse(name, self.urlconf, args, kwargs), expected)
+            self.assertEquals(reverse(name, self.urlconf, args, kwargs), expected)
+
+        for name, args, kwargs in (('asset', ['a-b'], None), ('member', None, {'id': 'x'}),
+                                   ('nothing', None, None)):
+            self.assertRaises(NoReverseMatch, reverse, name, self.urlconf, args, kwargs)
+
+        self.assertEquals(reverse('home', self.urlconf, kwargs={'page': 1}), '/1')
+        self.assertRaises(NoReverseMatch, reverse, 'home', self.urlconf, kwargs={'page': 1.0})
+
+    def test_urlconf_change(self):
+        from django.core.urlresolvers import clear_url_caches, get_resolver
+        from typepadapp.utils.urls import reverse
+
+        self.assertEquals(reverse('asset', self.urlconf, ['a']), '/entry/a')
+        self.assert_(get_resolver(self.urlconf)._built_urls)
+        clear_url_caches()
+        self.assert_(not hasattr(get_resolver(self.urlconf), '_built_urls'))
+        self.assertEquals(reverse('asset', self.urlconf, ['a']), '/entry/a')
+
+
+class RenditionTests(unittest.TestCase):
+
+    def test_rendition(self):
+        import cPickle as pickle
+        import typepad
+        from typepadapp.caching import derive
+        from typepadapp.models import Event, User
+
+        user = User(avatar_link=typepad.ImageLink(url='http://example.com/a.jpg',
+            url_template='http://example.com/a-{spec}.jpg', width=200, height=100))
+        event = Event(actor=user)
+        derive(event)
+        event = pickle.loads(pickle.dumps(event))
+
+        link = event.actor.avatar_link
+        self.assertEquals(link._renditions.keys(), [('square', 50)])
+        self.assertEquals(event.actor.userpic, 'http://example.com/a-50si.jpg')
+
+        small = link.rendition('by_width', 100)
+        self.assert_(link.rendition('by_width', 100) is small)
+        self.assertEquals((small.url, small.width, small.height),
+            ('http://example.com/a-100wi.jpg', 100, 50))
+        self.assert_('_renditions' not in small.__dict__)
+
+    def test_from_api(self):
+        import cPickle as pickle
+        from typepadapp.caching import derive
+        from typepadapp.models import Event, User
+
+        user = User.from_dict({'avatarLink': {'url': 'http://example.com/a.jpg',
+            'urlTemplate': 'http://example.com/a-{spec}.jpg', 'width': 200, 'height': 100}})
+        derive(user)
+        user = pickle.loads(pickle.dumps(user))
+        self.assertEquals(user.avatar_link._renditions.keys(), [('square', 50)])
+
+        event = Event.from_dict({'actor': {'objectType': 'User', 'avatarLink': {'url': 'http://example.com/b.jpg',
+            'urlTemplate': 'http://example.com/b-{spec}.jpg', 'width': 200, 'height': 100}}})
+        derive(event)
+        event = pickle.loads(pickle.dumps(event))
+        self.assertEquals(event.actor.avatar_link._renditions.keys(), [('square', 50)])
+
+
+class CursorPaginationTests(unittest.TestCase):
+
+    location = 'https://api.typepad.com/users/6p1234/events.json'
+
+    class Page(object):
+        def __init__(self, entries, total, token=None):
+            self.entries = entries
+            self.total_results = total
+            self.more_results_token = token
+
+    class List(object):
+        _location = 'https://api.typepad.com/users/6p1234/events.json?start-index=1'
+        def filter(self, **kwargs):
+            self.kwargs = kwargs
+            return self
+
+    def setUp(self):
+        django.core.cache.cache.delete('cursorindex:listcache:%s' % self.location)
+
+    def paginate(self, pagenum, object_list):
+        from typepadapp.views.base import TypePadView
+        class View(object):
+            paginate_by = limit = 20
+        view = View()
+        view.pagenum = pagenum
+        view.offset = (pagenum - 1) * 20 + 1
+        return TypePadView.paginate.im_func(view, object_list)
+
+    def test_cursor_index(self):
+        from typepadapp.caching import CursorIndex, invalidate_rule
+
+        class Event(object):
+            xid = '6e01'
+        CursorIndex(self.location).record(2, self.Page([Event()], 55, token='abc'))
+        CursorIndex(self.location).record(3, self.Page([Event()], 55))
+
+        index = CursorIndex(self.location)
+        self.assertEquals(index.tokens, {2: 'abc'})
+        self.assertEquals(index.start_token(3), 'abc')
+        self.assert_(index.start_token(2) is None)
+
+        self.assertEquals(self.paginate(3, self.List()).kwargs, {'start_token': 'abc', 'max_results': 20})
+        self.assertEquals(self.paginate(2, self.List()).kwargs, {'start_index': 21, 'max_results': 20})
+        # pages past the end the list had are still requested
+        self.assertEquals(self.paginate(4, self.List()).kwargs, {'start_index': 61, 'max_results': 20})
+
+        invalidate_rule(key='listcache:%s' % self.location)(None)
+        self.assertEquals(CursorIndex(self.location).tokens, {})
+
+    def test_cached_list(self):
+        from typepadapp.caching import CursorIndex, CachedTypePadLinkPromise
+        class List(CachedTypePadLinkPromise):
+            _location = self.List._location
+            def __init__(self):
+                self._inst = None
+            def filter(self, **kwargs):
+                self.kwargs = kwargs
+                return self
+        CursorIndex(self.location).record(2, self.Page([], 55, token='abc'))
+
+        # pages requested by token aren't cached, as the list may have moved
+        self.assertEquals(self.paginate(3, List()).kwargs,
+            {'start_token': 'abc', 'max_results': 20, 'cache': False})
+        self.assertEquals(self.paginate(2, List()).kwargs,
+            {'start_index': 21, 'max_results': 20})
+        self.assertEquals(self.paginate(11, List()).kwargs,
+            {'start_index': 201, 'max_results': 20, 'cache': False})
+
+    def test_whole_list(self):
+        from django.http import HttpRequest, QueryDict
+        from typepadapp.views.base import TypePadView
+        class Page(list):
+            total_results = 25
+        class List(object):
+            _location = 'https://api.typepad.com/users/6p1234/events.json'
+            def filter(self, **kwargs):
+                self.kwargs = kwargs
+                return Page(range(5))
+        whole = List()
+        class View(TypePadView):
+            paginate_by = 20
+            def select_from_typepad(self, request, *args, **kwargs):
+                self.object_list = whole
+        request = HttpRequest()
+        request.method = 'GET'
+        request.GET = QueryDict('')
+        request.session = {}
+        view = View(request, page='2')
+        self.assertEquals(whole.kwargs, {'start_index': 21, 'max_results': 20})
+        self.assertEquals(view.context['page_obj'].num_pages, 2)
+
+    def test_total_pages(self):
+        from typepadapp.utils.paginator import FinitePaginator
+        page = FinitePaginator(range(5), 20, offset=41, total=55).page(3)
+        self.assertEquals(page.num_pages, 3)
+        self.assert_(not page.has_next())
+        self.assert_(FinitePaginator(range(20), 20, offset=1, total=55).page(1).has_next())
+
+
+class CacheAdmissionTests(unittest.TestCase):
+
+    def setUp(self):
+        from typepadapp.caching import CacheAdmission
+        self.admission = CacheAdmission()
+        settings.CACHE_ADMISSION = True
+
+    def tearDown(self):
+        settings.CACHE_ADMISSION = False
+        self.admission.end()
+
+    def request(self, agent):
+        from django.http import HttpRequest
+        request = HttpRequest()
+        request.META['HTTP_USER_AGENT'] = agent
+        return request
+
+    def test_sketch(self):
+        from typepadapp.caching import FrequencySketch
+        sketch = FrequencySketch(width=64, sample_size=1000)
+        for i in range(5):
+            sketch.increment('popular')
+        self.assertEquals(sketch.increment('popular'), 6)
+        self.assert_(sketch.estimate('unseen') <= 6)
+
+        sketch.age()
+        self.assertEquals(sketch.estimate('popular'), 3)
+
+    def test_admit(self):
+        from typepadapp.caching import cache_stats
+        cache_stats.reset()
+        admit = self.admission.admit
+        self.assert_(not admit('objects', 'objectcache:Asset:6a01'))
+        self.assert_(admit('objects', 'objectcache:Asset:6a01'))
+        self.assertEquals(cache_stats.report()['admission:objects'],
+            (1, 1, 0.5))
+
+        key = 'listcache:/groups/6p01/events.json:501:550'
+        self.assert_(not admit('lists', key, 501))
+        self.assert_(not admit('lists', key, 501))
+
+        settings.CACHE_ADMISSION = False
+        self.assert_(admit('objects', 'objectcache:Asset:6a02'))
+
+    def test_crawlers(self):
+        admit = self.admission.admit
+        self.admission.begin(self.request('Mozilla/5.0 (compatible; Googlebot/2.1)'))
+        for i in range(3):
+            self.assert_(not admit('objects', 'objectcache:Asset:6a03'))
+
+        # crawlers' fetches aren't counted
+        self.admission.begin(self.request('Mozilla/5.0 (X11; Linux x86_64)'))
+        self.assert_(not admit('objects', 'objectcache:Asset:6a03'))
+        self.assert_(admit('objects', 'objectcache:Asset:6a03'))
+
+
+class CacheCounterTests(unittest.TestCase):
+
+    def test_counter(self):
+        from django.dispatch import Signal
+        from typepadapp.caching import CacheCounter, derive, _counters
+
+        class Thing(object):
+            cache_key = 'objectcache:Thing:6t01'
+            like_count = 3
+        created, deleted = Signal(), Signal()
+        counter = CacheCounter(Thing, 'like_count',
+            target=lambda sender, parent=None, **kwargs: parent,
+            increment=[created], decrement=[deleted])
+        try:
+            thing = Thing()
+            django.core.cache.cache.delete(counter.cache_key(thing))
+
+            # not counted until the thing is fetched, so the cached thing
+            # is discarded instead
+            django.core.cache.cache.set(thing.cache_key, 'thing')
+            created.send(sender=None, parent=thing)
+            self.assert_(django.core.cache.cache.get(thing.cache_key) is None)
+            self.assertEquals(counter.get(Thing()), 3)
+
+            derive(thing)
+            created.send(sender=None, parent=thing)
+            created.send(sender=None, parent=thing)
+            deleted.send(sender=None, parent=thing)
+            self.assertEquals(counter.get(thing), 4)
+
+            # fetching it again reconciles the count
+            thing.like_count = 7
+            derive(thing)
+            self.assertEquals(counter.get(thing), 7)
+        finally:
+            _counters.remove(counter)
+
+    def test_load_counts(self):
+        from django.dispatch import Signal
+        from typepadapp.caching import CacheCounter, load_counts, _counters
+
+        class Thing(object):
+            like_count = 3
+            def __init__(self, xid):
+                self.cache_key = 'objectcache:Thing:%s' % xid
+        counter = CacheCounter(Thing, 'like_count', target=lambda sender, **kwargs: None)
+        try:
+            things = [Thing('6t1%d' % n) for n in range(3)]
+            for n, thing in enumerate(things):
+                django.core.cache.cache.set(counter.cache_key(thing), n)
+            django.core.cache.cache.delete(counter.cache_key(things[2]))
+
+            load_counts(things)
+            # the counts are held, so reading them needn't ask the cache
+            django.core.cache.cache.set(counter.cache_key(things[0]), 10)
+            self.assertEquals([counter.get(thing) for thing in things], [0, 1, 3])
+        finally:
+            _counters.remove(counter)
+
+    def test_installed(self):
+        from django.dispatch import Signal
+        from remoteobjects import fields
+        import typepad
+        from typepadapp.caching import CacheCounter, derive, _counters
+
+        class Thing(typepad.TypePadObject):
+            cache_key = 'objectcache:Thing:6t02'
+            like_count = fields.Field(api_name='likeCount')
+        created, deleted = Signal(), Signal()
+        counter = CacheCounter(Thing, 'like_count',
+            target=lambda sender, parent=None, **kwargs: parent,
+            increment=[created], decrement=[deleted])
+        counter.install()
+        try:
+            thing = Thing.from_dict({'likeCount': 1})
+            django.core.cache.cache.delete(counter.cache_key(thing))
+            self.assertEquals(thing.like_count, 1)
+
+            derive(thing)
+            created.send(sender=None, parent=thing)
+            self.assertEquals(thing.like_count, 2)
+
+            # decrements stop at zero
+            for i in range(3):
+                deleted.send(sender=None, parent=thing)
+            self.assertEquals(thing.like_count, 0)
+            self.assertEquals(django.core.cache.cache.get(counter.cache_key(thing)), 0)
+
+            thing.like_count = 5
+            derive(thing)
+            self.assertEquals(thing.like_count, 5)
+        finally:
+            _counters.remove(counter)
+
+
+class WriteThroughTests(unittest.TestCase):
+
+    list_key = 'listcache:https://api.typepad.com/groups/6p01/events.json'
+
+    def setUp(self):
+        from typepadapp.caching import CachedTypePadLinkPromise
+
+        class Promise(CachedTypePadLinkPromise):
+            cache_key = self.list_key
+            def __init__(self):
+                self._inst = None
+                self._item_cache_key_pattern = 'objectcache:Event:%s'
+        self.events = Promise()
+        self.cache = django.core.cache.cache
+
+    def post(self, xid):
+        from datetime import datetime
+        from typepadapp.models import Post, User
+        return Post(url_id=xid, author=User(url_id='6p1234'),
+            published=datetime(2010, 8, 1))
+
+    def test_insert(self):
+        from typepadapp.models import Event
+        self.cache.delete(self.list_key)
+        # uncached lists are left alone
+        self.assert_(self.events.cache_insert(Event.for_new_asset(self.post('6a01'))))
+        self.assert_(self.cache.get(self.list_key) is None)
+
+        self.cache.set(self.list_key, [1, '6e01'])
+        self.assert_(self.events.cache_insert(Event.for_new_asset(self.post('6a02'))))
+        self.assertEquals(self.cache.get(self.list_key), [2, 'new-6a02', '6e01'])
+        event = self.cache.get('objectcache:Event:new-6a02')
+        self.assert_(event.is_new_asset)
+        self.assertEquals(event.object.xid, '6a02')
+        self.assert_(self.cache.get('objectcache:Asset:6a02') is not None)
+
+    def test_remove(self):
+        from typepadapp.models import Event
+        self.cache.set(self.list_key, [2, '6e01'])
+        self.cache.set('objectcache:Event:6e01', Event.for_new_asset(self.post('6a03')))
+        self.assert_(self.events.cache_remove('6a03'))
+        self.assertEquals(self.cache.get(self.list_key), [1])
+
+        # an item in a part of the list we haven't seen may be the one
+        self.cache.set(self.list_key, [2, '6e01'])
+        self.assert_(not self.events.cache_remove('6a04'))
+
+    def test_fallback(self):
+        from django.dispatch import Signal
+        from typepadapp.caching import CacheListWriter
+        added = Signal()
+        writer = CacheListWriter(key=lambda sender, **kwargs: self.events,
+            target=lambda sender, instance=None, **kwargs: instance,
+            entry=lambda asset: None, added=[added])
+        self.cache.set(self.list_key, [1, '6e01'])
+        added.send(sender=None, instance=self.post('6a05'))
+        self.assert_(self.cache.get(self.list_key) is None)
+
+    def test_contended(self):
+        from typepadapp.caching import lock_list, unlock_list
+        from typepadapp.models import Event
+        self.cache.set(self.list_key, [1, '6e01'])
+        self.assert_(lock_list(self.list_key))
+        try:
+            # another process is changing the list, so we can't
+            self.failIf(self.events.cache_insert(Event.for_new_asset(self.post('6a06'))))
+            self.failIf(self.events.cache_remove('6a06'))
+            self.assertEquals(self.cache.get(self.list_key), [1, '6e01'])
+        finally:
+            self.failIf(unlock_list(self.list_key))
+        # and the holder's change is discarded too
+        self.assert_(self.cache.get(self.list_key) is None)
+
+        self.cache.set(self.list_key, [1, '6e01'])
+        self.assert_(self.events.cache_insert(Event.for_new_asset(self.post('6a07'))))
+        self.assertEquals(self.cache.get(self.list_key), [2, 'new-6a07', '6e01'])
+
+
+class EventSyncTests(unittest.TestCase):
+
+    def setUp(self):
+        import typepad
+        from typepadapp.tests.stubapi import StubTypePadAPI
+        self.api = StubTypePadAPI()
+        self.api.start()
+        self.endpoint = typepad.client.endpoint
+        typepad.client.endpoint = self.api.url
+
+    def tearDown(self):
+        import typepad
+        typepad.client.endpoint = self.endpoint
+        self.api.stop()
+
+    def ids(self, syncer):
+        return django.core.cache.cache.get(syncer.list_key)
+
+    def test_sync(self):
+        from typepadapp.utils.eventsync import EventSyncer
+        for n in range(1, 4):
+            self.api.add_event('6e0%d' % n, '6a0%d' % n)
+        syncer = EventSyncer('6p01', window=2)
+        django.core.cache.cache.delete(syncer.list_key)
+
+        self.assertEquals(syncer.sync(), 'seeded')
+        self.assertEquals(self.ids(syncer), [3, '6e03', '6e02'])
+        self.assertEquals(syncer.sync(), 'unchanged')
+
+        self.api.add_event('6e04', '6a04')
+        self.assertEquals(syncer.sync(), 'merged')
+        self.assertEquals(self.ids(syncer), [4, '6e04', '6e03', '6e02'])
+        event = django.core.cache.cache.get('objectcache:Event:6e04')
+        self.assertEquals(event.object.xid, '6a04')
+        self.assertEquals(self.api.requests[-1],
+            '/groups/6p01/events.json?max-results=2&start-index=1')
+
+        # more new events than fit in the window
+        for n in range(5, 8):
+            self.api.add_event('6e0%d' % n, '6a0%d' % n)
+        self.assertEquals(syncer.sync(), 'refetched')
+        self.assertEquals(self.ids(syncer), [7, '6e07', '6e06'])
+
+        from typepadapp.caching import lock_list, unlock_list
+        self.assert_(lock_list(syncer.list_key))
+        try:
+            self.assertEquals(syncer.sync(), 'contended')
+            self.assert_(self.ids(syncer) is None)
+        finally:
+            unlock_list(syncer.list_key)
+        self.assertEquals(syncer.sync(), 'seeded')
+
+    def test_merge_stand_ins(self):
+        from typepadapp.models import Event
+        from typepadapp.utils.eventsync import merge_event_ids
+        self.api.add_event('6e01', '6a01')
+        self.api.add_event('6e02', '6a02')
+        entries = [Event.from_dict(event) for event in self.api.events]
+
+        # the stand-in for a posted asset is replaced by its real event
+        self.assertEquals(merge_event_ids([2, 'new-6a02', '6e01', None], 2, entries[:1]),
+            [2, '6e02', '6e01', None])
+        self.assertEquals(merge_event_ids([1, '6e01'], 2, entries), [2, '6e02', '6e01'])
+        self.assert_(merge_event_ids([1, '6e01'], 3, entries) is None)
+
+
+class MemberDirectoryTests(unittest.TestCase):
+
+    def setUp(self):
+        import typepad
+        from typepadapp.tests.stubapi import StubTypePadAPI
+        self.api = StubTypePadAPI()
+        self.api.start()
+        self.endpoint = typepad.client.endpoint
+        typepad.client.endpoint = self.api.url
+        settings.MEMBER_DIRECTORY = True
+
+    def tearDown(self):
+        import typepad
+        from typepadapp.models.db import GroupMember
+        settings.MEMBER_DIRECTORY = False
+        GroupMember.objects.all().delete()
+        typepad.client.endpoint = self.endpoint
+        self.api.stop()
+
+    def group(self):
+        from typepadapp.models import Group
+        group = Group.get('%sgroups/6p01.json' % self.api.url)
+        group.__dict__['url_id'] = '6p01'
+        return group
+
+    def test_refresh(self):
+        from typepadapp.models import User, members
+        self.api.add_member('6p02', 'Admin', admin=True)
+        self.api.add_member('6p03', 'Member')
+        group = self.group()
+
+        self.assertEquals(members.refresh_members(group, page_size=1),
+            {'added': 2, 'updated': 0, 'removed': 0})
+        self.assertEquals(group.member_count(), 2)
+        self.assertEquals(members.admin_ids(group), [u'6p02'])
+        member = group.local_members().get(user_id='6p03')
+        self.assertEquals(member.display_name, 'Member')
+        self.assertEquals(member.location, 'Here')
+
+        # only the newest page is needed when nothing else changed
+        self.api.add_member('6p04', 'Newcomer')
+        del self.api.requests[:]
+        self.assertEquals(members.refresh_members(group, page_size=1)['added'], 1)
+        self.assertEquals([path.split('?')[0] for path in self.api.requests].count(
+            '/groups/6p01/memberships/@member.json'), 2)
+
+        self.api.memberships.pop(0)
+        self.assertEquals(members.refresh_members(group, full=True)['removed'], 1)
+        self.assertEquals(group.member_count(), 2)
+        self.failIf(group.local_members().filter(synced=None).count())
+
+    def test_unfilled(self):
+        self.api.add_member('6p02', 'Admin', admin=True)
+        self.api.add_member('6p03', 'Member')
+        group = self.group()
+        # until the directory is filled, TypePad is asked instead
+        self.assert_(group.local_members() is None)
+        self.assertEquals(group.member_count(), 2)
+
+    def test_admin_ids(self):
+        from typepadapp.models import members
+        self.api.add_member('6p02', 'Admin', admin=True)
+        group = self.group()
+        members.refresh_members(group)
+        self.assertEquals(members.admin_ids(group), [u'6p02'])
+
+        # the admins are held until they change
+        group.local_members().update(is_admin=False)
+        self.assertEquals(members.admin_ids(group), [u'6p02'])
+        members.admins_changed()
+        self.assert_(members.admin_ids(group) is None)
+
+    def test_signals(self):
+        from typepadapp import signals
+        from typepadapp.models import User
+        group = self.group()
+        user = User(url_id='6p05', display_name='Joiner')
+
+        signals.member_joined.send(sender=None, instance=user, group=group)
+        self.assertEquals([m.display_name for m in group.local_members()], ['Joiner'])
+        signals.member_banned.send(sender=None, instance=user, group=group)
+        self.assertEquals(group.member_count(), 0)
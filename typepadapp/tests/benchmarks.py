@@ -0,0 +1,344 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Micro-benchmarks for typepadapp's hot paths.
+
+These are not run as part of the test suite. Run them directly with a
+settings module, naming the benchmarks to run (or none to run them all)::
+
+    DJANGO_SETTINGS_MODULE=test_settings python -m typepadapp.tests.benchmarks [name ...]
+
+Each benchmark reports the average time per call of one or more variants
+of the code it measures, and any other measurements (such as sizes) it
+makes.
+
+"""
+
+import sys
+import time
+
+from django.conf import settings
+
+
+BENCHMARKS = []
+
+
+def benchmark(fn):
+    """Registers the decorated function as a benchmark."""
+    BENCHMARKS.append(fn)
+    return fn
+
+
+def measure(fn, number=1000):
+    """Returns the average number of seconds a call to `fn` takes."""
+    start = time.time()
+    for i in xrange(number):
+        fn()
+    return (time.time() - start) / number
+
+
+def use_context_processors(*processors):
+    settings.TEMPLATE_CONTEXT_PROCESSORS = processors
+    import django.template.context
+    django.template.context._standard_context_processors = None
+
+
+@benchmark
+def not_modified():
+    """A conditional ``GET`` of a `GenericView` answered with a ``304``."""
+    from django.http import HttpRequest
+    from django.template import RequestContext
+    from typepadapp.views.base import GenericView
+
+    use_context_processors('typepadapp.context_processors.settings',
+        'typepadapp.context_processors.mobile')
+
+    class View(GenericView):
+        def etag(self, request, *args, **kwargs):
+            return 'abc'
+
+    class EagerView(View):
+        context_class = RequestContext
+
+    request = HttpRequest()
+    request.method = 'GET'
+    request.META = {
+        'HTTP_IF_NONE_MATCH': '"abc"',
+        'HTTP_USER_AGENT': 'Mozilla/5.0 (iPhone; U; CPU iPhone OS 3_0 like Mac OS X) AppleWebKit/528.18 Mobile/7A341',
+    }
+    assert View(request).status_code == 304
+
+    return [
+        ('eager context', measure(lambda: EagerView(request))),
+        ('lazy context', measure(lambda: View(request))),
+    ]
+
+
+@benchmark
+def streaming():
+    """Time to first byte and largest buffer of a 200-comment page, rendered
+    whole and streamed (with `typepadapp.cached_templates`)."""
+    from django.template import Template, Context
+    from typepadapp import cached_templates
+    from typepadapp.utils.streaming import iter_render
+
+    cached_templates.setup()
+    base = Template('<html><head>{% block head %}<title>Asset</title>{% endblock %}</head>'
+        '<body>{% block body %}{% endblock %}</body></html>')
+    page = Template('{% extends base %}{% block body %}<h1>{{ title }}</h1>'
+        '{% for comment in comments %}<div class="comment"><p>{{ comment.body|linebreaks }}</p>'
+        '<span>{{ comment.author }}</span></div>{% endfor %}{% endblock %}')
+    comments = [{'body': 'Comment text. ' * 60, 'author': 'Commenter %d' % i}
+        for i in range(200)]
+    context = {'base': base, 'title': 'An asset', 'comments': comments}
+
+    def whole():
+        return [page.render(Context(context))]
+
+    def streamed():
+        return iter_render(page, Context(context))
+
+    results = []
+    for label, render in (('whole', whole), ('streamed', streamed)):
+        first_byte = measure(lambda: iter(render()).next(), number=50)
+        total = measure(lambda: list(render()), number=50)
+        largest = max([len(chunk) for chunk in render()])
+        results.append(('%s: first byte' % label, first_byte))
+        results.append(('%s: whole page' % label, total))
+        results.append(('%s: largest buffer' % label, largest, 'chars'))
+    return results
+
+
+@benchmark
+def deep_extends():
+    """Rendering a template at the end of a ten-deep ``extends`` chain with
+    `typepadapp.cached_templates`, with the list-based stacks and per-render
+    block maps it used before and with the current ones."""
+    from django.template import Template, Context, loader, loader_tags
+    from typepadapp import cached_templates
+
+    class ListParserContext(cached_templates.ParserContext):
+        def __iter__(self):
+            return iter(self.dicts)
+        def push(self):
+            d = {}
+            self.dicts = [d] + self.dicts
+            return d
+        def pop(self):
+            return self.dicts.pop(0)
+        def __getitem__(self, key):
+            return self.dicts[0][key]
+        def __setitem__(self, key, value):
+            self.dicts[0][key] = value
+        def has_key(self, key):
+            return key in self.dicts[0]
+
+    class ListBlockContext(cached_templates.BlockContext):
+        def add_blocks(self, blocks):
+            for name, block in blocks.iteritems():
+                if name in self.blocks:
+                    self.blocks[name].insert(0, block)
+                else:
+                    self.blocks[name] = [block]
+
+    def uncached_root_blocks(nodelist):
+        for node in nodelist:
+            if not isinstance(node, loader_tags.TextNode):
+                if not isinstance(node, loader_tags.ExtendsNode):
+                    return dict([(n.name, n) for n in
+                        nodelist.get_nodes_by_type(loader_tags.BlockNode)])
+                return None
+
+    cached_templates.setup()
+    blocks = ''.join(['{%% block b%d %%}{{ block.super }}%d{%% endblock %%}' % (i, i)
+        for i in range(20)])
+    chain = [Template('<html>%s</html>' % blocks.replace('{{ block.super }}', ''))]
+    for i in range(10):
+        chain.append(Template('{%% extends parent%d %%}%s' % (i, blocks)))
+    context = dict([('parent%d' % i, t) for i, t in enumerate(chain)])
+
+    def render():
+        return chain[-1].render(Context(context))
+
+    current = (cached_templates.ParserContext, cached_templates.BlockContext,
+        cached_templates.root_blocks)
+    cached_templates.ParserContext = ListParserContext
+    cached_templates.BlockContext = ListBlockContext
+    cached_templates.root_blocks = uncached_root_blocks
+    try:
+        before = measure(render, number=200)
+    finally:
+        (cached_templates.ParserContext, cached_templates.BlockContext,
+            cached_templates.root_blocks) = current
+    after = measure(render, number=200)
+    return [
+        ('list stacks', before),
+        ('O(1) stacks', after),
+    ]
+
+
+@benchmark
+def compiled_templates():
+    """Rendering a 50-event list, interpreted and compiled to Python with
+    `typepadapp.utils.compiler`."""
+    from django.template import Template, Context
+    from typepadapp.utils.compiler import compile_template
+
+    source = ('<ul>{% for event in events %}<li class="{% if forloop.first %}first{% endif %}">'
+        '<a href="{{ event.actor.url }}">{{ event.actor.display_name|escape }}</a> '
+        '{% if event.object.title %}posted <a href="{{ event.object.url }}">'
+        '{{ event.object.title|truncatewords:10 }}</a>{% else %}commented{% endif %} '
+        '<span>{{ event.published }}</span></li>{% endfor %}</ul>')
+    class Actor(object):
+        display_name = 'Someone <3'
+        url = '/members/someone'
+    events = [{'actor': Actor(), 'object': {'title': 'A post %d' % i, 'url': '/posts/%d' % i},
+        'published': 'Jan %d' % i} for i in range(50)]
+
+    interpreted = Template(source)
+    compiled = compile_template(Template(source))
+    assert compiled.render(Context({'events': events})) == interpreted.render(Context({'events': events}))
+
+    return [
+        ('interpreted', measure(lambda: interpreted.render(Context({'events': events})), number=200)),
+        ('compiled', measure(lambda: compiled.render(Context({'events': events})), number=200)),
+    ]
+
+
+@benchmark
+def sanitizetags():
+    """Sanitizing a 40-paragraph post with the ``sanitizetags`` filter, with
+    feedparser's parser, the single-pass parser and memoized."""
+    from typepadapp.templatetags import generic_filters
+
+    html = ('<p class="intro">Some <b>bold</b> and <i>italic</i> text with a '
+        '<a href="http://example.com/?a=1&amp;b=2" onclick="evil()">link</a>, '
+        'an <img src="/x.jpg" alt="x" style="width: 10px"> image &amp; an '
+        'entity &#8212; and <script>alert(1)</script> a script.</p>\n') * 40
+
+    def reference():
+        s = generic_filters.Sanitizer('utf-8')
+        s.feed(html)
+        return s.output()
+
+    assert generic_filters.sanitize_single_pass(html) == reference()
+    generic_filters.sanitizetags(html)
+
+    return [
+        ('feedparser', measure(reference, number=100)),
+        ('single pass', measure(lambda: generic_filters.sanitize_single_pass(html), number=100)),
+        ('memoized', measure(lambda: generic_filters.sanitizetags(html), number=100)),
+    ]
+
+
+@benchmark
+def template_filters():
+    """The filters in the ``date_filters``, ``typepad_filters`` and
+    ``generic_filters`` libraries, called as a 50-event list would call them.
+    Date filters are timed outside a request (reading the clock every call)
+    and inside one."""
+    import datetime
+    from typepadapp.models import Post
+    from typepadapp.templatetags import date_filters, generic_filters, typepad_filters
+
+    now = datetime.datetime.now()
+    dates = [now - datetime.timedelta(hours=i * 7) for i in range(50)]
+    post = Post(content='<p>%s</p>' % ('Some words. ' * 100), permalink_url='/posts/1')
+    text = 'A title of some length, long enough to be truncated'
+
+    def pithy():
+        for d in dates:
+            date_filters.pithy_timesince(d, 'on')
+            date_filters.is_relative(d)
+
+    def in_request():
+        date_filters.clock.start()
+        try:
+            pithy()
+        finally:
+            date_filters.clock.stop()
+
+    return [
+        ('date: per call clock', measure(pithy, number=100)),
+        ('date: request clock', measure(in_request, number=100)),
+        ('date_microformat', measure(lambda: date_filters.date_microformat(now))),
+        ('morelink', measure(lambda: typepad_filters.morelink(post, 50))),
+        ('truncatechars', measure(lambda: generic_filters.truncatechars(text, 20))),
+        ('regex_search', measure(lambda: generic_filters.regex_search(text, 'of some'))),
+        ('split', measure(lambda: generic_filters.split(text, ' '))),
+        ('sanitizetags', measure(lambda: generic_filters.sanitizetags(post.content))),
+    ]
+
+
+@benchmark
+def reverse_urls():
+    """Building asset, member and feed URLs with Django's `reverse()` and
+    with `typepadapp.utils.urls.reverse()`."""
+    from django.conf.urls.defaults import patterns, url
+    from django.core.urlresolvers import reverse as django_reverse
+    from typepadapp.utils.urls import reverse
+
+    class urlconf(object):
+        urlpatterns = patterns('django.views.generic.simple',
+            url(r'^$', 'direct_to_template', name='home'),
+            url(r'^entry/(\w+)/?$', 'direct_to_template', name='asset'),
+            url(r'^members/(?P<userid>\w+)/?$', 'direct_to_template', name='member'),
+            url(r'^feeds/(?P<url>.*)$', 'direct_to_template', name='feeds'),
+        ) + patterns('', *[url(r'^page%d/(\d+)/?$' % i, 'direct_to_template',
+            name='page%d' % i) for i in range(50)])
+
+    def build(reverse):
+        def urls():
+            reverse('asset', urlconf, ['6a00d83451ce5a69e2012875bbd0f6970c'])
+            reverse('member', urlconf, kwargs={'userid': '6p00d83451ce5a69e2'})
+            reverse('feeds', urlconf, kwargs={'url': 'members/6p00d83451ce5a69e2'})
+        return urls
+
+    return [
+        ('django reverse', measure(build(django_reverse))),
+        ('cached builders', measure(build(reverse))),
+    ]
+
+
+def run(names=None):
+    for fn in BENCHMARKS:
+        if names and fn.__name__ not in names:
+            continue
+        print '%s: %s' % (fn.__name__, fn.__doc__)
+        for result in fn():
+            if len(result) == 2:
+                label, seconds = result
+                print '    %-30s %10.1f usec/call' % (label, seconds * 1000000)
+            else:
+                print '    %-30s %10d %s' % result
+
+
+if __name__ == '__main__':
+    run(sys.argv[1:])
@@ -0,0 +1,165 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+A stand-in for the TypePad API's group event and membership lists, for
+testing.
+
+`StubTypePadAPI` runs a tiny HTTP server on a local port in a background
+thread, serving the events in its `events` list (newest first) as the event
+list of any group, the memberships in its `memberships` list (most recently
+joined first) as the member and admin lists of any group, and a profile for
+each member, and records the paths requested::
+
+    api = StubTypePadAPI()
+    api.start()
+    try:
+        api.add_event('6e01', '6a01')
+        typepad.client.endpoint = api.url
+        ...
+    finally:
+        api.stop()
+
+"""
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+import cgi
+import re
+import threading
+from urlparse import urlparse
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+
+class StubTypePadAPIHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        api = self.server.api
+        api.requests.append(self.path)
+        url = urlparse(self.path)
+
+        if re.match(r'^/groups/[^/]+/events\.json$', url.path):
+            body = self.page(url, api.events)
+        elif re.match(r'^/groups/[^/]+/memberships/@member\.json$', url.path):
+            body = self.page(url, api.memberships)
+        elif re.match(r'^/groups/[^/]+/memberships/@admin\.json$', url.path):
+            body = self.page(url, [m for m in api.memberships
+                if 'tag:api.typepad.com,2009:Admin' in m['created']])
+        else:
+            match = re.match(r'^/users/([^/]+)/profile\.json$', url.path)
+            if match is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = json.dumps({'objectType': 'UserProfile',
+                'urlId': match.group(1), 'location': 'Here',
+                'interests': ['testing']})
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def page(self, url, entries):
+        params = cgi.parse_qs(url.query)
+        start = int(params.get('start-index', ['1'])[0])
+        count = int(params.get('max-results', ['50'])[0])
+        return json.dumps({
+            'totalResults': len(entries),
+            'entries': entries[start - 1:start - 1 + count],
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubTypePadAPI(object):
+
+    def __init__(self):
+        self.events = []
+        self.memberships = []
+        self.requests = []
+        self.server = HTTPServer(('127.0.0.1', 0), StubTypePadAPIHandler)
+        self.server.api = self
+        self.url = 'http://127.0.0.1:%d/' % self.server.server_port
+        self.thread = None
+
+    def add_event(self, event_id, asset_id):
+        """Adds a ``NewAsset`` event for a new post to the front of the
+        event list."""
+        self.events.insert(0, {
+            'objectType': 'Event',
+            'id': 'tag:api.typepad.com,2009:%s' % event_id,
+            'urlId': event_id,
+            'verb': 'NewAsset',
+            'published': '2010-08-01T00:00:00Z',
+            'actor': {'objectType': 'User', 'urlId': '6p01'},
+            'object': {
+                'objectType': 'Post',
+                'id': 'tag:api.typepad.com,2009:%s' % asset_id,
+                'urlId': asset_id,
+                'title': 'Post %s' % asset_id,
+                'author': {'objectType': 'User', 'urlId': '6p01'},
+                'published': '2010-08-01T00:00:00Z',
+            },
+        })
+
+    def add_member(self, user_id, display_name, admin=False):
+        """Adds a membership for a new member to the front of the membership
+        list."""
+        created = {'tag:api.typepad.com,2009:Member': '2010-08-01T00:00:00Z'}
+        if admin:
+            created['tag:api.typepad.com,2009:Admin'] = '2010-08-01T00:00:00Z'
+        self.memberships.insert(0, {
+            'objectType': 'Relationship',
+            'urlId': 'r%s' % user_id,
+            'created': created,
+            'target': {
+                'objectType': 'User',
+                'urlId': user_id,
+                'id': 'tag:api.typepad.com,2009:%s' % user_id,
+                'displayName': display_name,
+            },
+        })
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
@@ -0,0 +1,94 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+A stand-in PubSubHubbub hub for testing hub publishing.
+
+`StubHub` runs a tiny HTTP server on a local port in a background thread,
+recording the ``publish`` requests it receives::
+
+    hub = StubHub()
+    hub.start()
+    try:
+        publisher.send(hub.url, ['http://example.com/feed'])
+        assert hub.published == [['http://example.com/feed']]
+    finally:
+        hub.stop()
+
+Set `failures` to have the hub reject that many requests before accepting
+any.
+
+"""
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+import cgi
+import threading
+
+
+class StubHubHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        hub = self.server.hub
+        length = int(self.headers.get('Content-Length', 0))
+        params = cgi.parse_qs(self.rfile.read(length))
+
+        if hub.failures > 0:
+            hub.failures -= 1
+            self.send_response(503)
+        elif params.get('hub.mode') != ['publish'] or not params.get('hub.url'):
+            self.send_response(400)
+        else:
+            hub.published.append(params['hub.url'])
+            self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHub(object):
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.published = []
+        self.server = HTTPServer(('127.0.0.1', 0), StubHubHandler)
+        self.server.hub = self
+        self.url = 'http://127.0.0.1:%d/' % self.server.server_port
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
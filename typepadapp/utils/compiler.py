@@ -0,0 +1,369 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Compiles parsed Django templates to Python functions.
+
+`compile_template()` turns each nodelist of a parsed `Template` into a Python
+function that renders it directly: text is appended as is, and variables,
+filters, and ``for``, ``if`` and ``with`` tags become plain Python code that
+looks up values without walking the node tree. Any other tag (including
+``extends`` and ``block``, with or without `typepadapp.cached_templates`) is
+rendered by its node as usual, though the nodelists inside it are compiled
+too. The output is the same as the interpreted template's.
+
+Compile templates as they're loaded with
+``typepadapp.cached_templates.setup(compile=True)``, or compile a `Template`
+yourself with `compile_template()`. Templates parsed with ``TEMPLATE_DEBUG``
+on are not compiled, so template errors are still reported in detail.
+
+"""
+
+from django.conf import settings
+from django.template import (Node, NodeList, TextNode, Variable,
+    VariableDoesNotExist, VariableNode, _render_value_in_context)
+from django.template import defaulttags
+from django.utils.encoding import force_unicode
+from django.utils.safestring import SafeData, EscapeData, mark_safe, mark_for_escaping
+
+
+def _silent_failure(exc):
+    # as in Variable._resolve_lookup; call only from an except clause
+    if getattr(exc, 'silent_variable_failure', False):
+        return settings.TEMPLATE_STRING_IF_INVALID
+    raise
+
+
+def _lookup_attribute(current, bit):
+    """Looks up `bit` on `current` as `Variable._resolve_lookup` does after a
+    dictionary lookup fails."""
+    try: # attribute lookup
+        current = getattr(current, bit)
+        if callable(current):
+            if getattr(current, 'alters_data', False):
+                current = settings.TEMPLATE_STRING_IF_INVALID
+            else:
+                try: # method call (assuming no args required)
+                    current = current()
+                except TypeError: # arguments *were* required
+                    current = settings.TEMPLATE_STRING_IF_INVALID
+                except Exception, e:
+                    current = _silent_failure(e)
+    except (TypeError, AttributeError):
+        try: # list-index lookup
+            current = current[int(bit)]
+        except (IndexError, ValueError, KeyError, TypeError):
+            raise VariableDoesNotExist("Failed lookup for key [%s] in %r", (bit, current))
+    except Exception, e:
+        current = _silent_failure(e)
+    return current
+
+
+def _apply_filters(filters, obj, context):
+    # as in FilterExpression.resolve
+    for func, args in filters:
+        arg_vals = []
+        for lookup, arg in args:
+            if not lookup:
+                arg_vals.append(mark_safe(arg))
+            else:
+                arg_vals.append(arg.resolve(context))
+        if getattr(func, 'needs_autoescape', False):
+            new_obj = func(obj, autoescape=context.autoescape, *arg_vals)
+        else:
+            new_obj = func(obj, *arg_vals)
+        if getattr(func, 'is_safe', False) and isinstance(obj, SafeData):
+            obj = mark_safe(new_obj)
+        elif isinstance(obj, EscapeData):
+            obj = mark_for_escaping(new_obj)
+        else:
+            obj = new_obj
+    return obj
+
+
+class CompiledNodeList(NodeList):
+
+    """A nodelist that renders with its compiled function.
+
+    The nodes are still available, for code that inspects or streams them.
+
+    """
+
+    def __init__(self, nodelist, function):
+        super(CompiledNodeList, self).__init__(nodelist)
+        self.contains_nontext = nodelist.contains_nontext
+        self.function = function
+
+    def render(self, context):
+        return self.function(context)
+
+
+class _Writer(object):
+
+    def __init__(self):
+        self.lines = []
+        self.depth = 1
+        self.namespace = {
+            'settings': settings,
+            'force_unicode': force_unicode,
+            'mark_safe': mark_safe,
+            'VariableDoesNotExist': VariableDoesNotExist,
+            '_render_value_in_context': _render_value_in_context,
+            '_lookup_attribute': _lookup_attribute,
+            '_silent_failure': _silent_failure,
+            '_apply_filters': _apply_filters,
+        }
+        self.count = 0
+
+    def line(self, code):
+        self.lines.append('    ' * self.depth + code)
+
+    def indent(self):
+        self.depth += 1
+
+    def dedent(self):
+        self.depth -= 1
+
+    def name(self, prefix):
+        self.count += 1
+        return '%s%d' % (prefix, self.count)
+
+    def constant(self, value):
+        name = self.name('c')
+        self.namespace[name] = value
+        return name
+
+    def function(self):
+        source = '\n'.join(['def render(context):',
+            '    result = []',
+            '    append = result.append'] + self.lines
+            + ["    return mark_safe(u''.join(result))"])
+        code = compile(source, '<compiled template>', 'exec')
+        exec code in self.namespace
+        return self.namespace['render']
+
+
+def _write_resolve(w, expr, target, ignore_failures=False):
+    """Writes code resolving the given `FilterExpression` into the local
+    variable `target`."""
+    var = expr.var
+    if isinstance(var, Variable):
+        if var.translate:
+            w.line('%s = %s.resolve(context, %r)' % (target, w.constant(expr), ignore_failures))
+            return
+        if var.lookups is None:
+            w.line('%s = %s' % (target, w.constant(var.literal)))
+        else:
+            w.line('try:')
+            w.indent()
+            w.line('%s = context' % target)
+            for bit in var.lookups:
+                w.line('try:')
+                w.line('    %s = %s[%r]' % (target, target, bit))
+                w.line('except (TypeError, AttributeError, KeyError):')
+                w.line('    %s = _lookup_attribute(%s, %r)' % (target, target, bit))
+                w.line('except Exception, e:')
+                w.line('    %s = _silent_failure(e)' % target)
+            w.dedent()
+            w.line('except VariableDoesNotExist:')
+            # let the expression handle the missing variable as it would
+            w.line('    %s = %s.resolve(context, %r)' % (target, w.constant(expr), ignore_failures))
+            if not expr.filters:
+                return
+            w.line('else:')
+            w.indent()
+            w.line('%s = _apply_filters(%s, %s, context)'
+                % (target, w.constant(expr.filters), target))
+            w.dedent()
+            return
+    else:
+        w.line('%s = %s' % (target, w.constant(var)))
+
+    if expr.filters:
+        w.line('%s = _apply_filters(%s, %s, context)'
+            % (target, w.constant(expr.filters), target))
+
+
+def _write_variable(w, node):
+    value = w.name('v')
+    w.line('try:')
+    w.indent()
+    _write_resolve(w, node.filter_expression, value)
+    w.dedent()
+    w.line('except UnicodeDecodeError:')
+    w.line('    pass')
+    w.line('else:')
+    w.line('    append(_render_value_in_context(%s, context))' % value)
+
+
+def _write_if(w, node):
+    cond = w.name('cond')
+    any_ = node.link_type == defaulttags.IfNode.LinkTypes.or_
+    # evaluate the expressions in order, stopping once the result is known
+    w.line('%s = %r' % (cond, not any_))
+    depth = w.depth
+    for i, (ifnot, bool_expr) in enumerate(node.bool_exprs):
+        value = w.name('v')
+        w.line('try:')
+        w.indent()
+        _write_resolve(w, bool_expr, value, ignore_failures=True)
+        w.dedent()
+        w.line('except VariableDoesNotExist:')
+        w.line('    %s = None' % value)
+        test = ifnot and 'not %s' % value or value
+        if any_:
+            w.line('if %s:' % test)
+            w.line('    %s = True' % cond)
+        else:
+            w.line('if not (%s):' % test)
+            w.line('    %s = False' % cond)
+        if i < len(node.bool_exprs) - 1:
+            w.line('else:')
+            w.indent()
+    w.depth = depth
+
+    w.line('if %s:' % cond)
+    w.indent()
+    _write_nodelist(w, node.nodelist_true)
+    w.dedent()
+    w.line('else:')
+    w.indent()
+    _write_nodelist(w, node.nodelist_false)
+    w.dedent()
+
+
+def _write_with(w, node):
+    value = w.name('v')
+    _write_resolve(w, node.var, value)
+    w.line('context.push()')
+    w.line('context[%r] = %s' % (node.name, value))
+    _write_nodelist(w, node.nodelist)
+    w.line('context.pop()')
+
+
+def _write_for(w, node):
+    parentloop, values, length = w.name('parentloop'), w.name('values'), w.name('length')
+    loop, i, item = w.name('loop'), w.name('i'), w.name('item')
+
+    # as in ForNode.render
+    w.line("if 'forloop' in context:")
+    w.line("    %s = context['forloop']" % parentloop)
+    w.line('else:')
+    w.line('    %s = {}' % parentloop)
+    w.line('context.push()')
+    w.line('try:')
+    w.indent()
+    _write_resolve(w, node.sequence, values, ignore_failures=True)
+    w.dedent()
+    w.line('except VariableDoesNotExist:')
+    w.line('    %s = []' % values)
+    w.line('if %s is None:' % values)
+    w.line('    %s = []' % values)
+    w.line("if not hasattr(%s, '__len__'):" % values)
+    w.line('    %s = list(%s)' % (values, values))
+    w.line('%s = len(%s)' % (length, values))
+    w.line('if %s < 1:' % length)
+    w.indent()
+    w.line('context.pop()')
+    _write_nodelist(w, node.nodelist_empty)
+    w.dedent()
+    w.line('else:')
+    w.indent()
+    if node.is_reversed:
+        w.line('%s = reversed(%s)' % (values, values))
+    unpack = len(node.loopvars) > 1
+    w.line("%s = context['forloop'] = {'parentloop': %s}" % (loop, parentloop))
+    w.line('for %s, %s in enumerate(%s):' % (i, item, values))
+    w.indent()
+    w.line("%s['counter0'] = %s" % (loop, i))
+    w.line("%s['counter'] = %s + 1" % (loop, i))
+    w.line("%s['revcounter'] = %s - %s" % (loop, length, i))
+    w.line("%s['revcounter0'] = %s - %s - 1" % (loop, length, i))
+    w.line("%s['first'] = (%s == 0)" % (loop, i))
+    w.line("%s['last'] = (%s == %s - 1)" % (loop, i, length))
+    if unpack:
+        w.line('context.update(dict(zip(%r, %s)))' % (tuple(node.loopvars), item))
+    else:
+        w.line('context[%r] = %s' % (node.loopvars[0], item))
+    _write_nodelist(w, node.nodelist_loop)
+    if unpack:
+        w.line('context.pop()')
+    w.dedent()
+    w.line('context.pop()')
+    w.dedent()
+
+
+_writers = {
+    VariableNode: _write_variable,
+    defaulttags.IfNode: _write_if,
+    defaulttags.WithNode: _write_with,
+    defaulttags.ForNode: _write_for,
+}
+
+
+def _write_nodelist(w, nodelist):
+    w.line('pass')
+    for node in nodelist:
+        if not isinstance(node, Node):
+            w.line('append(%s)' % w.constant(force_unicode(node)))
+        elif type(node) is TextNode:
+            w.line('append(%s)' % w.constant(force_unicode(node.s)))
+        elif type(node) in _writers:
+            _writers[type(node)](w, node)
+        else:
+            # let the node render itself
+            w.line('append(force_unicode(%s.render(context)))' % w.constant(node))
+
+
+def compile_nodelist(nodelist):
+    """Returns a `CompiledNodeList` of the given nodelist, compiling the
+    nodelists inside its nodes too.
+
+    Nodelists that are already compiled, and those of templates parsed in
+    debug mode, are returned as they are.
+
+    """
+    if isinstance(nodelist, CompiledNodeList) or type(nodelist) is not NodeList:
+        return nodelist
+
+    for node in nodelist:
+        for attr in getattr(node, 'child_nodelists', ()):
+            child = getattr(node, attr, None)
+            if isinstance(child, NodeList):
+                setattr(node, attr, compile_nodelist(child))
+
+    w = _Writer()
+    _write_nodelist(w, nodelist)
+    return CompiledNodeList(nodelist, w.function())
+
+
+def compile_template(template):
+    """Compiles the given `Template` in place, returning it."""
+    template.nodelist = compile_nodelist(template.nodelist)
+    return template
@@ -0,0 +1,220 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Keeps the cached event list of a TypePad group in step with TypePad.
+
+For a busy group, fetching the pages of `Group.events` again every time the
+cached list is discarded is the most expensive thing a typepadapp site asks
+TypePad to do. An `EventSyncer` instead polls only the group's newest events
+(``EVENT_SYNC_WINDOW`` of them, every ``EVENT_SYNC_INTERVAL`` seconds) and
+merges any new ones into the front of the group's cached event list, the
+same ``listcache:`` entry `Group.events` is served from, so visitors keep
+reading the cached list as the group changes.
+
+When the newest events don't overlap the cached ones (more events arrived
+between polls than fit in the window), or the totals don't add up (such as
+when events were deleted), the cached list is discarded and started again
+from the newest events, so later pages are fetched from TypePad anew as
+they're requested.
+
+Run a syncer with the ``tpsyncevents`` management command, or `start()` one
+in a background thread of your own process.
+
+"""
+
+import logging
+import threading
+from urlparse import urljoin
+
+from django.conf import settings
+from django.core.cache import cache
+import typepad
+
+from typepadapp.caching import cache_list_entry, cache_stats, invalidate_key
+from typepadapp.caching import lock_list, unlock_list, save_list_ids
+from typepadapp.models.assets import Event
+
+
+log = logging.getLogger(__name__)
+
+
+def _matches(cached_id, entry):
+    """Returns whether the given identifier in the cached list stands for
+    the given event, either as its own identifier or as the stand-in made
+    by `Event.for_new_asset()` for its asset."""
+    if cached_id == entry.xid:
+        return True
+    obj = getattr(entry, 'object', None)
+    return obj is not None and cached_id == Event.new_asset_url_id % obj.xid
+
+
+def merge_event_ids(ids, total, entries):
+    """Merges a group's newest events into the cached identifiers of its
+    event list.
+
+    Parameter `ids` is the cached list (its total, then the identifiers of
+    its events, newest first), and `total` and `entries` are the total and
+    events of the newest page of the list. Returns the merged list, or
+    ``None`` if the two don't fit together.
+
+    """
+    if not ids or not ids[0] or len(ids) < 2 or ids[1] is None:
+        return None
+
+    head = ids[1]
+    for new, entry in enumerate(entries):
+        if _matches(head, entry):
+            break
+    else:
+        # everything in the window is new, so there may be more we missed
+        return None
+
+    if total != ids[0] + new:
+        return None
+    overlap = entries[new:]
+    for cached_id, entry in zip(ids[1:], overlap):
+        if cached_id is not None and not _matches(cached_id, entry):
+            return None
+
+    merged = [total] + [entry.xid for entry in entries]
+    merged.extend(ids[1 + len(overlap):])
+    return merged
+
+
+class EventSyncer(object):
+
+    """Merges a TypePad group's newest events into its cached event list.
+
+    Each `sync()` fetches the newest `window` events of the group; `start()`
+    syncs every `interval` seconds in a background thread until `stop()` is
+    called. The cached list keeps at most `depth` event identifiers.
+
+    """
+
+    depth = 1000
+
+    def __init__(self, group_id, window=None, interval=None):
+        if window is None:
+            window = getattr(settings, 'EVENT_SYNC_WINDOW', 20)
+        if interval is None:
+            interval = getattr(settings, 'EVENT_SYNC_INTERVAL', 30)
+        self.window = window
+        self.interval = interval
+        self.url = urljoin(typepad.client.endpoint, '/groups/%s/events.json' % group_id)
+        self.list_key = 'listcache:%s' % self.url
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def fetch(self):
+        """Requests the group's newest events from TypePad."""
+        events = typepad.ListOf('Event').get(self.url)
+        events = events.filter(start_index=1, max_results=self.window)
+        events.deliver()
+        return events
+
+    def sync(self):
+        """Merges the group's newest events into its cached event list.
+
+        Returns ``'unchanged'`` if there were no new events, ``'merged'`` if
+        new events were added to the cached list, ``'seeded'`` if there was
+        no cached list to add them to, ``'refetched'`` if the cached list
+        didn't fit with the new events and was started again, or
+        ``'contended'`` if another process was changing the cached list, in
+        which case it's invalidated.
+
+        """
+        events = self.fetch()
+        entries = list(events.entries)
+        total = events.total_results
+        if total is None:
+            total = len(entries)
+
+        if not lock_list(self.list_key):
+            invalidate_key(self.list_key)
+            cache_stats.record('eventsync', False)
+            log.debug("syncing events of %s: contended", self.url)
+            return 'contended'
+        try:
+            return self._merge(entries, total)
+        finally:
+            unlock_list(self.list_key)
+
+    def _merge(self, entries, total):
+        ids = cache.get(self.list_key)
+        merged = None
+        if ids is not None:
+            merged = merge_event_ids(ids, total, entries)
+        if merged is None:
+            if ids is None:
+                result = 'seeded'
+            else:
+                result = 'refetched'
+                invalidate_key(self.list_key)
+            merged = [total] + [entry.xid for entry in entries]
+            new = entries
+        elif merged == ids:
+            result = 'unchanged'
+            new = ()
+        else:
+            result = 'merged'
+            new = [entry for entry in entries if entry.xid not in ids]
+
+        cache_stats.record('eventsync', result in ('unchanged', 'merged'))
+        log.debug("syncing events of %s: %s %d events", self.url, result, len(new))
+        if result == 'unchanged':
+            return result
+
+        for entry in new:
+            cache_list_entry(entry)
+        save_list_ids(self.list_key, merged[:self.depth + 1])
+        return result
+
+    def run(self):
+        while not self.stopping.isSet():
+            try:
+                self.sync()
+            except Exception, exc:
+                log.error("Could not sync events of %s: %s", self.url, exc)
+            self.stopping.wait(self.interval)
+
+    def start(self):
+        """Syncs every `interval` seconds in a background thread."""
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops syncing in the background."""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
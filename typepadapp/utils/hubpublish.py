@@ -0,0 +1,197 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Announces changed feeds to their PubSubHubbub hubs.
+
+A `HubPublisher` collects the URLs of feeds that have changed and, after a
+short delay, notifies each hub of all its changed feeds with one ``publish``
+request, from a background thread. That way, publishing adds no latency to
+the request that changed the content, and a burst of changes (such as a
+post and its first few comments) costs one ping per hub. Pings that fail are
+retried, waiting twice as long before each retry.
+
+Feeds to announce whenever the group's content changes are configured with
+the ``HUB_PUBLISH_FEEDS`` setting::
+
+    HUB_PUBLISH_FEEDS = {
+        'http://pubsubhubbub.appspot.com/': [
+            'http://example.com/feeds/events',
+        ],
+    }
+
+Other changes can be announced with the `publish()` function.
+
+"""
+
+import logging
+import socket
+import threading
+from urllib import urlencode
+
+from django.conf import settings
+import httplib2
+
+from typepadapp import signals
+
+
+log = logging.getLogger(__name__)
+
+
+class HubPublisher(object):
+
+    """Sends batched ``publish`` pings to PubSubHubbub hubs.
+
+    Feed URLs given to `publish()` are sent `delay` seconds later, grouped
+    by hub. The delay is always longer than the ``LOCAL_CACHE_CHECK_INTERVAL``
+    setting, so every process has noticed the change to its cached feeds
+    before subscribers come to fetch them. A hub that can't be reached or
+    that doesn't accept the ping is pinged again after `retry_delay`
+    seconds, doubling the wait for each of up to `retries` attempts.
+
+    """
+
+    def __init__(self, delay=None, retries=None, retry_delay=None, timeout=10):
+        if delay is None:
+            delay = getattr(settings, 'HUB_PUBLISH_DELAY', 11)
+        # cached feeds are versioned with a local cache stamp
+        interval = getattr(settings, 'LOCAL_CACHE_CHECK_INTERVAL', 10)
+        delay = max(delay, interval + 1)
+        if retries is None:
+            retries = getattr(settings, 'HUB_PUBLISH_RETRIES', 3)
+        if retry_delay is None:
+            retry_delay = getattr(settings, 'HUB_PUBLISH_RETRY_DELAY', 30)
+        self.delay = delay
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.timer = None
+
+    def schedule(self, delay, fn, *args):
+        """Calls `fn` with the given arguments `delay` seconds from now, in
+        a background thread."""
+        timer = threading.Timer(delay, fn, args)
+        timer.setDaemon(True)
+        timer.start()
+        return timer
+
+    def publish(self, hub_url, *feed_urls):
+        """Queues a ping to the given hub for the given feed URLs."""
+        if not feed_urls:
+            return
+        self.lock.acquire()
+        try:
+            self.pending.setdefault(hub_url, set()).update(feed_urls)
+            if self.timer is None:
+                self.timer = self.schedule(self.delay, self.flush)
+        finally:
+            self.lock.release()
+
+    def flush(self):
+        """Immediately pings the hubs with all queued feed URLs."""
+        self.lock.acquire()
+        try:
+            pending, self.pending = self.pending, {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        finally:
+            self.lock.release()
+
+        for hub_url, feed_urls in pending.items():
+            self.send(hub_url, sorted(feed_urls))
+
+    def ping(self, hub_url, feed_urls):
+        """Sends one ``publish`` request for the given feed URLs to the
+        given hub, returning whether the hub accepted it."""
+        body = urlencode([('hub.mode', 'publish')]
+            + [('hub.url', feed_url) for feed_url in feed_urls])
+        http = httplib2.Http(timeout=self.timeout)
+        try:
+            response, content = http.request(hub_url, 'POST', body=body,
+                headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        except (socket.error, httplib2.HttpLib2Error), exc:
+            log.warning('Could not ping hub %s: %s', hub_url, exc)
+            return False
+        if response.status // 100 != 2:
+            log.warning('Hub %s rejected ping with status %d: %s', hub_url,
+                response.status, content)
+            return False
+        return True
+
+    def send(self, hub_url, feed_urls, attempt=0):
+        """Pings the given hub for the given feed URLs, scheduling a retry
+        if the ping fails."""
+        if self.ping(hub_url, feed_urls):
+            log.debug('Pinged hub %s for %d feeds', hub_url, len(feed_urls))
+            return True
+
+        if attempt >= self.retries:
+            log.error('Giving up pinging hub %s for feeds %s after %d '
+                'attempts', hub_url, ', '.join(feed_urls), attempt + 1)
+            return False
+        self.schedule(self.retry_delay * 2 ** attempt, self.send, hub_url,
+            feed_urls, attempt + 1)
+        return False
+
+
+publisher = HubPublisher()
+"""The `HubPublisher` that announces feeds configured in the
+``HUB_PUBLISH_FEEDS`` setting and those given to `publish()`."""
+
+
+def publish(hub_url, *feed_urls):
+    """Announces the given changed feeds to the given hub in the
+    background."""
+    publisher.publish(hub_url, *feed_urls)
+
+
+def publish_group_feeds(sender, **kwargs):
+    """Announces the feeds in the ``HUB_PUBLISH_FEEDS`` setting.
+
+    Feed URLs in the setting can also be callables, which are called with
+    the signal's arguments and return a list of feed URLs to announce.
+
+    """
+    hub_feeds = getattr(settings, 'HUB_PUBLISH_FEEDS', {})
+    for hub_url, feeds in hub_feeds.items():
+        feed_urls = []
+        for feed in feeds:
+            if callable(feed):
+                feed_urls.extend(feed(sender=sender, **kwargs))
+            else:
+                feed_urls.append(feed)
+        publisher.publish(hub_url, *feed_urls)
+
+for signal in (signals.asset_created, signals.asset_deleted,
+    signals.favorite_created, signals.favorite_deleted, signals.post_save):
+    signal.connect(publish_group_feeds)
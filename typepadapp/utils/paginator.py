@@ -42,13 +42,19 @@ class FinitePaginator(Paginator):
     item (if there's a next page). You'll also need to supply the offset from
     the full collection in order to get the page start_index.
 
+    If the size of the full collection is known (such as from the
+    ``total_results`` of a TypePad list), give it as ``total``, and the
+    paginator's ``count`` and ``num_pages`` are based on it.
+
     This is a very silly class but useful if you love the Django pagination
     conventions.
     """
 
-    def __init__(self, object_list, per_page, offset=None, allow_empty_first_page=True, link_template='/page/%d/'):
+    def __init__(self, object_list, per_page, offset=None, allow_empty_first_page=True, link_template='/page/%d/', total=None):
         orphans = 0 # no orphans
         super(FinitePaginator, self).__init__(object_list, per_page, orphans, allow_empty_first_page)
+        if total is not None:
+            self._count = total
         # bonus links
         self.offset = offset
         self.link_template = link_template
@@ -69,6 +75,12 @@ class FinitePaginator(Paginator):
         return FinitePage(self.object_list, number, self)
 
 class FinitePage(Page):
+
+    @property
+    def num_pages(self):
+        """The number of pages in the full collection."""
+        return self.paginator.num_pages
+
     def next_link(self):
         """URL for the next page of results (or None)."""
         if self.has_next():
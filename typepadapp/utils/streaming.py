@@ -0,0 +1,247 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Renders Django templates incrementally.
+
+`iter_render()` yields a template's output in pieces as it is rendered, so
+a response can start sending the top of a page while the rest (such as a long
+list of events or comments) is still being rendered. Each iteration of a
+``for`` loop is yielded separately, and ``extends``, ``block``, ``if``,
+``ifequal`` and ``with`` tags are streamed through; any other tag's output is
+yielded whole once it's rendered.
+
+Streaming works with Django's own template inheritance and with
+`typepadapp.cached_templates`. The output is the same as the template's
+`render()` method would produce.
+
+"""
+
+import copy
+
+from django.template import Node, NodeList, VariableDoesNotExist
+from django.template import defaulttags, loader, loader_tags
+from django.utils.encoding import force_unicode
+
+from typepadapp import cached_templates
+
+
+class _NodeListProbe(NodeList):
+
+    """A copy of a nodelist whose rendering is only noted, so the caller
+    can render (stream) the real nodelist itself."""
+
+    def __init__(self, nodelist, chosen):
+        super(_NodeListProbe, self).__init__(nodelist)
+        self.real = nodelist
+        self.chosen = chosen
+
+    def render(self, context):
+        self.chosen.append(self.real)
+        return u''
+
+
+class _TemplateProbe(object):
+
+    """Stands in for the parent template of an ``extends`` tag."""
+
+    def __init__(self, template, chosen):
+        self.real = template
+        self.nodelist = _NodeListProbe(template.nodelist, chosen)
+        self.chosen = chosen
+
+    def render(self, context):
+        self.chosen.append(self.real.nodelist)
+        return u''
+
+    _render = render
+
+
+def _iter_branch(node, context):
+    """Streams a node that renders one of its child nodelists in the
+    current context, such as an ``if`` tag."""
+    chosen = []
+    probe = copy.copy(node)
+    for name in node.child_nodelists:
+        setattr(probe, name, _NodeListProbe(getattr(node, name), chosen))
+    output = probe.render(context)
+    if not chosen:
+        # it didn't render any child after all
+        yield output
+        return
+    for chunk in iter_nodelist(chosen[0], context):
+        yield chunk
+
+
+def _iter_extends(node, context):
+    # Let the node set up the block inheritance as usual, but have it hand
+    # the parent template back to us to stream instead of rendering it.
+    chosen = []
+    if 'compiled_parent' in dir(node):
+        parent = node.compiled_parent(context)
+    else:
+        parent = node.get_parent(context)
+    parent_probe = _TemplateProbe(parent, chosen)
+    probe = copy.copy(node)
+    probe.get_parent = lambda context: parent_probe
+    probe.compiled_parent = lambda context: parent_probe
+    probe.render(context)
+
+    for chunk in iter_nodelist(chosen[0], context):
+        yield chunk
+
+
+def _iter_with(node, context):
+    val = node.var.resolve(context)
+    context.push()
+    context[node.name] = val
+    for chunk in iter_nodelist(node.nodelist, context):
+        yield chunk
+    context.pop()
+
+
+def _iter_for(node, context):
+    # as in ForNode.render, but yielding each iteration's output
+    if 'forloop' in context:
+        parentloop = context['forloop']
+    else:
+        parentloop = {}
+    context.push()
+    try:
+        values = node.sequence.resolve(context, True)
+    except VariableDoesNotExist:
+        values = []
+    if values is None:
+        values = []
+    if not hasattr(values, '__len__'):
+        values = list(values)
+    len_values = len(values)
+    if len_values < 1:
+        context.pop()
+        for chunk in iter_nodelist(node.nodelist_empty, context):
+            yield chunk
+        return
+    if node.is_reversed:
+        values = reversed(values)
+    unpack = len(node.loopvars) > 1
+    loop_dict = context['forloop'] = {'parentloop': parentloop}
+    for i, item in enumerate(values):
+        loop_dict['counter0'] = i
+        loop_dict['counter'] = i+1
+        loop_dict['revcounter'] = len_values - i
+        loop_dict['revcounter0'] = len_values - i - 1
+        loop_dict['first'] = (i == 0)
+        loop_dict['last'] = (i == len_values - 1)
+
+        if unpack:
+            context.update(dict(zip(node.loopvars, item)))
+        else:
+            context[node.loopvars[0]] = item
+        yield u''.join(iter_nodelist(node.nodelist_loop, context))
+        if unpack:
+            context.pop()
+    context.pop()
+
+
+def _iter_block(node, context):
+    if loader_tags.BlockNode.render.im_func is not cached_templates.BlockNode__render:
+        if hasattr(context, 'render_context'):
+            # Django 1.2 blocks keep their own state; don't stream them
+            yield node.render(context)
+            return
+        # as in BlockNode.render
+        context.push()
+        node.context = context
+        context['block'] = node
+        for chunk in iter_nodelist(node.nodelist, context):
+            yield chunk
+        context.pop()
+        return
+
+    # as in cached_templates.BlockNode__render
+    context.push()
+    if not context.parser_context.has_key('block_context'):
+        context['block'] = node
+        for chunk in iter_nodelist(node.nodelist, context):
+            yield chunk
+    else:
+        block_context = context.parser_context['block_context']
+        push = block = block_context.pop(node.name)
+        if block is None:
+            block = node
+        block = loader_tags.BlockNode(block.name, block.nodelist)
+        block.context = context
+
+        context['block'] = block
+        for chunk in iter_nodelist(block.nodelist, context):
+            yield chunk
+
+        if push is not None:
+            block_context.push(node.name, push)
+    context.pop()
+
+
+_streamers = {
+    loader_tags.ExtendsNode: _iter_extends,
+    loader_tags.BlockNode: _iter_block,
+    defaulttags.ForNode: _iter_for,
+    defaulttags.IfNode: _iter_branch,
+    defaulttags.IfEqualNode: _iter_branch,
+    defaulttags.WithNode: _iter_with,
+}
+
+
+def iter_nodelist(nodelist, context):
+    """Renders the given nodelist, yielding its output in pieces."""
+    for node in nodelist:
+        if not isinstance(node, Node):
+            yield force_unicode(node)
+            continue
+        streamer = _streamers.get(type(node))
+        if streamer is None:
+            yield force_unicode(nodelist.render_node(node, context))
+        else:
+            for chunk in streamer(node, context):
+                yield chunk
+
+
+def iter_render(template, context):
+    """Renders the given template with the given context, yielding its
+    output in pieces as they're rendered."""
+    # as in Template.render, with or without cached_templates
+    state = getattr(context, 'parser_context', None)
+    if state is None:
+        state = getattr(context, 'render_context', None)
+    if state is not None:
+        state.push()
+    for chunk in iter_nodelist(template.nodelist, context):
+        if chunk:
+            yield chunk
+    if state is not None:
+        state.pop()
@@ -0,0 +1,142 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Builds URLs for named views without searching the urlconf every time.
+
+`reverse()` takes the same view names and arguments as Django's `reverse()`
+function, and returns the same URLs. The first time a view is reversed, its
+URL patterns are looked up in the urlconf and kept as format strings (with
+compiled patterns to check the arguments against), so later calls only fill
+in a format string. The last `MAX_URLS` URLs built are also remembered.
+Both are kept with the urlconf's resolver, so they're rebuilt when the
+urlconf changes (or Django's `clear_url_caches()` is called).
+
+Namespaced view names and other arguments Django's function takes are
+passed on to Django's `reverse()`.
+
+"""
+
+import re
+
+from django.core.urlresolvers import get_callable, get_resolver, get_script_prefix
+from django.core.urlresolvers import get_urlconf, NoReverseMatch
+from django.core.urlresolvers import reverse as django_reverse
+from django.utils.encoding import force_unicode, iri_to_uri
+
+
+def _url_builders(resolver, viewname):
+    try:
+        view = get_callable(viewname, True)
+    except (ImportError, AttributeError), exc:
+        raise NoReverseMatch("Error importing '%s': %s." % (viewname, exc))
+    builders = []
+    for possibility, pattern in resolver.reverse_dict.getlist(view):
+        regex = re.compile(u'^%s' % pattern, re.UNICODE)
+        for result, params in possibility:
+            builders.append((result, tuple(params), frozenset(params), regex))
+    return builders
+
+
+_safe_url = re.compile(r"^[A-Za-z0-9_.\-/#%\[\]=:;$&()+,!?*@'~]*\Z")
+
+MAX_URLS = 5000
+"""The number of built URLs to remember for each urlconf."""
+
+
+def _build(resolver, viewname, args, kwargs):
+    try:
+        views = resolver._url_builders
+    except AttributeError:
+        views = resolver._url_builders = {}
+    try:
+        builders = views[viewname]
+    except KeyError:
+        builders = views[viewname] = _url_builders(resolver, viewname)
+
+    for result, params, names, regex in builders:
+        if args:
+            if len(args) != len(params):
+                continue
+            candidate = result % dict(zip(params, [force_unicode(val) for val in args]))
+        else:
+            if kwargs:
+                if names.symmetric_difference(kwargs):
+                    continue
+                candidate = result % dict([(k, force_unicode(v)) for k, v in kwargs.iteritems()])
+            elif params:
+                continue
+            else:
+                candidate = result
+        if regex.search(candidate):
+            return candidate
+    return None
+
+
+def reverse(viewname, urlconf=None, args=None, kwargs=None, prefix=None, current_app=None):
+    """Returns the URL of the given view with the given arguments, as
+    Django's `reverse()` does."""
+    if prefix is not None or current_app is not None \
+        or not isinstance(viewname, basestring) or ':' in viewname:
+        return django_reverse(viewname, urlconf, args, kwargs, prefix, current_app)
+    if args and kwargs:
+        raise ValueError("Don't mix *args and **kwargs in call to reverse()!")
+
+    if urlconf is None:
+        urlconf = get_urlconf()
+    resolver = get_resolver(urlconf)
+    try:
+        urls = resolver._built_urls
+    except AttributeError:
+        urls = resolver._built_urls = {}
+
+    try:
+        # arguments that are equal but format differently (like 1 and 1.0)
+        # are told apart by their types
+        key = (viewname, args and tuple(zip(map(type, args), args)),
+            kwargs and tuple(sorted([(k, type(v), v) for k, v in kwargs.iteritems()])))
+        path = urls[key]
+    except TypeError:
+        # unhashable arguments
+        path = _build(resolver, viewname, args, kwargs)
+    except KeyError:
+        path = _build(resolver, viewname, args, kwargs)
+        if len(urls) >= MAX_URLS:
+            urls.clear()
+        urls[key] = path
+
+    if path is None:
+        raise NoReverseMatch("Reverse for '%s' with arguments '%s' and keyword "
+            "arguments '%s' not found." % (viewname, args, kwargs))
+    url = u'%s%s' % (get_script_prefix(), path)
+    if _safe_url.match(url):
+        # iri_to_uri() would leave it as it is
+        return str(url)
+    return iri_to_uri(url)
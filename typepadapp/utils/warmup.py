@@ -0,0 +1,129 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Warms up a typepadapp process before it serves any requests.
+
+Ordinarily the TypePad application, group and group administrator list are
+loaded by the first request each worker process handles, as are any parsed
+templates. Running `warm_up()` in the master process before it forks loads
+all of these once, populating both the in-process and shared caches, so the
+workers start with them already available.
+
+Set the ``WARM_UP_ON_START`` setting to warm up when the `post_start` signal
+fires, or run `warm_up()` yourself (or the ``tpwarmup`` management command).
+
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.template import loader, TemplateDoesNotExist
+
+from typepadapp.signals import post_start
+
+
+log = logging.getLogger(__name__)
+
+
+def warm_up_application():
+    """Loads the TypePad application and group for the configured
+    consumer key, as `ApplicationMiddleware` would on a first request."""
+    import typepadapp.models
+    from typepadapp.middleware import ApplicationMiddleware
+
+    middleware = ApplicationMiddleware()
+    app, group = middleware.discover_app_and_group(None)
+    typepadapp.models.APPLICATION = app
+    typepadapp.models.GROUP = group
+    # so workers notice if the app and group change before they start
+    typepadapp.models.APPLICATION_VERSION = middleware.version
+
+
+def warm_up_admins():
+    """Loads the administrator list of the application's group."""
+    import typepadapp.models
+
+    group = typepadapp.models.GROUP
+    if group is not None:
+        group.admins()
+
+
+def warm_up_templates():
+    """Compiles the templates named in the ``WARM_UP_TEMPLATES`` setting."""
+    for template_name in getattr(settings, 'WARM_UP_TEMPLATES', ()):
+        try:
+            loader.get_template(template_name)
+        except TemplateDoesNotExist:
+            log.warning('Could not warm up template %r as it does not exist',
+                template_name)
+
+
+WARM_UP_STEPS = [
+    ('application', warm_up_application),
+    ('admins', warm_up_admins),
+    ('templates', warm_up_templates),
+]
+"""The warm-up steps `warm_up()` performs by default, in order, as a list of
+``(name, callable)`` pairs."""
+
+
+def warm_up(steps=None):
+    """Runs the given warm-up steps, reporting how long each took.
+
+    Parameter `steps` is a list of ``(name, callable)`` pairs; if omitted,
+    `WARM_UP_STEPS` are run. A step that raises an exception is logged and
+    skipped, so a failed step doesn't keep the process from starting.
+
+    Returns a list of ``(name, seconds)`` pairs for the steps that completed.
+
+    """
+    if steps is None:
+        steps = WARM_UP_STEPS
+
+    report = []
+    for name, step in steps:
+        start = time.time()
+        try:
+            step()
+        except Exception, exc:
+            log.error('Warm-up step %r failed: %s', name, exc)
+            continue
+        elapsed = time.time() - start
+        log.info('Warm-up step %r took %.3f seconds', name, elapsed)
+        report.append((name, elapsed))
+    return report
+
+
+def warm_up_on_start(**kwargs):
+    if getattr(settings, 'WARM_UP_ON_START', False):
+        warm_up()
+
+post_start.connect(warm_up_on_start)
@@ -36,6 +36,8 @@ from django.conf import settings
 import typepad
 from typepadapp.auth import get_user
 import typepadapp.forms
+from typepadapp.models import members as member_directory
+import typepadapp.models
 import typepadapp.templatetags.formfieldvalue
 
 
@@ -65,6 +67,14 @@ def generate_members_csv(request):
     # start the download prompt!
     yield mfile.getvalue()
 
+    local_members = member_directory.local_directory(request.group)
+    if local_members is not None:
+        request.typepad_user = get_user(request)
+        if request.typepad_user.is_superuser:
+            for page in get_local_members_csv(local_members):
+                yield page.getvalue()
+        return
+
     # fetch typepad api data
     offset = 1
     typepad.client.batch_request()
@@ -113,6 +123,42 @@ def generate_members_csv(request):
             new_offset = len(ids) - 4
 
 
+def member_row(member_data, member):
+    row = []
+    for item in member_data:
+        if item:
+            # csv doesn't want unicode instances, so encode into str's
+            row.append(item.encode("utf-8"))
+        else:
+            row.append('')
+
+    # member data from local profile
+    if settings.AUTH_PROFILE_MODULE:
+        profile_form = typepadapp.forms.LocalProfileForm(instance=member.get_profile())
+        for field in profile_form:
+            value = typepadapp.templatetags.formfieldvalue.value_of_field(field)
+            row.append(value)
+    return row
+
+
+def get_local_members_csv(group_members, page_size=100):
+    """Yields CSV files of the given `GroupMember` rows from the local
+    member directory, `page_size` members at a time."""
+    for offset in xrange(0, group_members.count(), page_size):
+        mfile = StringIO.StringIO()
+        writer = csv.writer(mfile)
+        for gm in group_members[offset:offset + page_size]:
+            member = typepadapp.models.User(url_id=gm.user_id,
+                id='tag:api.typepad.com,2009:%s' % gm.user_id)
+            member_data = [gm.user_id,
+                gm.display_name, gm.email,
+                gm.joined and str(gm.joined),
+                gm.gender, gm.location, gm.about_me,
+                gm.homepage, gm.interests]
+            writer.writerow(member_row(member_data, member))
+        yield mfile
+
+
 def get_members_csv(members):
 
     mfile = StringIO.StringIO()
@@ -134,22 +180,7 @@ def get_members_csv(members):
             member.display_name, member.email,
             join_date,
             member_profile.gender, member_profile.location, member_profile.about_me,
-            member_profile.homepage, ', '.join(member_profile.interests)]
-        row = []
-        for item in member_data:
-            if item:
-                # csv doesn't want unicode instances, so encode into str's
-                row.append(item.encode("utf-8"))
-            else:
-                row.append('')
-
-        # member data from local profile
-        if settings.AUTH_PROFILE_MODULE:
-            profile_form = typepadapp.forms.LocalProfileForm(instance=member.get_profile())
-            for field in profile_form:
-                value = typepadapp.templatetags.formfieldvalue.value_of_field(field)
-                row.append(value)
-
-        writer.writerow(row)
+            member_profile.homepage_url, ', '.join(member_profile.interests or [])]
+        writer.writerow(member_row(member_data, member))
 
     return mfile
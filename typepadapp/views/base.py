@@ -43,18 +43,33 @@ a batch and provided to your view's implementation.
 
 from urlparse import urljoin
 from os import path
+import calendar
+from cStringIO import StringIO
+import hashlib
 import logging
 import re
+from UserDict import DictMixin
 
 from django import http
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.signals import request_started, request_finished
 from django.shortcuts import render_to_response
-from django.template import RequestContext
-from django.utils.http import urlquote
-from django.contrib.syndication.feeds import Feed
+from django.template import Context, RequestContext, loader
+from django.template.context import get_standard_processors
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlquote, http_date
+from django.contrib.syndication.feeds import Feed, FeedDoesNotExist
 from django.utils.feedgenerator import Atom1Feed
+from django.utils.xmlutils import SimplerXMLGenerator
 
+from typepadapp.caching import local_cache_stamp, cache_stats
+from typepadapp.caching import cache_reads, key_versions, cache_admission
+from typepadapp.caching import CachedTypePadLinkPromise, CursorIndex
+from typepadapp import signals
 from typepadapp.utils.paginator import FinitePaginator, EmptyPage
+from typepadapp.utils.streaming import iter_render
 
 import typepad
 
@@ -76,6 +91,66 @@ def parse_etags(etag_str):
     return etags
 
 
+class _ProcessorResult(DictMixin):
+
+    """The variables a context processor provides, which are only computed
+    once the first variable is looked up."""
+
+    def __init__(self, processor, request):
+        self.processor = processor
+        self.request = request
+        self.data = None
+
+    def _load(self):
+        if self.data is None:
+            self.data = self.processor(self.request)
+        return self.data
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+
+    def __delitem__(self, key):
+        del self._load()[key]
+
+    def keys(self):
+        return self._load().keys()
+
+    def __repr__(self):
+        if self.data is None:
+            return '<unevaluated %r>' % (self.processor,)
+        return repr(self.data)
+
+
+class LazyRequestContext(RequestContext):
+
+    """A `RequestContext` that runs each context processor only when a
+    template looks up a variable the processor may provide.
+
+    Variables set directly on the context are found without running any
+    processors, so requests that end before a template is rendered (with a
+    redirect or a ``304 Not Modified`` response, for instance) never run
+    them at all.
+
+    """
+
+    def __init__(self, request, dict=None, processors=None, current_app=None):
+        Context.__init__(self, dict, current_app=current_app)
+        if processors is None:
+            processors = ()
+        else:
+            processors = tuple(processors)
+        for processor in get_standard_processors() + processors:
+            self.update(_ProcessorResult(processor, request))
+        # keep variables the view sets out of the processors' results
+        self.push()
+
+
 class GenericView(http.HttpResponse):
     """A class-based view.
 
@@ -89,13 +164,19 @@ class GenericView(http.HttpResponse):
     Django view function. The request is handled by the initializer and the
     result of the instantiation is the response to the given request.
 
+    The view's template context is an instance of its ``context_class``
+    member, by default a `LazyRequestContext`. Set the ``stream_response``
+    member to True to stream templates rendered with `render_to_response()`.
+
     """
     methods = ('GET',)
+    context_class = LazyRequestContext
+    stream_response = False
 
     def __init__(self, request, *args, **kwargs):
         super(GenericView, self).__init__()
 
-        self.context = RequestContext(request)
+        self.context = self.context_class(request)
 
         obj = self.setup(request, *args, **kwargs)
 
@@ -115,7 +196,8 @@ class GenericView(http.HttpResponse):
         instance, with the exceptions of the ``_headers`` and ``cookies``
         dictionaries. Instead these members' ``update()`` methods are used,
         preserving headers and cookies present in this response but not the
-        argument.
+        argument. A response with iterator content (such as a streamed
+        response) keeps its iterator, rather than being read in full.
 
         """
         self._charset = response._charset
@@ -124,7 +206,8 @@ class GenericView(http.HttpResponse):
         self._headers.update(response._headers)
         self.cookies.update(response.cookies)
         self.status_code = response.status_code
-        self.content = response.content
+        if response._is_string:
+            self.content = response.content
 
         if self.status_code == 405:
             self.content = 'Allowed methods: %s' % self['Allow']
@@ -175,20 +258,8 @@ class GenericView(http.HttpResponse):
         etag = self.etag(request, *args, **kwargs)
 
         if request.method in ('GET', 'HEAD'):
-            # Get HTTP request headers
-            if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE', None)
-            if_none_match = request.META.get('HTTP_IF_NONE_MATCH', None)
-            if if_none_match:
-                if_none_match = parse_etags(if_none_match)
-
-            # Calculate "not modified" condition
-            not_modified = (if_modified_since or if_none_match) and \
-                           (not if_modified_since or \
-                            last_modified == if_modified_since) and \
-                           (not if_none_match or etag in if_none_match)
-
             # Create appropriate response
-            if not_modified:
+            if self.not_modified(request, etag, last_modified):
                 response = http.HttpResponseNotModified()
             else:
                 response = self.dispatch(request, *args, **kwargs)
@@ -211,6 +282,24 @@ class GenericView(http.HttpResponse):
                 response = self.dispatch(request, *args, **kwargs)
         return response
 
+    def not_modified(self, request, etag, last_modified):
+        """
+        Returns whether the given ``GET`` or ``HEAD`` request is satisfied
+        by the client's copy of the response, according to its
+        ``If-Modified-Since`` and ``If-None-Match`` headers.
+        """
+        # Get HTTP request headers
+        if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE', None)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', None)
+        if if_none_match:
+            if_none_match = parse_etags(if_none_match)
+
+        # Calculate "not modified" condition
+        return (if_modified_since or if_none_match) and \
+               (not if_modified_since or \
+                last_modified == if_modified_since) and \
+               (not if_none_match or etag in if_none_match)
+
     def last_modified(self, request, *args, **kwargs):
         """
         Returns a value representing the last modification timestamp of the
@@ -256,7 +345,7 @@ class GenericView(http.HttpResponse):
         """
         pass
 
-    def render_to_response(self, template, more_context=None, **kwargs):
+    def render_to_response(self, template, more_context=None, stream=None, **kwargs):
         """
         A shortcut method that runs the `render_to_response` Django shortcut.
 
@@ -264,17 +353,51 @@ class GenericView(http.HttpResponse):
         the template. Additional context variables may be passed in, similar
         to the `render_to_response` shortcut.
 
+        If `stream` is true (or if it's omitted and the view's
+        ``stream_response`` member is true), the template is rendered as the
+        response is sent, so the top of the page is sent before the rest of
+        it is rendered. Errors in rendering a streamed template can't be
+        reported with an error page, and middleware that reads the whole
+        response content (such as GZip or ETag middleware) undoes the
+        streaming. Streamed responses get no automatic validators.
+
+        Django 1.1 sends the ``request_finished`` signal before the response
+        is sent, so a streamed template is rendered after the request's
+        batch is cleared and its database connection is closed. The render
+        is bracketed with its own ``request_started`` and
+        ``request_finished`` signals, so whatever it opens in the meantime
+        (such as a new database connection) is closed once it's done.
+
         """
+        if stream is None:
+            stream = self.stream_response
         if more_context:
             self.context.push()
             self.context.update(more_context)
         if self.context.get('mobile'):
             template = ('mobile/' + template, template)
+        if stream:
+            if isinstance(template, (list, tuple)):
+                template = loader.select_template(template)
+            else:
+                template = loader.get_template(template)
+            return http.HttpResponse(self._iter_response(template, more_context),
+                **kwargs)
         results = render_to_response(template, context_instance=self.context, **kwargs)
         if more_context:
             self.context.pop()
         return results
 
+    def _iter_response(self, template, more_context):
+        request_started.send(sender=self.__class__)
+        try:
+            for chunk in iter_render(template, self.context):
+                yield chunk
+            if more_context:
+                self.context.pop()
+        finally:
+            request_finished.send(sender=self.__class__)
+
 
 class _PlainUserWarningProxy(object):
 
@@ -290,6 +413,97 @@ class _PlainUserWarningProxy(object):
             logging.getLogger(__name__).warning('Template used "user" instead of "typepad_user"')
 
 
+class _LazyProxy(object):
+
+    """Stands in for a value that isn't loaded until it's used.
+
+    The value is loaded by calling `loader` the first time one of the
+    proxy's attributes is used. If a batch request is open at that time,
+    loading the value will typically add a subrequest to the batch;
+    otherwise the value is fetched on its own.
+
+    """
+
+    __slots__ = ('loader', 'target')
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.target = None
+
+    def resolve(self):
+        if self.loader is not None:
+            self.target = self.loader()
+            self.loader = None
+        return self.target
+
+    def __getattr__(self, key):
+        return getattr(self.resolve(), key)
+
+    def __nonzero__(self):
+        return bool(self.resolve())
+
+    def __eq__(self, other):
+        if isinstance(other, _LazyProxy):
+            other = other.resolve()
+        return self.resolve() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __unicode__(self):
+        return unicode(self.resolve())
+
+    def __str__(self):
+        return str(self.resolve())
+
+
+class _LazyRequestAttribute(object):
+
+    """An attribute of a request that isn't loaded until it's used, as
+    Django's ``LazyUser`` does for ``request.user``.
+
+    Use `set_lazy()` to give a request a loader for the attribute. Once it's
+    loaded, the request's attribute is the value itself, so it can be
+    assigned, pickled or checked with ``isinstance()`` as usual.
+
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, request, owner=None):
+        if request is None:
+            return self
+        loader = request.__dict__.pop('_lazy_%s' % self.name, None)
+        if loader is None:
+            raise AttributeError(self.name)
+        value = request.__dict__[self.name] = loader()
+        return value
+
+    @classmethod
+    def set_lazy(cls, request, name, loader):
+        """Sets the given request's `name` attribute to be loaded by calling
+        `loader` the first time it's used, and returns a `_LazyProxy` for
+        the value to put in template contexts."""
+        if not isinstance(getattr(type(request), name, None), cls):
+            setattr(type(request), name, cls(name))
+        request.__dict__.pop(name, None)
+        request.__dict__['_lazy_%s' % name] = loader
+        return _LazyProxy(lambda: getattr(request, name))
+
+
+page_cache_stamp = local_cache_stamp('pages', signals=[
+    signals.asset_created, signals.asset_deleted,
+    signals.favorite_created, signals.favorite_deleted,
+    signals.member_joined, signals.member_left,
+    signals.member_banned, signals.member_unbanned,
+    signals.post_save, signals.following_webhook,
+    signals.profile_webhook, signals.group_webhook,
+])
+"""Version stamp for the pages cached by `TypePadView` views with the
+``page_cache`` option. Any signal that changes group content purges them."""
+
+
 class TypePadView(GenericView):
 
     """
@@ -312,7 +526,9 @@ class TypePadView(GenericView):
       variable named ``page_obj`` is also set, being an instance of
       ``FinitePaginator``.
     * ``object_list``: Assign to this member when the view is to paginate a
-      list of objects.
+      list of objects. If it's assigned a whole TypePad list (one not
+      filtered by offset and limit), the view's page of it is selected with
+      the `paginate()` method.
     * ``offset``: When paginating a list of objects, this member is
       automatically assigned, based on the ``page`` parameter to the view and
       the value of the ``paginate_by`` property. This value may be used to
@@ -320,6 +536,9 @@ class TypePadView(GenericView):
       member during the `setup()` or `select_from_typepad()` methods.
     * ``limit``: Assigned as the number of rows to select for the
       ``object_list`` member. This is typically set to ``paginate_by``.
+      Instead of filtering a TypePad list by ``offset`` and ``limit``
+      yourself, you can select it with the `paginate()` method, which
+      remembers where the list's pages start (see `CursorIndex`).
     * ``paginate_template``: Assign a string to control the format of next,
       previous links.
     * ``form``: The Django form class that is to be used for any editable
@@ -334,6 +553,29 @@ class TypePadView(GenericView):
     * ``login_required``: If the view requires an authenticated user to run,
       set this member to True. It relies on the settings.LOGIN_URL value for
       redirecting the user to a login form.
+    * ``page_cache``: Set this member to True to cache the whole response of
+      the view for anonymous visitors, for `PAGE_CACHE_TIMEOUT` seconds. The
+      cached pages are purged when any `typepadapp.signals` signal for a
+      change to the group's content fires. Requests with anything in their
+      session or flash are neither answered from nor saved to the cache,
+      and responses that set cookies, vary on them, or include per-session
+      URLs (such as the session synchronization URL) are not cached.
+    * ``auto_validators``: Set this member to True to derive the view's ETag
+      and last-modified time from the versions of the cached objects and
+      lists it read the last time it was rendered for the same URL, so
+      conditional requests can be answered with ``304 Not Modified``
+      responses before any TypePad data is requested. Pages that read any
+      TypePad data outside the cache get no automatic validators. Leave it
+      False if the view also shows data from elsewhere (such as the local
+      database), or if it provides its own `etag()` and `last_modified()`
+      methods. Responses with automatic validators are marked
+      ``Cache-Control: private, must-revalidate``, so shared caches don't
+      keep them and browsers check them each time they're shown.
+    * ``select_user``: Set this member to True to always fetch the signed-in
+      TypePad user in the view's batch request. Otherwise the user is only
+      fetched once something uses it (in the batch if that's during
+      `select_from_typepad()`, or by itself afterward). Views that are
+      ``login_required`` or ``admin_required`` always fetch the user.
 
     .. rubric:: Template variables:
 
@@ -344,7 +586,8 @@ class TypePadView(GenericView):
     * ``form``: The Django `Form` instance for this view, if this kind of view
       has a form.
     * ``page_obj``: The Django `Paginator` instance for this view, if the view
-      is paged.
+      is paged. Its ``num_pages`` is based on the ``total_results`` of the
+      view's TypePad list.
 
     """
 
@@ -354,22 +597,188 @@ class TypePadView(GenericView):
     template_name = None
     login_required = False
     admin_required = False
+    select_user = False
+    page_cache = False
+    auto_validators = False
 
     def __init__(self, request, *args, **kwargs):
         self.form_instance = None
-        super(TypePadView, self).__init__(request, *args, **kwargs)
+        self.page_cache_key = None
+        self.validators = None
+        self.recording_reads = False
+        try:
+            super(TypePadView, self).__init__(request, *args, **kwargs)
+        except:
+            cache_reads.stop()
+            raise
+        if self.page_cache_key is not None:
+            self.save_to_page_cache(request)
+        if self.recording_reads:
+            self.save_validators(request, *cache_reads.stop())
+
+    def _uses_auto_validators(self, request):
+        return self.auto_validators and settings.FRONTEND_CACHING \
+            and request.method in ('GET', 'HEAD')
+
+    def _validators_key(self, request):
+        key = repr((request.path, sorted(request.GET.lists())))
+        return 'validators:%s' % hashlib.md5(key).hexdigest()
+
+    def _make_validators(self, request, versions):
+        # clients only ever see validators for their own session and
+        # user agent, as the page may vary on either
+        etag = hashlib.md5(repr((sorted(versions.items()),
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+            request.META.get('HTTP_USER_AGENT')))).hexdigest()
+        return etag, http_date(max(versions.values()))
+
+    def cached_validators(self, request):
+        """Returns an ``(etag, last_modified)`` pair for the current version
+        of this view's response to the given request, or ``(None, None)`` if
+        there is no such pair.
+
+        The validators are derived from the versions of the cached objects
+        and lists the view read when it last rendered the same URL (see
+        `save_validators()`), as long as they're all still cached.
+
+        """
+        if self.validators is None:
+            self.validators = None, None
+            if self._uses_auto_validators(request):
+                keys = cache.get(self._validators_key(request))
+                if keys:
+                    versions = key_versions(keys)
+                    # if any version is unknown, we can't say what changed,
+                    # and if any value has expired, it may have changed on
+                    # TypePad without a signal saying so
+                    if len(versions) == len(keys) \
+                        and len(cache.get_many(keys)) == len(keys):
+                        self.validators = self._make_validators(request, versions)
+        return self.validators
+
+    def save_validators(self, request, keys, uncached):
+        """Records the cache keys of the objects and lists the view read while
+        rendering, and sets the response's ``ETag`` and ``Last-Modified``
+        headers from their versions."""
+        validators_key = self._validators_key(request)
+        if uncached or not keys or self.status_code != 200 or not self._is_string:
+            # a streamed response hasn't read anything yet
+            cache.delete(validators_key)
+            return
+
+        timeout = getattr(settings, 'LONG_TERM_CACHE_PERIOD', 60 * 60 * 24)
+        cache.set(validators_key, sorted(keys), timeout)
+        etag, last_modified = self._make_validators(request,
+            key_versions(keys, create=True))
+        if not self.has_header('ETag'):
+            self['ETag'] = '"%s"' % etag
+        if not self.has_header('Last-Modified'):
+            self['Last-Modified'] = last_modified
+        patch_cache_control(self, private=True, must_revalidate=True)
+
+    def etag(self, request, *args, **kwargs):
+        return self.cached_validators(request)[0]
+
+    def last_modified(self, request, *args, **kwargs):
+        return self.cached_validators(request)[1]
+
+    def _page_cache_key(self, request, *args, **kwargs):
+        """Returns the key under which to cache this view's response to the
+        given request, or ``None`` if the response should not be cached."""
+        if not self.page_cache or self.login_required or self.admin_required:
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if self._has_visitor_state(request):
+            return None
+
+        key = repr((page_cache_stamp.version(), request.path,
+            sorted(request.GET.lists()), bool(self.context.get('mobile')),
+            self.template_name, self.context.get('view')))
+        return 'pagecache:%s' % hashlib.md5(key).hexdigest()
+
+    def _has_visitor_state(self, request):
+        """Returns whether the given request has a session or flash messages
+        that the page may show, so it shouldn't be shared with others."""
+        for name in ('session', 'flash'):
+            state = getattr(request, name, None)
+            if state is not None and state.keys():
+                return True
+        return False
+
+    def _session_specific(self, method):
+        def session_specific_method(*args, **kwargs):
+            # this page is for this session only
+            self.page_cache_key = None
+            return method(*args, **kwargs)
+        return session_specific_method
+
+    def load_from_page_cache(self, request, *args, **kwargs):
+        """Returns this view's cached response to the given request, if
+        there is one.
+
+        If there is not, and the response can be cached, the view's
+        `page_cache_key` is set so that `save_to_page_cache()` will cache
+        the response once the view has run.
+
+        """
+        key = self._page_cache_key(request, *args, **kwargs)
+        if key is None:
+            return None
+
+        page = cache.get(key)
+        if page is not None:
+            cache_stats.hit('pages')
+            response = http.HttpResponse(page['content'])
+            response._headers.update(page['headers'])
+            return response
+
+        cache_stats.miss('pages')
+        self.page_cache_key = key
+        for name in ('get_session_synchronization_url', 'get_oauth_identification_url'):
+            method = getattr(request, name, None)
+            if method is not None:
+                setattr(request, name, self._session_specific(method))
+        return None
+
+    def save_to_page_cache(self, request):
+        """Caches this view's response to the given request under its
+        `page_cache_key`, if the response is a cacheable one."""
+        if self.status_code != 200 or self.cookies or not self._is_string:
+            return
+        vary = self.has_header('Vary') and self['Vary'] or ''
+        vary = [header.strip().lower() for header in vary.split(',')]
+        if 'cookie' in vary or self._has_visitor_state(request):
+            return
+        timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 5)
+        cache.set(self.page_cache_key, {
+            'content': self.content,
+            'headers': self._headers,
+        }, timeout)
 
     def select_typepad_user(self, request):
         """
         If a session token is found, returns the authenticated TypePad user,
         otherwise, returns the Django AnonymousUser. Replaces any authentication
         middleware.
+
+        The authenticated user is not requested until it's used, unless the
+        view's ``select_user``, ``login_required`` or ``admin_required``
+        members are set. Using ``request.typepad_user`` loads it, so view
+        and form code always gets the user itself; the template context has
+        a stand-in that only loads it once a template uses it.
         """
-        from typepadapp.auth import get_user
-        request.typepad_user = get_user(request)
+        from typepadapp.auth import get_user, TYPEPAD_SESSION_KEY
+        if TYPEPAD_SESSION_KEY not in request.session:
+            user = request.typepad_user = AnonymousUser()
+        elif self.select_user or self.login_required or self.admin_required:
+            user = request.typepad_user = get_user(request)
+        else:
+            user = _LazyRequestAttribute.set_lazy(request, 'typepad_user',
+                lambda: get_user(request))
         self.context.update({
-            'user': _PlainUserWarningProxy(request.typepad_user),
-            'typepad_user': request.typepad_user,
+            'user': _PlainUserWarningProxy(user),
+            'typepad_user': user,
             'request': request,
         })
 
@@ -377,14 +786,15 @@ class TypePadView(GenericView):
         """
         If the TYPEPAD_BLOG setting is used (for applications that always
         work in the context of one particular blog), the specified blog is
-        fetched and put into the context.
+        put into the context. The blog is not requested until it's used.
         """
         if not hasattr(settings, 'TYPEPAD_BLOG') or not settings.TYPEPAD_BLOG:
             return
         from typepadapp.models.blogs import Blog
-        request.typepad_blog = Blog.get_by_url_id(settings.TYPEPAD_BLOG)
+        blog = _LazyRequestAttribute.set_lazy(request, 'typepad_blog',
+            lambda: Blog.get_by_url_id(settings.TYPEPAD_BLOG))
         self.context.update({
-            'typepad_blog': request.typepad_blog,
+            'typepad_blog': blog,
             'request':      request,
         })
 
@@ -402,6 +812,39 @@ class TypePadView(GenericView):
         """
         pass
 
+    def paginate(self, object_list):
+        """
+        Returns the page of the given TypePad list to show in this view.
+
+        Use this in `select_from_typepad()` to select the view's
+        `object_list`, or assign the whole list to `object_list` there and
+        `typepad_request()` will select the page with this method. Pages of
+        streams are requested with the token from their previous page when
+        it's known, rather than by their offset, and aren't cached (their
+        place in the list may have moved since the token was recorded).
+        Lists without tokens, such as group events, are always requested by
+        offset. Pages deeper than the ``PAGINATE_CACHE_DEPTH`` setting are
+        not kept in the cache.
+
+        """
+        if not self.paginate_by:
+            raise ValueError('%s is not paginated' % type(self).__name__)
+        index = CursorIndex(object_list._location)
+        kwargs = {'max_results': self.limit}
+        token = index.start_token(self.pagenum)
+        if token is not None:
+            kwargs['start_token'] = token
+        else:
+            kwargs['start_index'] = self.offset
+        if isinstance(object_list, CachedTypePadLinkPromise):
+            depth = getattr(settings, 'PAGINATE_CACHE_DEPTH', 10)
+            if token is not None or depth is not None and self.pagenum > depth:
+                kwargs['cache'] = False
+
+        page = object_list.filter(**kwargs)
+        self.cursor_index = index
+        return page
+
     def filter_object_list(self, request):
         """
         Filters the list of objects returned by the API according to this
@@ -444,17 +887,20 @@ class TypePadView(GenericView):
         API subrequests necessary for the view.
 
         If a session token is present, the authed user is also fetched with
-        this batch request. In addition, the pagination state is set if the
-        ``paginate_by`` attribute is assigned.
+        this batch request if the view needs it (see `select_typepad_user()`).
+        In addition, the pagination state is set if the ``paginate_by``
+        attribute is assigned.
 
         If the TYPEPAD_BLOG setting is used (for applications that always
         work in the context of one particular blog), the specified blog is
-        also fetched in the aforementioned batch request.
+        also fetched in the aforementioned batch request if it's used during
+        `select_from_typepad()`.
         """
         # Pagination setup
         if self.paginate_by:
             self.object_list = None
-            pagenum = int(kwargs.get('page', 1))
+            self.cursor_index = None
+            pagenum = self.pagenum = int(kwargs.get('page', 1))
             self.offset = (pagenum - 1) * self.paginate_by + 1
             self.limit = self.paginate_by
 
@@ -470,6 +916,11 @@ class TypePadView(GenericView):
             return response
 
         self.select_from_typepad(request, *args, **kwargs)
+        if self.paginate_by and self.object_list is not None \
+            and self.cursor_index is None \
+            and '?' not in getattr(self.object_list, '_location', '?'):
+            # the whole list, so select the page of it to show
+            self.object_list = self.paginate(self.object_list)
         try:
             typepad.client.complete_batch()
         except typepad.TypePadObject.NotFound:
@@ -477,11 +928,15 @@ class TypePadView(GenericView):
 
         # Page parameter assignment
         if self.paginate_by and self.object_list is not None:
+            total = getattr(self.object_list, 'total_results', None)
+            if self.cursor_index is not None:
+                self.cursor_index.record(pagenum, self.object_list)
             self.filter_object_list(request)
             link_template = self.paginate_template or urljoin(request.path, '/page/%d')
             paginator = FinitePaginator(self.object_list, self.paginate_by,
                                         offset=self.offset,
-                                        link_template=link_template)
+                                        link_template=link_template,
+                                        total=total and int(total))
             try:
                 self.context['page_obj'] = paginator.page(pagenum)
             except EmptyPage:
@@ -508,6 +963,28 @@ class TypePadView(GenericView):
 
             self.context['form'] = self.form_instance
 
+        if self._uses_auto_validators(request):
+            # answer conditional requests before fetching anything
+            etag, last_modified = self.cached_validators(request)
+            if etag is not None and self.not_modified(request, etag, last_modified):
+                # the visitor may no longer be allowed to see it
+                self.select_typepad_user(request)
+                allowed, response = self._check_request_allowed(request, *args, **kwargs)
+                if not allowed:
+                    return response
+                response = http.HttpResponseNotModified()
+                patch_cache_control(response, private=True, must_revalidate=True)
+                return response
+
+        response = self.load_from_page_cache(request, *args, **kwargs)
+        if response is not None:
+            return response
+
+        cache_admission.begin(request)
+
+        if self._uses_auto_validators(request):
+            cache_reads.start()
+            self.recording_reads = True
         return self.typepad_request(request, *args, **kwargs)
 
     def dispatch(self, request, *args, **kwargs):
@@ -572,6 +1049,85 @@ class HubbedAtom1Feed(Atom1Feed):
             handler.startElement('link', {'rel': 'hub', 'href': hub_url})
             handler.endElement('link')
 
+    def iter_write(self, encoding):
+        """Yields the feed document in the given encoding a piece at a time:
+        first the feed's own elements, then each entry, then the end of the
+        document.
+
+        The pieces together are the same as the output of `write()`, but
+        the whole document is never held in memory at once.
+
+        """
+        out = StringIO()
+        def flush():
+            value = out.getvalue()
+            out.seek(0)
+            out.truncate()
+            return value
+
+        handler = SimplerXMLGenerator(out, encoding)
+        handler.startDocument()
+        handler.startElement(u'feed', self.root_attributes())
+        self.add_root_elements(handler)
+        yield flush()
+
+        for item in self.items:
+            handler.startElement(u'entry', self.item_attributes(item))
+            self.add_item_elements(handler, item)
+            handler.endElement(u'entry')
+            yield flush()
+
+        handler.endElement(u'feed')
+        yield flush()
+
+
+feed_cache_stamp = local_cache_stamp('feeds', signals=[
+    signals.asset_created, signals.asset_deleted,
+    signals.favorite_created, signals.favorite_deleted,
+    signals.member_banned, signals.member_unbanned,
+    signals.post_save, signals.group_webhook,
+])
+"""Version stamp for the feeds cached by `TypePadFeed` feeds. Any signal that
+changes the group's assets or favorites purges them."""
+
+
+class CachedFeed(object):
+
+    """A serialized feed document, as cached by `TypePadFeed`.
+
+    A `CachedFeed` can be written to a response like the feed generator it
+    was made from.
+
+    """
+
+    def __init__(self, content, mime_type, etag, last_modified):
+        self.content = content
+        self.mime_type = mime_type
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @classmethod
+    def from_content(cls, feedgen, content):
+        """Returns a `CachedFeed` of the given serialized content of the
+        given feed generator."""
+        latest = feedgen.latest_post_date()
+        return cls(content, feedgen.mime_type,
+            etag=hashlib.md5(content).hexdigest(),
+            last_modified=http_date(calendar.timegm(latest.utctimetuple())))
+
+    def set_headers(self, response):
+        response['ETag'] = '"%s"' % self.etag
+        response['Last-Modified'] = self.last_modified
+
+    def write(self, outfile, encoding):
+        # the content is always stored as UTF-8
+        if isinstance(outfile, http.HttpResponse):
+            self.set_headers(outfile)
+        outfile.write(self.content)
+
+    def writeString(self, encoding):
+        return self.content
+
 
 class TypePadFeed(Feed):
 
@@ -582,9 +1138,21 @@ class TypePadFeed(Feed):
     ``hub_url`` attribute (or supply a ``hub_url`` method) to link the feed to
     a PubSubHubbub hub.
 
+    The serialized feed is cached for each feed URL (for `FEED_CACHE_TIMEOUT`
+    seconds, or until the group's content changes), so polling feed readers
+    don't cause TypePad requests. Set ``cache_feed`` to `False` to always
+    build the feed anew. When served with the `feed()` view, cached feeds
+    also answer conditional requests with ``304 Not Modified`` responses.
+
+    Set ``stream_feed`` to `True` to have the `feed()` view write a freshly
+    built feed to the response an entry at a time, instead of serializing
+    the whole document first.
+
     """
 
     feed_type = HubbedAtom1Feed
+    cache_feed = True
+    stream_feed = False
 
     def get_object(self, *args, **kwargs):
         typepad.client.batch_request()
@@ -619,6 +1187,82 @@ class TypePadFeed(Feed):
     def select_from_typepad(self, *args, **kwargs):
         pass
 
+    def feed_cache_key(self, url=None):
+        """Returns the key under which to cache this feed for the given URL
+        parameters, or `None` if the feed should not be cached."""
+        if not self.cache_feed:
+            return None
+        key = repr((feed_cache_stamp.version(), self.__class__.__module__,
+            self.__class__.__name__, self.request.path,
+            sorted(self.request.GET.lists()), url or ''))
+        return 'feedcache:%s' % hashlib.md5(key).hexdigest()
+
+    def cached_feed(self, url=None):
+        """Returns the `CachedFeed` for the given URL parameters, or `None`
+        if the feed is not cached."""
+        key = self.feed_cache_key(url)
+        if key is None:
+            return None
+        cached = cache.get(key)
+        if cached is None:
+            cache_stats.miss('feeds')
+        else:
+            cache_stats.hit('feeds')
+        return cached
+
+    def save_feed(self, url, feedgen, content):
+        """Caches the given serialized content of the given feed generator
+        as the feed for the given URL parameters, returning the
+        `CachedFeed`."""
+        cached = CachedFeed.from_content(feedgen, content)
+        key = self.feed_cache_key(url)
+        if key is not None:
+            timeout = getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 15)
+            cache.set(key, cached, timeout)
+        return cached
+
+    def get_feed(self, url=None):
+        """Returns the feed for the given URL parameters.
+
+        If the feed is cached, this implementation returns the `CachedFeed`
+        without building the feed. Otherwise, the feed is built, serialized
+        and cached.
+
+        """
+        if not self.cache_feed:
+            return super(TypePadFeed, self).get_feed(url)
+
+        cached = self.cached_feed(url)
+        if cached is not None:
+            return cached
+        feedgen = super(TypePadFeed, self).get_feed(url)
+        return self.save_feed(url, feedgen, feedgen.writeString('utf-8'))
+
+    def iter_feed(self, url=None):
+        """Returns the feed for the given URL parameters, and an iterator
+        over its content serialized as UTF-8.
+
+        If the feed isn't cached, the iterator serializes the feed an entry
+        at a time, caching the whole document once it's done.
+
+        """
+        cached = self.cached_feed(url)
+        if cached is not None:
+            return cached, [cached.content]
+
+        feedgen = super(TypePadFeed, self).get_feed(url)
+        if not hasattr(feedgen, 'iter_write'):
+            return feedgen, [feedgen.writeString('utf-8')]
+
+        def iter_content():
+            chunks = []
+            for chunk in feedgen.iter_write('utf-8'):
+                chunks.append(chunk)
+                yield chunk
+            if self.cache_feed:
+                self.save_feed(url, feedgen, ''.join(chunks))
+        return feedgen, iter_content()
+
 
 class TypePadEventFeed(TypePadFeed):
 
@@ -635,3 +1279,57 @@ class TypePadEventFeed(TypePadFeed):
 
     def item_pubdate(self, event):
         return event.published
+
+
+def feed(request, url, feed_dict=None):
+    """Serves one of the feeds in the given dictionary, as Django's
+    `django.contrib.syndication.views.feed` view does.
+
+    Feeds that are cached (such as `TypePadFeed` feeds) are served with
+    ``ETag`` and ``Last-Modified`` headers, and conditional requests for
+    them are answered with ``304 Not Modified`` responses. Feeds with the
+    ``stream_feed`` option are written to the response as they're
+    serialized.
+
+    """
+    if not feed_dict:
+        raise http.Http404("No feeds are registered.")
+
+    try:
+        slug, param = url.split('/', 1)
+    except ValueError:
+        slug, param = url, ''
+
+    try:
+        f = feed_dict[slug]
+    except KeyError:
+        raise http.Http404("Slug %r isn't registered." % slug)
+
+    try:
+        feed_obj = f(slug, request)
+        if getattr(feed_obj, 'stream_feed', False):
+            feedgen, content = feed_obj.iter_feed(param)
+        else:
+            feedgen, content = feed_obj.get_feed(param), None
+    except FeedDoesNotExist:
+        raise http.Http404("Invalid feed parameters. Slug %r is valid, but "
+            "other parameters, or lack thereof, are not." % slug)
+
+    if isinstance(feedgen, CachedFeed):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+        if (if_none_match and feedgen.etag in parse_etags(if_none_match)
+            or not if_none_match and if_modified_since == feedgen.last_modified):
+            response = http.HttpResponseNotModified()
+            feedgen.set_headers(response)
+            return response
+
+    if content is None:
+        response = http.HttpResponse(mimetype=feedgen.mime_type)
+        feedgen.write(response, 'utf-8')
+        return response
+
+    response = http.HttpResponse(content, mimetype=feedgen.mime_type)
+    if isinstance(feedgen, CachedFeed):
+        feedgen.set_headers(response)
+    return response